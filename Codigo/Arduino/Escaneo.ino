@@ -32,6 +32,12 @@ const int stepsPerRevMotor = 3200;
 const float gearRatio = 40.0 / 24.0;
 const int delayEscaneo = 1000;
 int muestras = 0;
+bool conConfirmacion = false;          // true: la PC confirma cada muestra con 'A'
+const int delayAsentado = 100;         // ms de asentamiento antes de informar el ángulo
+const unsigned long timeoutConfirmacion = 5000;
+bool giroContinuo = false;             // true: una vuelta a velocidad constante
+const float velGiro = 500.0;           // pasos/s del giro continuo
+const unsigned long intervaloReporte = 50;   // ms entre reportes de pasos
 float pasoCamara = 0.0;
 const float velLenta = 500.0;
 const float velRapida = 1000.0;
@@ -101,10 +107,17 @@ void loop() {
       input = Serial.readStringUntil('\n');
       input.trim();
       muestras = input.toInt();
+      // Sufijo 'A' (ej: "50A"): modo con confirmación de la PC
+      conConfirmacion = input.endsWith("A");
+      // Sufijo 'C' (ej: "0C"): giro continuo, la PC asigna el ángulo por tiempo
+      giroContinuo = input.endsWith("C");
 
       digitalWrite(enable, LOW);
 
       pasoCamara = 360.0 / muestras;
+      // Aviso antes del inicio: la PC sabe que este firmware entendió el sufijo
+      if (conConfirmacion) { Serial.println("Modo con confirmacion"); }
+      if (giroContinuo) { Serial.println("Modo giro continuo"); }
       Serial.println("Iniciando escaneo...");
       Escaneo();
       Serial.println("Escaneo finalizado");
@@ -155,10 +168,14 @@ void loop() {
          input = Serial.readStringUntil('\n');
          input.trim();
          muestras = input.toInt();
+         conConfirmacion = input.endsWith("A");
+         giroContinuo = input.endsWith("C");
 
          pasoCamara = 360.0 / muestras;
          digitalWrite(enable, LOW);
 
+         if (conConfirmacion) { Serial.println("Modo con confirmacion"); }
+         if (giroContinuo) { Serial.println("Modo giro continuo"); }
          Serial.println("Iniciando escaneo...");
          Escaneo();
          Serial.println("Escaneo finalizado");
@@ -190,12 +207,26 @@ void Escaneo() {
    bool escaneo = true;
    float pasosVuelta = 0;
 
+   if (giroContinuo) {
+      EscaneoContinuo();
+      return;
+   }
+
    if (escaneo == true) {
       for (int i = 0; i < muestras; i++) {
          float anguloCamara = i * pasoCamara;
-         delay(delayEscaneo);
-         Serial.println(anguloCamara, 2);
-         delay(delayEscaneo);
+         if (conConfirmacion) {
+            // Informar el ángulo apenas se asienta y avanzar cuando la PC capturó
+            delay(delayAsentado);
+            while (Serial.available() > 0) { Serial.read(); }
+            Serial.println(anguloCamara, 2);
+            esperarConfirmacion();
+         }
+         else {
+            delay(delayEscaneo);
+            Serial.println(anguloCamara, 2);
+            delay(delayEscaneo);
+         }
 
          if (i < muestras - 1) {
             float pasosMotor = (pasoCamara / 360.0) * stepsPerRevMotor * gearRatio;
@@ -209,6 +240,57 @@ void Escaneo() {
    }
 }
 
+// Funcion de escaneo con giro continuo
+// Informa "INICIO <ms> <pasosVuelta>", "PASOS <ms> <pasos>" cada intervaloReporte
+// y "FIN <ms> <pasos>" para que la PC interpole el ángulo de cada frame
+void EscaneoContinuo() {
+   long pasosVuelta = round(stepsPerRevMotor * gearRatio);
+   long inicio = stepperScanner.currentPosition();
+   long pasos = 0;
+
+   stepperScanner.setMaxSpeed(velGiro);
+   stepperScanner.setSpeed(velGiro);
+
+   unsigned long ultimoReporte = millis();
+   Serial.print("INICIO ");
+   Serial.print(ultimoReporte);
+   Serial.print(" ");
+   Serial.println(pasosVuelta);
+
+   while (pasos < pasosVuelta) {
+      stepperScanner.runSpeed();
+      pasos = stepperScanner.currentPosition() - inicio;
+
+      if (millis() - ultimoReporte >= intervaloReporte) {
+         ultimoReporte = millis();
+         Serial.print("PASOS ");
+         Serial.print(ultimoReporte);
+         Serial.print(" ");
+         Serial.println(pasos);
+      }
+   }
+
+   Serial.print("FIN ");
+   Serial.print(millis());
+   Serial.print(" ");
+   Serial.println(pasos);
+
+   // Mueve de vuelta al inicio, desenrieda el cable
+   moverMotor(pasos, false);
+}
+
+// Funcion para esperar la confirmación de captura ('A') de la PC
+bool esperarConfirmacion() {
+   unsigned long inicio = millis();
+   while (millis() - inicio < timeoutConfirmacion) {
+      if (Serial.available() > 0 && Serial.read() == 'A') {
+         return true;
+      }
+   }
+   Serial.println("Sin confirmacion, continuando");
+   return false;
+}
+
 // Funcion para mover el motor del escaner
 void moverMotor(float pasos, bool escaneo) {
    int pasosEnteros = round(pasos);
@@ -7,6 +7,10 @@ import time
 import os
 import pyvista as pv
 
+from nucleo.almacenamiento import FiltroNube
+from nucleo.deteccion import detectar_laser, pixeles_a_rayos
+from nucleo.triangulacion import ModeloCamara, PlanoLaser
+
 # --- SECCIÓN DE PARÁMETROS INICIALES ---
 CONFIG_FILE = "Configuracion.json"
 CALIB_FILE = "CalibracionZoom.npz"
@@ -84,13 +88,8 @@ def capturar_rayos(IND_CAM, threshold_val, k_matrix, dist_coeffs_val):
     time.sleep(1); ret, frame = cap.read(); cap.release()
     if not ret: print("Error: no se pudo capturar un frame."); return np.array([])
     cv2.imwrite("captura_verificacion.png", frame); print("Frame guardado como 'captura_verificacion.png'")
-    red_channel = frame[:, :, 2]
-    laser_pixels = [[np.argmax(row), y] for y, row in enumerate(red_channel) if np.max(row) > threshold_val]
-    if not laser_pixels: return np.array([])
-    laser_pixels = np.array(laser_pixels, dtype=np.float32)
-    undistorted = cv2.undistortPoints(laser_pixels.reshape(-1, 1, 2), k_matrix, dist_coeffs_val).reshape(-1, 2)
-    rays = np.hstack([undistorted, np.ones((undistorted.shape[0], 1))]); rays /= np.linalg.norm(rays, axis=1, keepdims=True)
-    return rays
+    laser_pixels = detectar_laser(frame, threshold_val, suavizar=False)
+    return pixeles_a_rayos(laser_pixels, k_matrix, dist_coeffs_val)
 
 def save_params(state):
     """Guarda el diccionario de parámetros actual en la sección 'parametros_calibracion' del archivo JSON unificado."""
@@ -113,40 +112,23 @@ def save_params(state):
 def update_scan(param_name, value):
     params[param_name] = value
     
-    theta_rad, pitch_rad = np.radians(params['THETA_DEG']), np.radians(params['CAM_PITCH'])
-    normal_plano_mundo = np.array([np.sin(theta_rad), -np.cos(theta_rad), 0])
-    T_cam_mundo = np.array([params['CAM_RADIUS'], 0, params['CAM_HEIGHT']])
-    R_z_neg90, R_y_neg90 = np.array([[0,1,0],[-1,0,0],[0,0,1]]), np.array([[0,0,-1],[0,1,0],[1,0,0]])
-    R_cam_base = R_y_neg90 @ R_z_neg90
-    R_pitch = np.array([[1,0,0],[0,np.cos(pitch_rad),-np.sin(pitch_rad)],[0,np.sin(pitch_rad),np.cos(pitch_rad)]])
-    R_cam_a_mundo = R_cam_base @ R_pitch
-    puntos_intersectados = []
-    for ray_cam in initial_rays:
-        ray_mundo = R_cam_a_mundo @ ray_cam
-        denom = np.dot(normal_plano_mundo, ray_mundo)
-        if abs(denom) < 1e-9: continue
-        t = np.dot(normal_plano_mundo, T_cam_mundo) / -denom
-        if t > 0: puntos_intersectados.append(T_cam_mundo + t * ray_mundo)
+    camara, plano = ModeloCamara.desde_parametros(params), PlanoLaser.desde_parametros(params)
+    puntos_intersectados, _ = camara.intersectar(initial_rays, plano)
     
-    if not puntos_intersectados: plotter.add_mesh(pv.PolyData(), name='scan'); return
+    if puntos_intersectados.shape[0] == 0: plotter.add_mesh(pv.PolyData(), name='scan'); return
 
     angle_rad = np.radians(params['OFFSET_ANGLE_DEG'])
     offset_x = params['OFFSET_RADIAL'] * np.cos(angle_rad)
     offset_y = params['OFFSET_RADIAL'] * np.sin(angle_rad)
 
-    nube_de_puntos = np.array(puntos_intersectados)
+    nube_de_puntos = puntos_intersectados.copy()
     nube_de_puntos[:, 2] *= -1
     nube_de_puntos += [offset_x, offset_y, params['OFFSET_Z']]
     nube_de_puntos *= params['SCALE_FACTOR']
     nube_de_puntos[:, :2] *= params['XY_ASPECT_FACTOR']
     nube_de_puntos[:, 2] *= params['Z_ASPECT_FACTOR']
     
-    mask = (
-        (nube_de_puntos[:, 2] >= params['Z_MIN']) &
-        (nube_de_puntos[:, 2] <= params['Z_MAX']) &
-        (np.linalg.norm(nube_de_puntos[:, :2], axis=1) <= params['MODULO_MAX'])  # Filtrar por módulo
-    )
-    base_profile = nube_de_puntos[mask]
+    base_profile = nube_de_puntos[FiltroNube.desde_parametros(params).mascara(nube_de_puntos)]
 
     if base_profile.shape[0] == 0: plotter.add_mesh(pv.PolyData(), name='scan'); return
 
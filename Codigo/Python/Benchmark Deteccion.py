@@ -0,0 +1,166 @@
+"""
+Micro-benchmark del detector de la línea láser.
+
+Compara el recorrido original fila por fila (np.max / np.argmax en Python)
+con el detector vectorizado de nucleo.deteccion sobre frames 640x480, y mide
+el costo de los modos sub-píxel. Con frames sintéticos informa además el
+error de cada modo respecto del centro real de la línea.
+
+Uso:
+    python "Benchmark Deteccion.py" [carpeta_frames] [--repeticiones N]
+
+La carpeta puede contener imágenes (.png, .jpg, .bmp) o arrays .npy grabados
+de la cámara. Si no se indica carpeta se generan frames sintéticos; sin
+--threshold su umbral se toma de los propios frames (entre el ruido y el
+pico suavizado de la línea).
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from nucleo.deteccion import MODOS_DETECCION, canal_rojo, detectar_laser
+from nucleo.simulador import cargar_frames
+
+def detectar_laser_original(frame, threshold_val):
+    """Implementación original (bucle por fila), usada como referencia."""
+    red_channel = frame[:, :, 2]
+    red_channel = cv2.GaussianBlur(red_channel, (15, 1), 0)
+
+    laser_pixels = []
+    for y, row in enumerate(red_channel):
+        max_val = np.max(row)
+        if max_val > threshold_val:
+            x = np.argmax(row)
+            laser_pixels.append([x, y])
+
+    return np.array(laser_pixels, dtype=np.float32).reshape(-1, 2)
+
+
+def generar_frames(cantidad, ancho=640, alto=480, semilla=0):
+    """
+    Genera frames sintéticos con ruido y una línea láser vertical ondulada.
+
+    Devuelve (frames, centros), donde centros[i] es la columna real de la
+    línea en cada fila del frame i (NaN en las filas sin láser).
+    """
+    rng = np.random.default_rng(semilla)
+    columnas = np.arange(ancho)
+    frames, centros = [], []
+    for i in range(cantidad):
+        frame = rng.integers(0, 60, size=(alto, ancho, 3), dtype=np.uint8)
+        centro = ancho / 2 + 80 * np.sin(np.linspace(0, 2 * np.pi, alto) + i * 0.3)
+        perfil = 230 * np.exp(-0.5 * ((columnas[None, :] - centro[:, None]) / 2.5) ** 2)
+        # Sin láser en algunas filas (fuera de la pieza)
+        perfil[: alto // 8] = 0
+        centro[: alto // 8] = np.nan
+        frame[:, :, 2] = np.clip(frame[:, :, 2] + perfil, 0, 255).astype(np.uint8)
+        frames.append(frame)
+        centros.append(centro)
+    return frames, centros
+
+
+def umbral_sinteticos(frames, centros):
+    """
+    Umbral a mitad de camino entre el máximo suavizado de las filas sin
+    láser y el mínimo de las filas con láser: todas las filas de la línea
+    se detectan y ninguna de ruido.
+    """
+    ruido, linea = [], []
+    for frame, centro in zip(frames, centros):
+        maximos = canal_rojo(frame).max(axis=1)
+        con_laser = np.isfinite(centro)
+        ruido.append(maximos[~con_laser].max(initial=0))
+        linea.append(maximos[con_laser].min())
+    return int((max(ruido) + min(linea)) // 2)
+
+
+def error_medio(modo, frames, centros, threshold_val):
+    """
+    Error RMS (en píxeles) de la columna detectada respecto del centro real.
+    ValueError si el modo no detectó ninguna fila con láser.
+    """
+    errores = []
+    for frame, centro in zip(frames, centros):
+        pixeles = detectar_laser(frame, threshold_val, modo=modo)
+        filas = pixeles[:, 1].astype(int)
+        reales = centro[filas]
+        validos = np.isfinite(reales)
+        errores.append(pixeles[validos, 0] - reales[validos])
+    errores = np.concatenate(errores)
+    if not errores.size:
+        raise ValueError(f"El modo '{modo}' no detectó ninguna fila con láser (umbral {threshold_val})")
+    return float(np.sqrt(np.mean(errores ** 2)))
+
+
+def medir(funcion, frames, threshold_val, repeticiones):
+    """Devuelve el tiempo medio por frame en milisegundos."""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for frame in frames:
+            funcion(frame, threshold_val)
+    return (time.perf_counter() - inicio) * 1000.0 / (repeticiones * len(frames))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del detector de láser")
+    parser.add_argument("carpeta", nargs="?", help="Carpeta con frames grabados")
+    parser.add_argument("--threshold", type=int, default=None,
+                        help="Umbral de brillo (por defecto 235, o el de los frames sintéticos)")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Repeticiones por frame")
+    parser.add_argument("--sinteticos", type=int, default=30, help="Frames sintéticos si no hay carpeta")
+    args = parser.parse_args()
+
+    centros = None
+    if args.carpeta:
+        frames = cargar_frames(args.carpeta)
+        origen = args.carpeta
+    else:
+        frames, centros = generar_frames(args.sinteticos)
+        origen = "sintéticos"
+
+    if not frames:
+        print("No se encontraron frames.")
+        return
+
+    if args.threshold is None:
+        args.threshold = 235 if centros is None else umbral_sinteticos(frames, centros)
+
+    print(f"Frames: {len(frames)} ({origen}), tamaño {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"umbral {args.threshold}")
+
+    # Verificar que ambos detectores den exactamente el mismo resultado
+    filas_detectadas = 0
+    for i, frame in enumerate(frames):
+        esperado = detectar_laser_original(frame, args.threshold)
+        obtenido = detectar_laser(frame, args.threshold)
+        if not np.array_equal(esperado, obtenido):
+            print(f"✗ Diferencia en el frame {i}")
+            return
+        filas_detectadas += len(obtenido)
+    # Dos detecciones vacías son iguales pero no comprueban nada
+    if filas_detectadas == 0:
+        print(f"✗ Ninguna fila supera el umbral {args.threshold}; pruebe un --threshold menor")
+        return
+    print(f"✓ Resultados idénticos en todos los frames ({filas_detectadas} filas detectadas)")
+
+    t_original = medir(detectar_laser_original, frames, args.threshold, args.repeticiones)
+    t_vectorizado = medir(detectar_laser, frames, args.threshold, args.repeticiones)
+
+    print(f"Original (bucle por fila): {t_original:8.3f} ms/frame ({1000.0 / t_original:7.1f} FPS)")
+    print(f"Vectorizado:               {t_vectorizado:8.3f} ms/frame ({1000.0 / t_vectorizado:7.1f} FPS)")
+    print(f"Aceleración: x{t_original / t_vectorizado:.1f}")
+
+    # Modos sub-píxel: deben costar menos que el bucle original
+    print("\nModos de detección:")
+    for modo in MODOS_DETECCION:
+        t_modo = medir(lambda f, t: detectar_laser(f, t, modo=modo), frames, args.threshold, args.repeticiones)
+        linea = f"  {modo:<10} {t_modo:8.3f} ms/frame"
+        if centros is not None:
+            linea += f"   error RMS: {error_medio(modo, frames, centros, args.threshold):.3f} px"
+        print(linea)
+
+
+if __name__ == "__main__":
+    main()
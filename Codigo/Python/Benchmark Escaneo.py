@@ -0,0 +1,236 @@
+"""
+Benchmark de punta a punta del escaneo con Arduino y cámara simulados.
+
+Corre el mismo ciclo que Escaneo UI (protocolo serie, captura en segundo
+plano y pipeline de procesamiento) contra nucleo.simulador, sin placa ni
+cámara, e informa el rendimiento, la latencia por muestra, la memoria y el
+error de la nube obtenida respecto de la pieza simulada.
+
+Uso:
+    python "Benchmark Escaneo.py" [nube.csv] [--frames CARPETA] [--modo MODO]
+                                  [--muestras N] [--rapido] [--memoria]
+
+La pieza se toma de un escaneo guardado (CSV X,Y,Z): la cámara simulada
+dibuja la línea láser que vería el escáner con la calibración actual. Con
+--frames se reproducen en cambio frames grabados (sin error de nube).
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from nucleo.captura import CapturadorCamara
+from nucleo.deteccion import ParametrosDeteccion
+from nucleo.pipeline import PipelineContinuo, PipelineEscaneo
+from nucleo.protocolo import CONFIRMACION, MODOS_PROTOCOLO, LectorSerial, ProtocoloEscaneo
+from nucleo.simulador import ArduinoSimulado, CamaraSimulada
+from nucleo.triangulacion import ProcesadorPerfiles, TablaTriangulacion, TransformacionEscaneo
+
+try:
+    import resource
+except ImportError:         # Windows
+    resource = None
+
+BASE_DIR = Path(__file__).resolve().parent
+CONFIG_FILE = BASE_DIR / "Configuracion.json"
+CALIBRACION = BASE_DIR / "CalibracionZoom.npz"
+NUBE_PREDETERMINADA = BASE_DIR.parent.parent / "Escaneos" / "Patron A 50.csv"
+
+# Esperas del firmware que no forman parte del muestreo (se anulan con --rapido)
+ESPERAS_FUERA_DEL_ESCANEO = ("inicio", "homing", "centrado", "retorno", "expulsion", "fin_ciclo")
+
+
+def cargar_configuracion():
+    """Parámetros de calibración, umbral y detección del archivo unificado."""
+    with open(CONFIG_FILE, 'r') as f:
+        config = json.load(f)
+    calib = np.load(CALIBRACION)
+    return config, calib["K"], calib["dist"]
+
+
+def memoria_maxima_mb():
+    """Pico de memoria residente del proceso en MB (None si no se puede medir)."""
+    if resource is None:
+        return None
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def error_nube(nube, referencia):
+    """Distancia (mediana, p95) de cada punto obtenido a la nube de referencia."""
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        return None
+    distancias, _ = cKDTree(referencia).query(nube)
+    return float(np.median(distancias)), float(np.percentile(distancias, 95))
+
+
+def ejecutar_escaneo(args, config, k_matrix, coef_dist):
+    params = config.get('parametros_calibracion', {})
+    deteccion = ParametrosDeteccion.desde_config(config)
+    trabajadores = args.trabajadores or max(1, int(config.get('deteccion_laser', {}).get("trabajadores", 2)))
+
+    tiempos = {clave: 0.0 for clave in ESPERAS_FUERA_DEL_ESCANEO} if args.rapido else None
+    arduino = ArduinoSimulado(tiempos=tiempos, escala_tiempo=args.escala,
+                              firmware_anterior=args.firmware_anterior)
+
+    transformacion = TransformacionEscaneo.desde_parametros(params)
+    referencia = None
+    if args.frames:
+        fuente = CamaraSimulada.desde_carpeta(args.frames, fps=args.fps)
+        tabla = TablaTriangulacion.construir(k_matrix, coef_dist, params, fuente.ancho, fuente.alto)
+    else:
+        referencia = np.loadtxt(args.nube, delimiter=',', skiprows=1)
+        tabla = TablaTriangulacion.construir(k_matrix, coef_dist, params)
+        fuente = CamaraSimulada.desde_nube(referencia, arduino, tabla, transformacion, fps=args.fps)
+
+    procesador = ProcesadorPerfiles.desde_parametros(params, deteccion, k_matrix, coef_dist, tabla)
+
+    def procesar_perfil(frame):
+        perfil_2d, _ = procesador.perfil(frame)
+        return perfil_2d if perfil_2d.shape[0] > 0 else None
+
+    def procesar_muestra(frame, muestra):
+        perfil_2d = procesar_perfil(frame)
+        if perfil_2d is None:
+            return None
+        return transformacion.a_puntos(perfil_2d, muestra.angulo)
+
+    capturador = CapturadorCamara(0, fuente=fuente)
+    if not capturador.iniciar():
+        print("✗ No se pudo iniciar la cámara simulada")
+        return None
+    mostrar = (lambda evento: print(f"  [Arduino] {evento.texto}")) if args.verbose else None
+    lector = LectorSerial(arduino, al_evento=mostrar).iniciar()
+    protocolo = ProtocoloEscaneo(lector)
+
+    inicio = time.perf_counter()
+    try:
+        if not protocolo.solicitar_modo_automatico():
+            print("✗ Arduino no pidió el modo de operación")
+            return None
+        if not protocolo.esperar_pregunta_muestras():
+            print("✗ Arduino no pidió el número de muestras")
+            return None
+        modo = protocolo.enviar_muestras(args.muestras, args.modo)
+        if modo is None:
+            print("✗ Arduino no inició el escaneo")
+            return None
+        if modo != args.modo:
+            print(f"⚠ El firmware no confirmó el modo '{args.modo}', se escanea con '{modo}'")
+            args.modo = modo
+
+        inicio_muestreo = time.perf_counter()
+        if args.modo == 'continuo':
+            pipeline = PipelineContinuo(lector, capturador, lambda frame, _: procesar_perfil(frame),
+                                        num_trabajadores=trabajadores)
+        else:
+            pipeline = PipelineEscaneo(lector, capturador, procesar_muestra, args.muestras,
+                                       num_trabajadores=trabajadores,
+                                       confirmacion=CONFIRMACION if args.modo == 'confirmacion' else None)
+        pipeline.iniciar()
+        terminado = pipeline.esperar(timeout=args.timeout)
+        pipeline.detener()
+        duracion_muestreo = time.perf_counter() - inicio_muestreo
+
+        if args.modo == 'continuo':
+            resultados = [transformacion.a_puntos(perfil, angulo)
+                          for angulo, perfil in pipeline.muestras_con_angulo()]
+        else:
+            resultados = pipeline.resultados()
+
+        expulsada = protocolo.esperar_expulsion()
+        duracion_total = time.perf_counter() - inicio
+    finally:
+        lector.detener()
+        capturador.detener()
+        arduino.close()
+
+    return {
+        'terminado': terminado,
+        'expulsada': expulsada,
+        'duracion_total': duracion_total,
+        'duracion_muestreo': duracion_muestreo,
+        'pipeline': pipeline,
+        'resultados': resultados,
+        'frames_camara': fuente.frames_entregados,
+        'confirmaciones': arduino.confirmaciones,
+        'referencia': referencia,
+        'trabajadores': trabajadores,
+    }
+
+
+def informar(args, datos):
+    pipeline = datos['pipeline']
+    perfiles = len(datos['resultados'])
+    puntos = sum(len(r) for r in datos['resultados'])
+
+    print(f"\nModo: {args.modo}  |  Trabajadores: {datos['trabajadores']}  |  "
+          f"Escala de tiempo: {args.escala}{'  |  rápido' if args.rapido else ''}")
+    if not datos['terminado']:
+        print("⚠ El muestreo no terminó dentro del timeout")
+    if not datos['expulsada']:
+        print("⚠ No se recibió la expulsión de la pieza")
+
+    print(f"Ciclo completo:   {datos['duracion_total']:8.2f} s")
+    print(f"Muestreo (FASE 3):{datos['duracion_muestreo']:8.2f} s")
+    print(f"Perfiles:         {perfiles:8d}  ({perfiles / datos['duracion_muestreo']:.1f} perfiles/s)")
+    print(f"Puntos:           {puntos:8d}")
+    print(f"Frames de cámara: {datos['frames_camara']:8d}  |  perdidos: {pipeline.frames_perdidos}")
+    if args.modo == 'confirmacion':
+        print(f"Confirmaciones:   {datos['confirmaciones']:8d}")
+
+    if pipeline.latencias:
+        latencias = np.array(pipeline.latencias) * 1000.0
+        print(f"Latencia por muestra: media {latencias.mean():.1f} ms  |  "
+              f"p95 {np.percentile(latencias, 95):.1f} ms  |  máx {latencias.max():.1f} ms")
+
+    memoria = memoria_maxima_mb()
+    if memoria is not None:
+        print(f"Memoria máxima del proceso: {memoria:.0f} MB")
+
+    if datos['referencia'] is not None and puntos:
+        error = error_nube(np.vstack(datos['resultados']), datos['referencia'])
+        if error is not None:
+            print(f"Error respecto de la pieza: mediana {error[0]:.3f} mm  |  p95 {error[1]:.3f} mm")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del escaneo con Arduino y cámara simulados")
+    parser.add_argument("nube", nargs="?", default=str(NUBE_PREDETERMINADA),
+                        help="Escaneo CSV (X,Y,Z) usado como pieza")
+    parser.add_argument("--frames", help="Carpeta con frames grabados (en lugar de la nube)")
+    parser.add_argument("--modo", choices=MODOS_PROTOCOLO, default="confirmacion", help="Protocolo de muestreo")
+    parser.add_argument("--muestras", type=int, default=100, help="Número de muestras")
+    parser.add_argument("--escala", type=float, default=1.0, help="Escala de los tiempos del firmware")
+    parser.add_argument("--rapido", action="store_true", help="Anular homing, centrado y expulsión")
+    parser.add_argument("--fps", type=float, default=30, help="FPS de la cámara simulada")
+    parser.add_argument("--trabajadores", type=int, help="Hilos de procesamiento (por defecto, la configuración)")
+    parser.add_argument("--timeout", type=float, default=600, help="Segundos máximos del muestreo")
+    parser.add_argument("--memoria", action="store_true", help="Medir el pico de memoria de Python (tracemalloc)")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar los mensajes del Arduino")
+    parser.add_argument("--firmware-anterior", action="store_true",
+                        help="Simular el firmware sin los modos con confirmación y continuo")
+    args = parser.parse_args()
+
+    config, k_matrix, coef_dist = cargar_configuracion()
+    if args.memoria:
+        tracemalloc.start()
+
+    datos = ejecutar_escaneo(args, config, k_matrix, coef_dist)
+    if datos is None:
+        return
+
+    informar(args, datos)
+    if args.memoria:
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Pico de memoria de Python (tracemalloc): {pico / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
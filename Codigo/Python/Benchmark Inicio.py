@@ -0,0 +1,123 @@
+"""
+Benchmark del tiempo de inicio de las herramientas.
+
+Lanza cada herramienta como lo hace Main.py (un proceso de Python nuevo,
+desde esta carpeta) y mide el tiempo hasta que su primera ventana queda
+dibujada. También informa qué módulos pesados ya estaban cargados en ese
+momento: los que solo hacen falta más adelante (pyvista, scipy) no
+deberían aparecer.
+
+Uso:
+    python "Benchmark Inicio.py" [HERRAMIENTA ...] [--repeticiones N] [--importacion]
+
+Con --importacion solo se importa el módulo de cada herramienta, sin abrir
+ventanas (sirve en equipos sin pantalla).
+
+En el modo integrado del lanzador las herramientas se abren dentro del
+mismo proceso: esto mide el primer arranque de cada una, no el cambio
+entre pantallas.
+"""
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+
+HERRAMIENTAS = {
+    'lanzador': 'Main.py',
+    'setup': 'Setup Camara UI.py',
+    'escaneo': 'Escaneo UI.py',
+    'comparacion': 'Comparacion UI.py',
+}
+
+MODULOS_PESADOS = ('numpy', 'cv2', 'PIL', 'serial', 'scipy', 'pyvista', 'vtk')
+
+MARCA = "@@INICIO"
+
+# Código del proceso hijo: ejecuta la herramienta y avisa por stdout cuando
+# la primera ventana está dibujada (o, con 'importacion', cuando terminó de importar)
+ARRANQUE = f"""
+import runpy, sys
+import tkinter as tk
+ruta, modo = sys.argv[1], sys.argv[2]
+
+def reportar():
+    pesados = [m for m in {MODULOS_PESADOS!r} if m in sys.modules]
+    print({MARCA!r}, ",".join(pesados), flush=True)
+
+if modo == 'ventana':
+    mainloop_original = tk.Misc.mainloop
+    def mainloop(self, n=0):
+        def primera_ventana():
+            self.update()
+            reportar()
+            self.destroy()
+        self.after_idle(primera_ventana)
+        mainloop_original(self, n)
+    tk.Misc.mainloop = mainloop
+    runpy.run_path(ruta, run_name='__main__')
+else:
+    runpy.run_path(ruta, run_name='benchmark_inicio')
+    reportar()
+"""
+
+
+def medir(ruta, modo, timeout):
+    """Segundos hasta la marca del proceso hijo y módulos pesados cargados (None si falló)."""
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, "-c", ARRANQUE, str(ruta), modo], cwd=str(BASE_DIR),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        for linea in proceso.stdout:
+            if linea.startswith(MARCA):
+                segundos = time.perf_counter() - inicio
+                pesados = linea[len(MARCA):].strip()
+                return segundos, pesados.split(",") if pesados else []
+            if time.perf_counter() - inicio > timeout:
+                break
+        error = proceso.stderr.read().strip().splitlines()
+        print(f"    ✗ {error[-1] if error else 'terminó sin abrir la ventana'}")
+        return None
+    finally:
+        try:
+            proceso.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+            proceso.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo hasta la primera ventana de cada herramienta")
+    parser.add_argument("herramientas", nargs="*", metavar="HERRAMIENTA",
+                        help=f"Herramientas a medir (por defecto, todas: {', '.join(HERRAMIENTAS)})")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Arranques por herramienta")
+    parser.add_argument("--importacion", action="store_true", help="Medir solo la importación (sin pantalla)")
+    parser.add_argument("--timeout", type=float, default=60, help="Segundos máximos por arranque")
+    args = parser.parse_args()
+    desconocidas = [nombre for nombre in args.herramientas if nombre not in HERRAMIENTAS]
+    if desconocidas:
+        parser.error(f"herramienta desconocida: {', '.join(desconocidas)}")
+
+    modo = 'importacion' if args.importacion else 'ventana'
+    nombres = args.herramientas or list(HERRAMIENTAS)
+    print(f"Modo: {modo}  |  Repeticiones: {args.repeticiones}  |  Python: {sys.executable}\n")
+
+    for nombre in nombres:
+        print(f"{nombre:12s} {HERRAMIENTAS[nombre]}")
+        mediciones = [medir(BASE_DIR / HERRAMIENTAS[nombre], modo, args.timeout)
+                      for _ in range(args.repeticiones)]
+        mediciones = [m for m in mediciones if m is not None]
+        if not mediciones:
+            continue
+        tiempos = np.array([m[0] for m in mediciones]) * 1000.0
+        print(f"    mediana {np.median(tiempos):7.0f} ms  |  mín {tiempos.min():7.0f} ms  |  "
+              f"máx {tiempos.max():7.0f} ms")
+        print(f"    módulos cargados: {', '.join(mediciones[-1][1]) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,17 @@
 import numpy as np
-import pyvista as pv
-from scipy.spatial import KDTree
 import os
 import time
 import sys
-import json
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
 import threading
+# pyvista (gráfico 3D) y scipy (comparación) se importan recién al usarlos,
+# para que la ventana aparezca sin esperar su carga
+
+from nucleo.almacenamiento import EXTENSION_ESCANEO, cargar_puntos
+from nucleo.comparacion import ParametrosComparacion, center_cloud
+from nucleo.servicios import Servicios
 
 # Archivo de configuración unificado
 CONFIG_FILE = "Configuracion.json"
@@ -17,15 +19,9 @@ CONFIG_FILE = "Configuracion.json"
 # Directorio para escaneos (carpeta raíz, no Datos)
 # El script se ejecuta desde Datos, así que subimos un nivel con parent
 SCANS_DIR = Path.cwd().parent / 'Escaneos'
-SCANS_DIR.mkdir(exist_ok=True)
-
-# Parámetros del algoritmo de alineación
-angulo_paso = 45                # Ángulo grueso (grados)
-iteraciones = 5                 # Número de iteraciones del refinamiento
-num_muestras = 30000            # Número máximo de puntos a muestrear
 
-# Umbral de Chamfer (fracción de la diagonal) para CÁLCULO de similitud
-umbral_chamfer_frac = 0.25
+# Parámetros del algoritmo de alineación y de la similitud (ver nucleo.comparacion)
+PARAMETROS_COMPARACION = ParametrosComparacion()
 
 # Multiplicador para la sensibilidad del GRÁFICO
 FACTOR_VISUAL_GRADIENTE = 12.5
@@ -38,22 +34,22 @@ CONFIG = {
 }
 
 
-def load_config():
+def load_config(servicios):
     """Carga la configuración de comparación desde el archivo unificado."""
-    global CONFIG
+    global CONFIG, PARAMETROS_COMPARACION
     try:
-        if not os.path.exists(CONFIG_FILE):
-            print(f"Archivo de configuración no encontrado: {CONFIG_FILE}")
+        if not servicios.ruta_config.exists():
+            print(f"Archivo de configuración no encontrado: {servicios.ruta_config}")
             return False
             
-        with open(CONFIG_FILE, 'r') as f:
-            config = json.load(f)
+        config = servicios.configuracion()
         
         comparacion = config.get('parametros_comparacion', {})
+        PARAMETROS_COMPARACION = ParametrosComparacion.desde_config(config)
         CONFIG = {
             "piezas": comparacion.get("piezas", {}),
             "umbral_identificacion": comparacion.get("umbral_identificacion", 85.0),
-            "archivo_escaneo": str(SCANS_DIR / "Escaneo.csv")
+            "archivo_escaneo": str(SCANS_DIR / f"Escaneo{EXTENSION_ESCANEO}")
         }
         return True
     except Exception as e:
@@ -61,204 +57,71 @@ def load_config():
         return False
 
 
-def save_config():
+def save_config(servicios):
     """Guarda la configuración de comparación en el archivo unificado."""
     global CONFIG
     try:
         # Cargar configuración completa existente
-        if not os.path.exists(CONFIG_FILE):
-            print(f"Archivo de configuración no existe: {CONFIG_FILE}")
+        if not servicios.ruta_config.exists():
+            print(f"Archivo de configuración no existe: {servicios.ruta_config}")
             return False
             
-        with open(CONFIG_FILE, 'r') as f:
-            config = json.load(f)
+        comparacion = servicios.configuracion().get('parametros_comparacion', {})
         
-        # Actualizar solo la sección parametros_comparacion
-        config['parametros_comparacion'] = {
+        # Actualizar solo las piezas y el umbral (se conservan los parámetros de alineación)
+        comparacion.update({
             "piezas": CONFIG.get("piezas", {}),
             "umbral_identificacion": CONFIG.get("umbral_identificacion", 85.0)
-        }
+        })
         
         # Guardar de vuelta
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=4)
+        servicios.guardar_seccion('parametros_comparacion', comparacion)
         return True
     except Exception as e:
         print(f"Error guardando configuración: {e}")
         return False
 
 
-
-# Cargar configuración al iniciar
-load_config()
-
-
 # =============================================================================
-# FUNCIONES DE UTILIDAD
+# FUNCIONES DE CARGA Y COMPARACIÓN
 # =============================================================================
 
-# Centra la nube de puntos
-def center_cloud(points):
-    if points.size == 0:
-        return points, np.array([0,0,0])
-    # Calcula el centroide solo en X e Y
-    centroid = np.array([np.mean(points[:, 0]), np.mean(points[:, 1]), 0])
-    # Resta el centroide a todos los puntos (pero Z permanece igual)
-    return points - centroid, centroid
-
-def rotate_z(points, angle_deg):
-    angle_rad = np.radians(angle_deg)
-    cos_a = np.cos(angle_rad)
-    sin_a = np.sin(angle_rad)
-    rotation_matrix = np.array([
-        [cos_a, -sin_a, 0],
-        [sin_a,  cos_a, 0],
-        [0,      0,     1]
-    ])
-    return points @ rotation_matrix.T
-
-def get_chamfer_and_dists(patron, comparada):
-    """Calcula la distancia Chamfer."""
-    arbol_patron = KDTree(patron)
-    arbol_comparada = KDTree(comparada)
-
-    dists_comparada_a_patron, _ = arbol_patron.query(comparada, k=1)
-    dists_patron_a_comparada, _ = arbol_comparada.query(patron, k=1)
-
-    distancia_chamfer = np.mean(dists_comparada_a_patron) + np.mean(dists_patron_a_comparada)
-    return distancia_chamfer, dists_comparada_a_patron
-
-def get_similarity_percent(patron, distancia_chamfer):
-    """Convierte la distancia Chamfer en porcentaje de similitud (función lineal)."""
-    min_coords = np.min(patron, axis=0)
-    max_coords = np.max(patron, axis=0)
-    diagonal_vector = max_coords - min_coords
-    norm_factor = np.linalg.norm(diagonal_vector)
-
-    if norm_factor == 0:
-        return 100.0 if distancia_chamfer == 0 else 0.0
-
-    # Umbral para el CÁLCULO
-    threshold_value = max(1e-9, umbral_chamfer_frac * norm_factor)
-    # Normalización lineal: 100% cuando distancia=0, 0% cuando distancia=threshold
-    similarity_percent = max(0.0, min(100.0, (1.0 - distancia_chamfer / threshold_value) * 100.0))
-
-    return similarity_percent
-
-# Rota la pieza para encontrar la mejor alineación
-def find_best_alignment(patron, comparada):
-    paso = int(angulo_paso) if angulo_paso >= 1 else 5
-    lista_angulos = np.arange(0, 360, paso)
-
-    mejor_angulo = 0.0
-    mejor_distancia = np.inf
-    mejores_distancias_por_punto = None
-    mejor_nube_rotada = comparada
-
-    # Búsqueda gruesa
-    for ang in lista_angulos:
-        rotada = rotate_z(comparada, ang)
-        dist_chamfer, dists_puntos = get_chamfer_and_dists(patron, rotada)
-        if dist_chamfer < mejor_distancia:
-            mejor_distancia = dist_chamfer
-            mejor_angulo = ang
-            mejores_distancias_por_punto = dists_puntos
-            mejor_nube_rotada = rotada
-
-    # Refinamiento fino
-    intervalo = float(angulo_paso / 2)
-    for i in range(int(iteraciones)):
-        mitad = intervalo / 2.0
-        candidatos = np.mod([mejor_angulo - mitad, mejor_angulo + mitad], 360)
-        for ang in candidatos:
-            rotada = rotate_z(comparada, ang)
-            dist_chamfer, dists_puntos = get_chamfer_and_dists(patron, rotada)
-            if dist_chamfer < mejor_distancia:
-                mejor_distancia = dist_chamfer
-                mejor_angulo = float(ang)
-                mejores_distancias_por_punto = dists_puntos
-                mejor_nube_rotada = rotada
-        intervalo = mitad
-
-    return float(mejor_angulo % 360), mejor_distancia, mejores_distancias_por_punto, mejor_nube_rotada
-
-def downsample_cloud(points, max_points):
-    """Reduce el número de puntos de una nube si es demasiado grande."""
-    if len(points) > max_points:
-        indices = np.random.choice(len(points), max_points, replace=False)
-        return points[indices]
-    return points
+# Tipos de archivo aceptados en los diálogos (escaneo binario o CSV X,Y,Z)
+TIPOS_ARCHIVO_NUBE = [("Escaneos", f"*{EXTENSION_ESCANEO} *.csv"), ("CSV files", "*.csv"), ("All files", "*.*")]
 
 
-# =============================================================================
-# FUNCIONES DE CARGA Y COMPARACIÓN
-# =============================================================================
-
-def _load_csv_points(filepath):
-    """Carga puntos desde un archivo .csv (X,Y,Z), saltando la primera fila (cabecera)."""
+def _load_points(filepath):
+    """
+    Carga puntos (N, 3) desde un escaneo .nube (memmap, sin copiar) o desde
+    un archivo .csv (X,Y,Z) con una fila de cabecera. Los CSV se leen una
+    sola vez: después se usa su copia binaria mientras el CSV no cambie.
+    """
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"Archivo no encontrado: '{filepath}'")
     try:
-        points = np.loadtxt(filepath, delimiter=',', skiprows=1, dtype=np.float64)
-        if points.ndim != 2 or points.shape[1] < 3:
-            raise ValueError("El archivo CSV no tiene el formato esperado (min. 3 columnas).")
-        return points[:, :3]
+        return cargar_puntos(filepath)
     except Exception as e:
-        raise IOError(f"Error al leer/procesar el CSV '{filepath}': {e}")
+        raise IOError(f"Error al leer/procesar '{filepath}': {e}")
 
 
-def _run_comparison(file_patron, puntos_comparada_centrada):
-    """(MODIFICADO) Función auxiliar que ejecuta todo el flujo de comparación."""
-    try:
-        # Cargar patrón (con la nueva función CSV)
-        puntos_patron_original = _load_csv_points(file_patron)
-        
-        # (NUEVO) Centrar el patrón
-        puntos_patron_centrado, _ = center_cloud(puntos_patron_original)
-        
-        # Validar puntos (Patrón y Escaneada)
-        if not np.all(np.isfinite(puntos_patron_centrado)) or not np.all(np.isfinite(puntos_comparada_centrada)):
-            return 0.0, None, None, None
-        
-        # Downsampling (usando las nubes centradas)
-        puntos_patron_down = downsample_cloud(puntos_patron_centrado, num_muestras)
-        puntos_comparada_down = downsample_cloud(puntos_comparada_centrada, num_muestras)
-        
-        # Alineación (usando las nubes centradas y reducidas)
-        mejor_angulo, mejor_distancia, _, nube_alineada_down = find_best_alignment(
-            puntos_patron_down, puntos_comparada_down
-        )
-        
-        # Similitud (calculada sobre las nubes reducidas)
-        similarity = get_similarity_percent(puntos_patron_down, mejor_distancia)
-        
-        # Resultados finales (usando nubes completas y centradas para graficar)
-        # Rota la nube comparada (completa y centrada)
-        final_rotated_centrada = rotate_z(puntos_comparada_centrada, mejor_angulo)
-        # Calcula las distancias finales entre el patrón (completo, centrado) y la nube rotada
-        _, final_dists_original = get_chamfer_and_dists(puntos_patron_centrado, final_rotated_centrada)
-        
-        # Devuelve el porcentaje, la nube patrón (centrada) y la nube alineada (centrada)
-        return similarity, puntos_patron_centrado, final_rotated_centrada, final_dists_original
-    
-    except FileNotFoundError as fe:
-        return 0.0, None, None, None
-    except Exception as e:
-        return 0.0, None, None, None
-
-
-def cargar_configuracion():
+def cargar_configuracion(servicios):
     """Carga la configuración desde el archivo JSON."""
     global CONFIG
-    load_config()  # Usar la función load_config() que ya está optimizada
-    return os.path.exists(CONFIG_FILE)
+    load_config(servicios)  # Usar la función load_config() que ya está optimizada
+    return servicios.ruta_config.exists()
 
-def guardar_configuracion():
+def guardar_configuracion(servicios):
     """Guarda la configuración en un archivo JSON."""
-    save_config()  # Usar la función save_config() que ya está optimizada
-
-def ejecutar_comparacion(archivo_escaneo, callback=None):
-    """Ejecuta el proceso de comparación completo."""
+    save_config(servicios)  # Usar la función save_config() que ya está optimizada
+
+def ejecutar_comparacion(archivo_escaneo, callback=None, servicios=None):
+    """
+    Ejecuta el proceso de comparación completo con servicios.comparador
+    (sin servicios se crean unos para esta comparación).
+    """
+    propios = servicios is None
+    if propios:
+        servicios = Servicios(CONFIG_FILE)
     try:
         def mostrar_mensaje(msg):
             print(msg)
@@ -266,7 +129,7 @@ def ejecutar_comparacion(archivo_escaneo, callback=None):
                 callback(msg)
         
         mostrar_mensaje("1. Cargando archivo de escaneo...")
-        puntos_comparada_original = _load_csv_points(archivo_escaneo)
+        puntos_comparada_original = _load_points(archivo_escaneo)
         mostrar_mensaje(f"   ✓ Puntos cargados: {len(puntos_comparada_original)}")
         
         mostrar_mensaje("2. Centrando nube de puntos...")
@@ -283,17 +146,22 @@ def ejecutar_comparacion(archivo_escaneo, callback=None):
         piezas_list = list(CONFIG["piezas"].items())
         mostrar_mensaje(f"   Comparando con {len(piezas_list)} piezas patrón")
         
-        for idx, (nombre, path_patron) in enumerate(piezas_list):
-            mostrar_mensaje(f"   - Comparando con {nombre}...")
-            sim, pat, comp, dists = _run_comparison(path_patron, puntos_comparada_centrada)
-            mostrar_mensaje(f"     ✓ Similitud: {sim:.2f}%")
-            comparaciones.append({
-                "nombre": nombre,
-                "similitud": sim,
-                "patron": pat,
-                "comparada": comp,
-                "dists": dists
-            })
+        # Todos los patrones a la vez, repartidos entre los núcleos (nucleo.patrones);
+        # los patrones preparados quedan en la biblioteca de los servicios
+        def al_resultado(nombre, resultado):
+            mostrar_mensaje(f"   ✓ {nombre}: {resultado.similitud:.2f}%")
+        
+        resultados = servicios.comparador.comparar(puntos_comparada_centrada, CONFIG["piezas"],
+                                                   PARAMETROS_COMPARACION, al_resultado)
+        for nombre, resultado in resultados.items():
+            if resultado is None:
+                mostrar_mensaje(f"   ✗ {nombre}: no se pudo comparar")
+                comparaciones.append({"nombre": nombre, "similitud": 0.0, "patron": None,
+                                      "comparada": None, "dists": None})
+            else:
+                comparaciones.append({"nombre": nombre, "similitud": resultado.similitud,
+                                      "patron": resultado.patron, "comparada": resultado.comparada,
+                                      "dists": resultado.dists})
         
         mostrar_mensaje("4. Seleccionando mejor coincidencia...")
         mejor_match = max(comparaciones, key=lambda x: x["similitud"])
@@ -318,6 +186,9 @@ def ejecutar_comparacion(archivo_escaneo, callback=None):
         import traceback
         traceback.print_exc()
         return None, f"Error: {str(e)}"
+    finally:
+        if propios:
+            servicios.comparador.cerrar()
 
 
 # =============================================================================
@@ -325,17 +196,23 @@ def ejecutar_comparacion(archivo_escaneo, callback=None):
 # =============================================================================
 
 class AppComparacion:
-    def __init__(self, root):
+    def __init__(self, root, servicios=None):
         self.root = root
+        # Compartidos con las demás pantallas cuando corre dentro del lanzador
+        self.servicios = servicios or Servicios(CONFIG_FILE)
         self.root.title("Sistema de Identificación de Piezas")
         self.root.geometry("1024x768")
         self.root.configure(bg='#1a1a2e')
         
         # Cargar configuración existente
-        cargar_configuracion()
+        cargar_configuracion(self.servicios)
         
         self.pantalla_principal()
     
+    def al_mostrar(self):
+        """El lanzador volvió a esta pantalla: releer piezas y parámetros."""
+        cargar_configuracion(self.servicios)
+    
     def limpiar_ventana(self):
         """Limpia todos los widgets de la ventana."""
         for widget in self.root.winfo_children():
@@ -523,7 +400,7 @@ class AppComparacion:
         """Abre diálogo para seleccionar archivo patrón."""
         archivo = filedialog.askopenfilename(
             title=f"Seleccionar archivo patrón para {nombre_pieza}",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            filetypes=TIPOS_ARCHIVO_NUBE
         )
         if archivo:
             self.rutas_piezas[nombre_pieza] = archivo
@@ -565,7 +442,7 @@ class AppComparacion:
                 return
             
             # Guardar a archivo
-            guardar_configuracion()
+            guardar_configuracion(self.servicios)
             messagebox.showinfo("Éxito", "Configuración guardada correctamente.")
             self.pantalla_principal()
         
@@ -584,8 +461,8 @@ class AppComparacion:
         
         # Seleccionar archivo de escaneo
         archivo_escaneo = filedialog.askopenfilename(
-            title="Seleccionar archivo de escaneo (CSV)",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            title="Seleccionar archivo de escaneo",
+            filetypes=TIPOS_ARCHIVO_NUBE
         )
         
         if not archivo_escaneo:
@@ -631,7 +508,7 @@ class AppComparacion:
         """Ejecuta la comparación en un hilo separado."""
         try:
             self._actualizar_progreso("Cargando archivo de escaneo...")
-            resultado, error = ejecutar_comparacion(archivo_escaneo, self._actualizar_progreso)
+            resultado, error = ejecutar_comparacion(archivo_escaneo, self._actualizar_progreso, self.servicios)
             
             if error:
                 self.root.after(0, lambda: self._mostrar_error_comparacion(error))
@@ -734,6 +611,8 @@ class AppComparacion:
         """Genera el gráfico 3D interactivo en una ventana separada."""
         try:
             if resultado["patron"] is not None and resultado["comparada"] is not None:
+                import pyvista as pv
+                
                 # Crear el plotter
                 plotter = pv.Plotter(off_screen=False, window_size=(800, 600),
                                     notebook=False)
@@ -7,6 +7,7 @@ import os
 from pathlib import Path
 import json
 import importlib.util
+import multiprocessing
 
 # PALETA DE COLORES - Tema Oscuro
 COLORS = {
@@ -41,28 +42,43 @@ if not ROOT_DIR.exists():
 # Directorio FINAL: en Escaner3D/ (no en Datos/)
 SCANS_DIR = ESCANER3D_DIR / 'Escaneos'
 
+# Archivos compartidos por todas las herramientas (en Datos/)
+CONFIG_FILE = 'Configuracion.json'
+CALIBRACION = 'CalibracionZoom.npz'
+
+# 'procesos' (por defecto): cada herramienta en su propio proceso y ventana;
+# 'integrado': las herramientas son pantallas de esta ventana y comparten
+# configuración, calibración y datos cargados
+MODOS_LANZADOR = ('procesos', 'integrado')
+
 # Las rutas de los programas están en Datos/
 PROGRAMS = {
     'setup': {
         'path': ROOT_DIR / 'Setup Camara UI.py',
+        'clase': 'SetupCamara',
         'name': 'Configurar Cámara',
         'icon': '⚙️',
         'description': 'Configura la cámara, ajusta el threshold\nde detección del láser y selecciona\nel puerto Arduino.'
     },
     'escaneo': {
         'path': ROOT_DIR / 'Escaneo UI.py',
+        'clase': 'EstacionEscaneo',
         'name': 'Realizar Escaneo',
         'icon': '📸',
         'description': 'Inicia un nuevo escaneo 3D\n y guarda los resultados.'
     },
     'comparacion': {
         'path': ROOT_DIR / 'Comparacion UI.py',
+        'clase': 'AppComparacion',
         'name': 'Comparación',
         'icon': '📊',
         'description': 'Compara escaneos 3D y determina\nla similitud entre piezas.'
     }
 }
 
+# Lanzador integrado (None en modo 'procesos')
+LANZADOR = None
+
 
 # ========================================================================================
 # FUNCIONES DE UTILIDAD
@@ -124,20 +140,33 @@ def cargar_logo():
     return crear_imagen_placeholder()
 
 
+def leer_modo_lanzador():
+    """Modo del lanzador (sección 'lanzador' de Configuracion.json)."""
+    try:
+        with open(ROOT_DIR / CONFIG_FILE, 'r') as f:
+            modo = json.load(f).get('lanzador', {}).get('modo', 'procesos')
+    except Exception as e:
+        print(f"Error leyendo el modo del lanzador: {e}")
+        modo = 'procesos'
+    
+    if modo not in MODOS_LANZADOR:
+        print(f"Modo de lanzador desconocido '{modo}', usando 'procesos'")
+        modo = 'procesos'
+    return modo
+
+
 def ejecutar_programa(program_key):
     """
     Ejecuta el programa especificado.
-    En desarrollo: como subproceso
-    En .exe compilado: importa y ejecuta directamente
+    Modo integrado (y .exe compilado): como pantalla de esta ventana
+    Modo procesos en desarrollo: como subproceso
     """
     try:
         program_info = PROGRAMS[program_key]
         program_path = program_info['path']
         
-        # Si está compilado como .exe (sys.frozen), importar y ejecutar directamente
-        if getattr(sys, 'frozen', False):
-            # Ejecutado como .exe
-            ejecutar_programa_compilado(program_key, program_path)
+        if LANZADOR is not None:
+            LANZADOR.abrir(program_key)
         else:
             # Desarrollo: ejecutar como subproceso desde ROOT_DIR (Datos/)
             if not program_path.exists():
@@ -155,45 +184,203 @@ def ejecutar_programa(program_key):
         traceback.print_exc()
 
 
-def ejecutar_programa_compilado(program_key, program_path):
+def cargar_modulo(program_path):
     """
-    Ejecuta un programa cuando está compilado como .exe.
-    Importa el módulo y ejecuta su función principal.
+    Importa el módulo de una herramienta (una sola vez por proceso).
+    Al importarse no abre ventanas: su interfaz es una clase.
     """
-    import importlib.util
-    import os
+    if program_path.stem in sys.modules:
+        return sys.modules[program_path.stem]
+    
+    # Cambiar directorio de trabajo a ROOT_DIR (Datos/) donde está la configuración
+    os.chdir(str(ROOT_DIR))
+    
+    # Agregar la ruta actual (Datos/) al sys.path
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    
+    print(f"Cargando módulo: {program_path}")
+    
+    # Cargar el módulo desde el archivo
+    spec = importlib.util.spec_from_file_location(
+        program_path.stem,
+        str(program_path)
+    )
+    
+    if spec is None or spec.loader is None:
+        raise ImportError(f"No se pudo crear especificación para {program_path}")
     
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[program_path.stem] = module
     try:
-        # Cambiar directorio de trabajo a ROOT_DIR (Datos/) donde está la configuración
-        os.chdir(str(ROOT_DIR))
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[program_path.stem]
+        raise
+    return module
+
+
+# ========================================================================================
+# MODO INTEGRADO
+# ========================================================================================
+
+class PantallaHerramienta(tk.Frame):
+    """
+    Marco que hace de ventana raíz de una herramienta dentro del lanzador.
+    title() cambia el título de la ventana; geometry() y resizable() los
+    maneja el lanzador; protocol("WM_DELETE_WINDOW", ...) se llama al volver
+    al menú o al cerrar el programa; quit() vuelve al menú.
+    """
+    
+    def __init__(self, parent, al_salir):
+        super().__init__(parent, bg=COLORS['bg_principal'])
+        self.al_salir = al_salir
+        self.titulo = None
+        self.al_cerrar = None
+        self.pendientes = set()   # after() sin ejecutar (se cancelan al destruir)
+    
+    def title(self, texto=None):
+        if texto is None:
+            return self.titulo
+        self.titulo = texto
+        self.winfo_toplevel().title(texto)
+    
+    def geometry(self, *args):
+        pass
+    
+    def resizable(self, *args):
+        pass
+    
+    def protocol(self, nombre, funcion=None):
+        if nombre == 'WM_DELETE_WINDOW':
+            self.al_cerrar = funcion
+    
+    def after(self, ms, func=None, *args):
+        if func is None:
+            return super().after(ms)
         
-        # Agregar la ruta actual (Datos/) al sys.path
-        if str(ROOT_DIR) not in sys.path:
-            sys.path.insert(0, str(ROOT_DIR))
+        def llamar():
+            self.pendientes.discard(id_after)
+            func(*args)
         
-        print(f"Cargando módulo: {program_path}")
-        print(f"Directorio de trabajo: {os.getcwd()}")
+        id_after = super().after(ms, llamar)
+        self.pendientes.add(id_after)
+        return id_after
+    
+    def quit(self):
+        self.al_salir()
+    
+    def cerrar(self):
+        """Cierra la herramienta como si se cerrara su ventana (libera cámara y puerto serie)."""
+        if self.al_cerrar is not None:
+            try:
+                self.al_cerrar()
+            except Exception as e:
+                print(f"Error cerrando {self.titulo}: {e}")
+        if self.winfo_exists():
+            self.destroy()
+    
+    def destroy(self):
+        # Los callbacks pendientes apuntarían a widgets que ya no existen
+        for id_after in list(self.pendientes):
+            try:
+                self.after_cancel(id_after)
+            except tk.TclError:
+                pass
+        self.pendientes.clear()
+        super().destroy()
+
+
+class Lanzador:
+    """
+    Muestra las herramientas como pantallas de la ventana principal.
+
+    Todas las herramientas reciben los mismos Servicios: la configuración,
+    la calibración, las tablas de triangulación y las nubes patrón se cargan
+    una vez. Al volver al menú, las herramientas que registran un cierre
+    (protocol("WM_DELETE_WINDOW", ...)) se cierran, liberando la cámara y el
+    puerto serie, y se vuelven a crear al abrirlas; las demás solo se ocultan.
+    """
+    
+    def __init__(self, root, menu):
+        self.root = root
+        self.menu = menu
+        self.titulo_menu = root.title()
+        self.servicios = None
+        self.pantallas = {}   # program_key -> (marco, herramienta)
+        self.actual = None
         
-        # Cargar el módulo desde el archivo
-        spec = importlib.util.spec_from_file_location(
-            program_path.stem,
-            str(program_path)
+        self.boton_menu = tk.Button(
+            root, text="⟵ Menú", command=self.volver_al_menu,
+            font=('Segoe UI', 9, 'bold'), bg=COLORS['bg_input'], fg=COLORS['texto_principal'],
+            activebackground=COLORS['acento_hover'], activeforeground=COLORS['texto_principal'],
+            relief='flat', bd=0, padx=10, pady=4, cursor='hand2'
         )
+        root.protocol("WM_DELETE_WINDOW", self.cerrar)
+    
+    def obtener_servicios(self):
+        """Servicios compartidos (se crean al abrir la primera herramienta, no al iniciar el menú)."""
+        if self.servicios is None:
+            if str(ROOT_DIR) not in sys.path:
+                sys.path.insert(0, str(ROOT_DIR))
+            from nucleo.servicios import Servicios
+            self.servicios = Servicios(ROOT_DIR / CONFIG_FILE, ROOT_DIR / CALIBRACION)
+        return self.servicios
+    
+    def abrir(self, program_key):
+        """Muestra la pantalla de una herramienta (creándola si es la primera vez)."""
+        program_info = PROGRAMS[program_key]
+        self.root.config(cursor='watch')
+        self.root.update_idletasks()
+        try:
+            if program_key in self.pantallas:
+                marco, herramienta = self.pantallas[program_key]
+                # Releer lo que pudo cambiar desde otra pantalla
+                if hasattr(herramienta, 'al_mostrar'):
+                    herramienta.al_mostrar()
+            else:
+                modulo = cargar_modulo(program_info['path'])
+                marco = PantallaHerramienta(self.root, self.volver_al_menu)
+                try:
+                    herramienta = getattr(modulo, program_info['clase'])(marco, self.obtener_servicios())
+                except Exception:
+                    marco.destroy()
+                    raise
+                self.pantallas[program_key] = (marco, herramienta)
+        finally:
+            self.root.config(cursor='')
         
-        if spec is None or spec.loader is None:
-            raise ImportError(f"No se pudo crear especificación para {program_path}")
-        
-        module = importlib.util.module_from_spec(spec)
-        sys.modules[program_path.stem] = module
-        
-        print(f"Ejecutando módulo: {program_path.stem}")
-        spec.loader.exec_module(module)
-        
-    except Exception as e:
-        print(f"Error ejecutando módulo compilado: {e}")
-        import traceback
-        traceback.print_exc()
-        messagebox.showerror("Error", f"Error: {str(e)}")
+        self.menu.pack_forget()
+        if self.actual is not None:
+            self.pantallas[self.actual][0].pack_forget()
+        marco.pack(fill='both', expand=True)
+        self.root.title(marco.titulo or program_info['name'])
+        self.boton_menu.place(relx=1.0, x=-8, y=8, anchor='ne')
+        self.boton_menu.lift()
+        self.actual = program_key
+    
+    def volver_al_menu(self):
+        """Cierra u oculta la herramienta actual y muestra el menú."""
+        if self.actual is not None:
+            marco = self.pantallas[self.actual][0]
+            if marco.al_cerrar is not None:
+                del self.pantallas[self.actual]
+                marco.cerrar()
+            else:
+                marco.pack_forget()
+            self.actual = None
+        self.boton_menu.place_forget()
+        self.menu.pack(fill='both', expand=True)
+        self.root.title(self.titulo_menu)
+    
+    def cerrar(self):
+        """Cierra las herramientas, la cámara y el puerto serie y termina el programa."""
+        for marco, _ in list(self.pantallas.values()):
+            marco.cerrar()
+        self.pantallas.clear()
+        if self.servicios is not None:
+            self.servicios.cerrar()
+        self.root.destroy()
 
 
 def crear_boton_programa(parent, program_key, row, col):
@@ -288,6 +475,8 @@ def main():
     """
     Crea la ventana principal del launcher.
     """
+    global LANZADOR
+    
     # Crear estructura de carpetas
     try:
         ESCANER3D_DIR.mkdir(exist_ok=True)
@@ -304,8 +493,12 @@ def main():
     # Establecer color de fondo
     root.config(bg=COLORS['bg_principal'])
     
+    # Menú de herramientas (en modo integrado se oculta al abrir una)
+    menu = tk.Frame(root, bg=COLORS['bg_principal'])
+    menu.pack(fill='both', expand=True)
+    
     # ==================== Header con Logo ====================
-    header_frame = tk.Frame(root, bg=COLORS['bg_principal'], height=160)
+    header_frame = tk.Frame(menu, bg=COLORS['bg_principal'], height=160)
     header_frame.pack(fill='x', padx=0, pady=0)
     header_frame.pack_propagate(False)
     
@@ -343,11 +536,11 @@ def main():
     subtitle_label.pack(anchor='w', pady=(5, 0))
     
     # ==================== Separador ====================
-    separator = tk.Frame(root, bg=COLORS['bg_secundario'], height=2)
+    separator = tk.Frame(menu, bg=COLORS['bg_secundario'], height=2)
     separator.pack(fill='x')
     
     # ==================== Contenedor de programas ====================
-    content_frame = tk.Frame(root, bg=COLORS['bg_principal'])
+    content_frame = tk.Frame(menu, bg=COLORS['bg_principal'])
     content_frame.pack(fill='both', expand=True, padx=40, pady=40)
     
     # Grid de programas (3 columnas)
@@ -355,7 +548,7 @@ def main():
         crear_boton_programa(content_frame, program_key, 0, idx)
     
     # ==================== Footer ====================
-    footer_frame = tk.Frame(root, bg=COLORS['bg_secundario'], height=60)
+    footer_frame = tk.Frame(menu, bg=COLORS['bg_secundario'], height=60)
     footer_frame.pack(fill='x', side='bottom')
     footer_frame.pack_propagate(False)
     
@@ -368,6 +561,10 @@ def main():
     )
     footer_label.pack(pady=15)
     
+    # El .exe no puede lanzar los .py como procesos: siempre integrado
+    if getattr(sys, 'frozen', False) or leer_modo_lanzador() == 'integrado':
+        LANZADOR = Lanzador(root, menu)
+    
     # Centrar ventana en la pantalla
     root.update_idletasks()
     width = root.winfo_width()
@@ -380,4 +577,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # En el .exe los procesos de comparación (nucleo.patrones) arrancan el mismo ejecutable
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,159 @@
+"""
+Reprocesa en lote las sesiones grabadas por Escaneo UI.
+
+Después de recalibrar, regenera las nubes de todo un archivo de sesiones
+con los parámetros nuevos, sin volver a escanear las piezas. Usa la misma
+detección y triangulación que el escaneo (paquete nucleo), sin Tkinter ni
+pyvista.
+
+Uso:
+    python "Reprocesar Sesiones.py" CARPETA_SESIONES [--config Configuracion.json]
+                                    [--calibracion CalibracionZoom.npz] [--salida CARPETA]
+                                    [--threshold N] [--procesos N] [--csv]
+
+Sin --config ni --calibracion cada sesión se reprocesa con los parámetros
+y la calibración con que fue grabada. La nube de cada sesión se guarda
+como <salida>/<sesion>.nube (por defecto, dentro de la carpeta de la sesión
+como reprocesado.nube).
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from nucleo.almacenamiento import EXTENSION_ESCANEO, guardar_csv
+from nucleo.sesion import ARCHIVO_SESION, cargar_sesion, geometria_sesion, reprocesar_sesion
+from nucleo.triangulacion import TablaTriangulacion, clave_tabla
+
+NOMBRE_REPROCESADO = f"reprocesado{EXTENSION_ESCANEO}"
+
+
+def buscar_sesiones(carpeta):
+    """Carpetas con sesion.json dentro de `carpeta` (o la propia carpeta si es una sesión)."""
+    carpeta = Path(carpeta)
+    if (carpeta / ARCHIVO_SESION).exists():
+        return [carpeta]
+    return sorted(p.parent for p in carpeta.glob(f"*/{ARCHIVO_SESION}"))
+
+
+def cargar_opciones(args):
+    """Parámetros que reemplazan a los grabados en cada sesión."""
+    opciones = {"threshold": args.threshold, "calibracion": args.calibracion,
+                "subdivisiones": args.subdivisiones}
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+        opciones["parametros"] = config.get('parametros_calibracion', {})
+        deteccion = config.get('deteccion_laser', {})
+        opciones["deteccion"] = {clave: deteccion[clave] for clave in ("modo", "ventana") if clave in deteccion}
+        if opciones["threshold"] is None:
+            opciones["threshold"] = config.get('setup_camara', {}).get("threshold")
+    return opciones
+
+
+def ruta_salida_para(sesion, args):
+    if args.salida:
+        return Path(args.salida) / f"{sesion.name}{EXTENSION_ESCANEO}"
+    return sesion / NOMBRE_REPROCESADO
+
+
+def reprocesar(sesion, ruta_salida, opciones, procesos, exportar_csv):
+    """Reprocesa una sesión y devuelve (puntos, muestras, segundos)."""
+    inicio = time.perf_counter()
+    puntos, indices, _ = reprocesar_sesion(sesion, procesos=procesos, ruta_salida=ruta_salida, **opciones)
+    if exportar_csv:
+        guardar_csv(ruta_salida.with_suffix(".csv"), puntos)
+    return len(puntos), len(np.unique(indices)), time.perf_counter() - inicio
+
+
+def preparar_tablas_comunes(sesiones, opciones):
+    """
+    Con una calibración común a todas las sesiones, construye (o carga) una
+    tabla de triangulación por cada geometría distinta (resolución y
+    parámetros de cada sesión, con los de --config encima) antes de
+    repartir el trabajo, para que los procesos no las calculen en paralelo.
+    """
+    if not opciones["calibracion"]:
+        return
+    with np.load(opciones["calibracion"]) as calib:
+        k_matrix, coef_dist = calib["K"], calib["dist"]
+    geometrias = {}
+    for sesion in sesiones:
+        params, ancho, alto = geometria_sesion(cargar_sesion(sesion), opciones.get("parametros"))
+        clave = clave_tabla(k_matrix, coef_dist, params, ancho, alto, opciones["subdivisiones"])
+        geometrias.setdefault(clave, (params, ancho, alto))
+    for params, ancho, alto in geometrias.values():
+        TablaTriangulacion.cargar_o_construir(opciones["calibracion"], k_matrix, coef_dist, params,
+                                              ancho, alto, opciones["subdivisiones"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocesa en lote sesiones de escaneo grabadas")
+    parser.add_argument("carpeta", help="Carpeta con sesiones (o una sesión)")
+    parser.add_argument("--config", help="Configuracion.json con los parámetros nuevos")
+    parser.add_argument("--calibracion", help="Archivo de calibración de la cámara (.npz con K y dist)")
+    parser.add_argument("--threshold", type=int, help="Umbral de detección (reemplaza al de la configuración)")
+    parser.add_argument("--subdivisiones", type=int, default=8, help="Subdivisiones de la tabla de triangulación")
+    parser.add_argument("--salida", help="Carpeta donde guardar las nubes (por defecto, cada sesión)")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1, help="Procesos en paralelo")
+    parser.add_argument("--csv", action="store_true", help="Exportar también cada nube a CSV")
+    args = parser.parse_args()
+
+    sesiones = buscar_sesiones(args.carpeta)
+    if not sesiones:
+        print(f"No se encontraron sesiones en {args.carpeta}")
+        return
+    if args.salida:
+        Path(args.salida).mkdir(parents=True, exist_ok=True)
+
+    opciones = cargar_opciones(args)
+    procesos = max(1, args.procesos)
+    print(f"Sesiones: {len(sesiones)}  |  Procesos: {procesos}")
+    preparar_tablas_comunes(sesiones, opciones)
+
+    inicio = time.perf_counter()
+    errores = 0
+    total_puntos = 0
+
+    def informar(numero, sesion, resultado):
+        nonlocal total_puntos
+        puntos, muestras, segundos = resultado
+        total_puntos += puntos
+        print(f"[{numero}/{len(sesiones)}] {sesion.name}: {muestras} muestras, "
+              f"{puntos} puntos en {segundos:.2f} s")
+
+    if len(sesiones) >= procesos:
+        # Muchas sesiones: una sesión por proceso
+        with ProcessPoolExecutor(max_workers=procesos) as grupo:
+            futuros = {grupo.submit(reprocesar, s, ruta_salida_para(s, args), opciones, 1, args.csv): s
+                       for s in sesiones}
+            for numero, futuro in enumerate(as_completed(futuros), 1):
+                sesion = futuros[futuro]
+                try:
+                    informar(numero, sesion, futuro.result())
+                except Exception as e:
+                    errores += 1
+                    print(f"[{numero}/{len(sesiones)}] ✗ {sesion.name}: {e}")
+    else:
+        # Pocas sesiones: se reparten los frames de cada una
+        for numero, sesion in enumerate(sesiones, 1):
+            try:
+                informar(numero, sesion, reprocesar(sesion, ruta_salida_para(sesion, args), opciones,
+                                                    procesos, args.csv))
+            except Exception as e:
+                errores += 1
+                print(f"[{numero}/{len(sesiones)}] ✗ {sesion.name}: {e}")
+
+    duracion = time.perf_counter() - inicio
+    print(f"\n✓ {len(sesiones) - errores}/{len(sesiones)} sesiones reprocesadas en {duracion:.1f} s "
+          f"({total_puntos} puntos)")
+    if errores:
+        print(f"✗ {errores} sesiones con errores")
+
+
+if __name__ == "__main__":
+    main()
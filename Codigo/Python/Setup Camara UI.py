@@ -3,12 +3,24 @@ import numpy as np
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
-import json
 import serial.tools.list_ports
 
+from nucleo.deteccion import canal_rojo, detectar_picos
+from nucleo.servicios import Servicios
+
 # Archivo de configuración
 CONFIG_FILE = "Configuracion.json"
 
+# Estructura creada si todavía no existe el archivo de configuración
+CONFIG_POR_DEFECTO = {
+    "version": "1.0",
+    "descripcion": "Archivo de configuración unificado",
+    "setup_camara": {},
+    "parametros_calibracion": {},
+    "parametros_comparacion": {},
+    "configuracion_escaneo": {}
+}
+
 # Paleta de colores - Tema Oscuro
 COLORS = {
     'bg_principal': '#1a1a2e',      # Negro profundo
@@ -22,87 +34,16 @@ COLORS = {
     'texto_secundario': '#b0b0b0'   # Gris claro
 }
 
-# Variables
-cam_index = 0
-threshold_value = 100
-arduino_port = ""
-
-cap = None
-
-def load_config():
-    # Cargar configuración
-    global cam_index, threshold_value, arduino_port
-    try:
-        with open(CONFIG_FILE, "r") as f:
-            config = json.load(f)
-            setup = config.get("setup_camara", {})
-            cam_index = setup.get("camera_index")
-            threshold_value = setup.get("threshold")
-            arduino_port = setup.get("arduino_port")
-    except FileNotFoundError:
-        pass
-
-def save_config():
-    # Cargar configuración completa
-    try:
-        with open(CONFIG_FILE, "r") as f:
-            config = json.load(f)
-    except FileNotFoundError:
-        # Crear estructura por defecto si no existe
-        config = {
-            "version": "1.0",
-            "descripcion": "Archivo de configuración unificado",
-            "setup_camara": {},
-            "parametros_calibracion": {},
-            "parametros_comparacion": {},
-            "configuracion_escaneo": {}
-        }
-    
-    # Actualizar solo la sección setup_camara
-    config["setup_camara"] = {
-        "camera_index": cam_index,
-        "threshold": threshold_value,
-        "arduino_port": arduino_port
-    }
-    
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=4)
-    
-    messagebox.showinfo("Éxito", "Configuración guardada correctamente")
-
-def update_camera(index):
-    global cap, cam_index
-    cam_index = index
-    if cap is not None:
-        cap.release()
-    cap = cv2.VideoCapture(cam_index)
-
-def process_frame():
-    global cap, threshold_value
-
-    if cap is None or not cap.isOpened():
-        return None
-
-    ret, frame = cap.read()
-    if not ret:
-        return None
-
-    # Extraer canal rojo
-    red_channel = frame[:, :, 2]
-
-    # Aplicar suavizado gaussiano horizontal
-    red_channel = cv2.GaussianBlur(red_channel, (15, 1), 0)
-
-    # Máscara para la línea
-    laser_mask = np.zeros_like(red_channel)
-    height, width = red_channel.shape
 
-    for y in range(height):
-        row = red_channel[y]
-        max_val = np.max(row)
-        if max_val > threshold_value:
-            x = np.argmax(row)
-            laser_mask[y, x] = 255
+def process_frame(frame, threshold_value):
+    """Frame de la cámara con la línea detectada superpuesta."""
+    # Extraer canal rojo con suavizado gaussiano horizontal
+    red_channel = canal_rojo(frame)
+
+    # Máscara para la línea (máximo de cada fila sobre el umbral)
+    laser_mask = np.zeros_like(red_channel)
+    filas, columnas, _ = detectar_picos(red_channel, threshold_value)
+    laser_mask[filas, columnas] = 255
 
     # Crear overlay rojo solo con los puntos detectados
     laser_overlay = cv2.merge([
@@ -116,164 +57,8 @@ def process_frame():
 
     return output
 
-# Procesado del video y threshold
-def update_frame():
-    frame = process_frame()
-    if frame is not None:
-        # SIN redimensionar - usar dimensiones reales 640x480
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(frame_rgb)
-        imgtk = ImageTk.PhotoImage(image=img)
-        video_label.imgtk = imgtk
-        video_label.configure(image=imgtk)
-    root.after(33, update_frame)  # refrescar cada 33ms (~30 FPS)
-
-def on_cam_change(val):
-    update_camera(int(val))
-
-def on_threshold_change(val):
-    global threshold_value
-    threshold_value = int(val)
-    threshold_label.config(text=f"Threshold: {threshold_value}")
-
-def on_port_select(event):
-    global arduino_port
-    arduino_port = port_combo.get()
-
-# Interfaz Tkinter
-root = tk.Tk()
-root.title("Setup Cámara y Arduino")
-root.geometry("1024x768")
-root.resizable(False, False)
-root.configure(bg=COLORS['bg_principal'])
-
-# Aplicar tema oscuro a ttk
-style = ttk.Style()
-style.theme_use('clam')
-style.configure('TCombobox', fieldbackground=COLORS['bg_input'], background=COLORS['bg_input'])
-style.configure('TScale', background=COLORS['bg_principal'])
-
-# Cargar configuración antes de crear UI
-load_config()
-cap = cv2.VideoCapture(cam_index)
-
-# === TÍTULO ===
-titulo_frame = tk.Frame(root, bg=COLORS['bg_principal'])
-titulo_frame.pack(fill='x', padx=12, pady=5)
-
-titulo = tk.Label(titulo_frame, text="CONFIGURACIÓN",
-                 font=("Segoe UI", 14, "bold"), bg=COLORS['bg_principal'], 
-                 fg=COLORS['texto_principal'])
-titulo.pack(anchor='w')
-
-separador = tk.Frame(root, bg=COLORS['acento_primario'], height=1)
-separador.pack(fill='x', padx=0)
-
-# === ÁREA DE VIDEO (640x480 - FIJO, SIN ESCALAR) ===
-video_frame = tk.Frame(root, bg=COLORS['bg_secundario'])
-video_frame.pack(pady=5, padx=12, fill='both', expand=False)
-
-video_label_titulo = tk.Label(video_frame, text="Vista Previa Cámara",
-                             font=("Segoe UI", 9, "bold"), 
-                             bg=COLORS['bg_secundario'], fg=COLORS['texto_principal'])
-video_label_titulo.pack(pady=3)
-
-# Label EXACTAMENTE 640x480 - SIN REDIMENSIONAR
-video_label = tk.Label(video_frame, bg='#000000', width=640, height=480)
-video_label.pack()
-
-# === CONTROLES - LAYOUT HORIZONTAL COMPACTO ===
-controles_frame_main = tk.Frame(root, bg=COLORS['bg_principal'])
-controles_frame_main.pack(fill='x', padx=12, pady=4)
-
-# COLUMNA IZQUIERDA: Sliders verticales
-col_izquierda = tk.Frame(controles_frame_main, bg=COLORS['bg_principal'])
-col_izquierda.pack(side='left', fill='both', expand=True, padx=(0, 8))
-
-# --- Sección 1: Cámara ---
-camara_frame = tk.LabelFrame(col_izquierda, text="Cámara",
-                             font=("Segoe UI", 9, "bold"), 
-                             bg=COLORS['bg_secundario'], fg=COLORS['texto_principal'],
-                             padx=8, pady=6, relief='flat', bd=1)
-camara_frame.pack(fill='x', pady=3)
-
-cam_label = tk.Label(camara_frame, text="Índice (0-3):",
-                    font=("Segoe UI", 8), bg=COLORS['bg_secundario'], 
-                    fg=COLORS['texto_secundario'])
-cam_label.pack(anchor='w', pady=(0, 3))
-
-cam_slider = tk.Scale(camara_frame, from_=0, to=3, orient="horizontal", 
-                     command=on_cam_change, bg=COLORS['bg_principal'],
-                     fg=COLORS['texto_principal'], troughcolor=COLORS['bg_secundario'],
-                     highlightthickness=0, relief='flat', activebackground=COLORS['acento_primario'],
-                     length=150)
-cam_slider.set(cam_index)
-cam_slider.pack(fill='x', padx=3)
-
-# --- Sección 2: Threshold ---
-threshold_frame = tk.LabelFrame(col_izquierda, text="Threshold",
-                               font=("Segoe UI", 9, "bold"),
-                               bg=COLORS['bg_secundario'], fg=COLORS['texto_principal'],
-                               padx=8, pady=6, relief='flat', bd=1)
-threshold_frame.pack(fill='x', pady=3)
-
-thresh_label = tk.Label(threshold_frame, text="Brillo (0-255):",
-                       font=("Segoe UI", 8), bg=COLORS['bg_secundario'],
-                       fg=COLORS['texto_secundario'])
-thresh_label.pack(anchor='w', pady=(0, 3))
-
-thresh_slider = tk.Scale(threshold_frame, from_=0, to=255, orient="horizontal",
-                        command=on_threshold_change, bg=COLORS['bg_principal'],
-                        fg=COLORS['texto_principal'], troughcolor=COLORS['bg_secundario'],
-                        highlightthickness=0, relief='flat', activebackground=COLORS['acento_primario'],
-                        length=150)
-thresh_slider.set(threshold_value)
-thresh_slider.pack(fill='x', padx=3)
-
-threshold_label = tk.Label(threshold_frame, text=f"Valor: {threshold_value}",
-                          font=("Segoe UI", 8, "bold"), bg=COLORS['bg_secundario'],
-                          fg=COLORS['exito'])
-threshold_label.pack(anchor='w', padx=3, pady=(3, 0))
-
-# COLUMNA DERECHA: Arduino
-col_derecha = tk.Frame(controles_frame_main, bg=COLORS['bg_principal'])
-col_derecha.pack(side='right', fill='both', expand=True, padx=(8, 0))
-
-# --- Sección 3: Puerto Arduino ---
-arduino_frame = tk.LabelFrame(col_derecha, text="Arduino",
-                             font=("Segoe UI", 9, "bold"),
-                             bg=COLORS['bg_secundario'], fg=COLORS['texto_principal'],
-                             padx=8, pady=6, relief='flat', bd=1)
-arduino_frame.pack(fill='x', pady=3)
-
-port_label = tk.Label(arduino_frame, text="Puerto Serial:",
-                     font=("Segoe UI", 8), bg=COLORS['bg_secundario'],
-                     fg=COLORS['texto_secundario'])
-port_label.pack(anchor='w', pady=(0, 3))
-
-ports = [port.device for port in serial.tools.list_ports.comports()]
-port_combo = ttk.Combobox(arduino_frame, values=ports, state="readonly",
-                         font=("Segoe UI", 8), width=12)
-port_combo.set(arduino_port if arduino_port in ports else (ports[0] if ports else ""))
-port_combo.bind("<<ComboboxSelected>>", on_port_select)
-port_combo.pack(fill='x', pady=(0, 3), padx=3)
-
-# Información de puertos
-if ports:
-    port_info = tk.Label(arduino_frame, text=f"Disponibles: {', '.join(ports)}",
-                        font=("Segoe UI", 7, "italic"), bg=COLORS['bg_secundario'],
-                        fg=COLORS['texto_secundario'], justify='left', wraplength=120)
-else:
-    port_info = tk.Label(arduino_frame, text="⚠️ No detectados",
-                        font=("Segoe UI", 7, "italic"), bg=COLORS['bg_secundario'],
-                        fg=COLORS['error'])
-port_info.pack(anchor='w', padx=3, pady=(2, 0), fill='x')
-
-# --- Sección 4: Botones Arduino (Grid 2x2) ---
-botones_arduino_frame = tk.Frame(col_derecha, bg=COLORS['bg_secundario'])
-botones_arduino_frame.pack(fill='x', pady=3, padx=3)
-
-def crear_boton_mejorado(parent, text, command, bg_color, fg_color, 
+
+def crear_boton_mejorado(parent, text, command, bg_color, fg_color,
                          hover_bg, active_bg, font_size=9):
     """Crea un botón con estilo mejorado y efectos hover"""
     btn = tk.Button(parent, text=text, command=command,
@@ -282,41 +67,253 @@ def crear_boton_mejorado(parent, text, command, bg_color, fg_color,
                    activebackground=active_bg, activeforeground=fg_color,
                    relief='flat', bd=0, padx=12, pady=6,
                    cursor="hand2", highlightthickness=0)
-    
+
     # Efectos hover
     def on_enter(event):
         btn.config(bg=hover_bg)
-    
+
     def on_leave(event):
         btn.config(bg=bg_color)
-    
+
     btn.bind("<Enter>", on_enter)
     btn.bind("<Leave>", on_leave)
-    
+
     return btn
 
-btn_guardar_config = crear_boton_mejorado(botones_arduino_frame, "💾 GUARDAR",
-                                         save_config,
-                                         COLORS['exito'], COLORS['bg_principal'],
-                                         '#00ff7a', '#00e060',
-                                         font_size=9)
-btn_guardar_config.pack(side='left', padx=3, fill='both', expand=True)
-
-btn_cancelar = crear_boton_mejorado(botones_arduino_frame, "❌ CANCELAR",
-                                   root.quit,
-                                   COLORS['error'], COLORS['texto_principal'],
-                                   '#ff6b6b', '#e53935',
-                                   font_size=9)
-btn_cancelar.pack(side='left', padx=3, fill='both', expand=True)
-
-# Loop de video
-update_frame()
-
-# Cierre seguro
-def on_closing():
-    if cap is not None:
-        cap.release()
-    root.destroy()
-
-root.protocol("WM_DELETE_WINDOW", on_closing)
-root.mainloop()
+
+class SetupCamara:
+    def __init__(self, root, servicios=None):
+        self.root = root
+        # Compartidos con las demás pantallas cuando corre dentro del lanzador
+        self.servicios = servicios or Servicios(CONFIG_FILE)
+
+        # Variables
+        self.cam_index = 0
+        self.threshold_value = 100
+        self.arduino_port = ""
+        self.camara = None
+
+        # Interfaz Tkinter
+        self.root.title("Setup Cámara y Arduino")
+        self.root.geometry("1024x768")
+        self.root.resizable(False, False)
+        self.root.configure(bg=COLORS['bg_principal'])
+
+        # Aplicar tema oscuro a ttk
+        style = ttk.Style()
+        style.theme_use('clam')
+        style.configure('TCombobox', fieldbackground=COLORS['bg_input'], background=COLORS['bg_input'])
+        style.configure('TScale', background=COLORS['bg_principal'])
+
+        # Cargar configuración antes de crear UI
+        self.load_config()
+        self.update_camera(self.cam_index)
+        self.crear_interfaz()
+
+        # Loop de video
+        self.update_frame()
+
+        # Cierre seguro
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def load_config(self):
+        # Cargar configuración
+        try:
+            setup = self.servicios.configuracion().get("setup_camara", {})
+            self.cam_index = setup.get("camera_index", 0)
+            self.threshold_value = setup.get("threshold", 100)
+            self.arduino_port = setup.get("arduino_port", "")
+        except FileNotFoundError:
+            pass
+
+    def save_config(self):
+        # Crear estructura por defecto si no existe
+        if not self.servicios.ruta_config.exists():
+            for seccion, valores in CONFIG_POR_DEFECTO.items():
+                self.servicios.guardar_seccion(seccion, valores)
+
+        # Actualizar solo la sección setup_camara
+        self.servicios.guardar_seccion("setup_camara", {
+            "camera_index": self.cam_index,
+            "threshold": self.threshold_value,
+            "arduino_port": self.arduino_port
+        })
+
+        messagebox.showinfo("Éxito", "Configuración guardada correctamente")
+
+    def update_camera(self, index):
+        # La cámara queda abierta en los servicios (el escaneo la reutiliza)
+        self.cam_index = index
+        self.camara = self.servicios.dispositivos.camara(self.cam_index)
+
+    def al_mostrar(self):
+        """El lanzador volvió a esta pantalla: recuperar la cámara si otra pantalla la cambió."""
+        self.update_camera(self.cam_index)
+
+    # Procesado del video y threshold
+    def update_frame(self):
+        # Sin procesar mientras la pantalla está oculta (lanzador en otra herramienta)
+        if self.root.winfo_ismapped() and self.camara is not None and self.camara.esta_activo():
+            _, frame = self.camara.ultimo_frame()
+            if frame is not None:
+                # SIN redimensionar - usar dimensiones reales 640x480
+                frame_rgb = cv2.cvtColor(process_frame(frame, self.threshold_value), cv2.COLOR_BGR2RGB)
+                img = Image.fromarray(frame_rgb)
+                imgtk = ImageTk.PhotoImage(image=img)
+                self.video_label.imgtk = imgtk
+                self.video_label.configure(image=imgtk)
+        self.root.after(33, self.update_frame)  # refrescar cada 33ms (~30 FPS)
+
+    def on_cam_change(self, val):
+        self.update_camera(int(val))
+
+    def on_threshold_change(self, val):
+        self.threshold_value = int(val)
+        self.threshold_label.config(text=f"Threshold: {self.threshold_value}")
+
+    def on_port_select(self, event):
+        self.arduino_port = self.port_combo.get()
+
+    def on_closing(self):
+        self.servicios.cerrar()
+        self.root.destroy()
+
+    def crear_interfaz(self):
+        root = self.root
+
+        # === TÍTULO ===
+        titulo_frame = tk.Frame(root, bg=COLORS['bg_principal'])
+        titulo_frame.pack(fill='x', padx=12, pady=5)
+
+        titulo = tk.Label(titulo_frame, text="CONFIGURACIÓN",
+                         font=("Segoe UI", 14, "bold"), bg=COLORS['bg_principal'],
+                         fg=COLORS['texto_principal'])
+        titulo.pack(anchor='w')
+
+        separador = tk.Frame(root, bg=COLORS['acento_primario'], height=1)
+        separador.pack(fill='x', padx=0)
+
+        # === ÁREA DE VIDEO (640x480 - FIJO, SIN ESCALAR) ===
+        video_frame = tk.Frame(root, bg=COLORS['bg_secundario'])
+        video_frame.pack(pady=5, padx=12, fill='both', expand=False)
+
+        video_label_titulo = tk.Label(video_frame, text="Vista Previa Cámara",
+                                     font=("Segoe UI", 9, "bold"),
+                                     bg=COLORS['bg_secundario'], fg=COLORS['texto_principal'])
+        video_label_titulo.pack(pady=3)
+
+        # Label EXACTAMENTE 640x480 - SIN REDIMENSIONAR
+        self.video_label = tk.Label(video_frame, bg='#000000', width=640, height=480)
+        self.video_label.pack()
+
+        # === CONTROLES - LAYOUT HORIZONTAL COMPACTO ===
+        controles_frame_main = tk.Frame(root, bg=COLORS['bg_principal'])
+        controles_frame_main.pack(fill='x', padx=12, pady=4)
+
+        # COLUMNA IZQUIERDA: Sliders verticales
+        col_izquierda = tk.Frame(controles_frame_main, bg=COLORS['bg_principal'])
+        col_izquierda.pack(side='left', fill='both', expand=True, padx=(0, 8))
+
+        # --- Sección 1: Cámara ---
+        camara_frame = tk.LabelFrame(col_izquierda, text="Cámara",
+                                     font=("Segoe UI", 9, "bold"),
+                                     bg=COLORS['bg_secundario'], fg=COLORS['texto_principal'],
+                                     padx=8, pady=6, relief='flat', bd=1)
+        camara_frame.pack(fill='x', pady=3)
+
+        cam_label = tk.Label(camara_frame, text="Índice (0-3):",
+                            font=("Segoe UI", 8), bg=COLORS['bg_secundario'],
+                            fg=COLORS['texto_secundario'])
+        cam_label.pack(anchor='w', pady=(0, 3))
+
+        cam_slider = tk.Scale(camara_frame, from_=0, to=3, orient="horizontal",
+                             command=self.on_cam_change, bg=COLORS['bg_principal'],
+                             fg=COLORS['texto_principal'], troughcolor=COLORS['bg_secundario'],
+                             highlightthickness=0, relief='flat', activebackground=COLORS['acento_primario'],
+                             length=150)
+        cam_slider.set(self.cam_index)
+        cam_slider.pack(fill='x', padx=3)
+
+        # --- Sección 2: Threshold ---
+        threshold_frame = tk.LabelFrame(col_izquierda, text="Threshold",
+                                       font=("Segoe UI", 9, "bold"),
+                                       bg=COLORS['bg_secundario'], fg=COLORS['texto_principal'],
+                                       padx=8, pady=6, relief='flat', bd=1)
+        threshold_frame.pack(fill='x', pady=3)
+
+        thresh_label = tk.Label(threshold_frame, text="Brillo (0-255):",
+                               font=("Segoe UI", 8), bg=COLORS['bg_secundario'],
+                               fg=COLORS['texto_secundario'])
+        thresh_label.pack(anchor='w', pady=(0, 3))
+
+        thresh_slider = tk.Scale(threshold_frame, from_=0, to=255, orient="horizontal",
+                                command=self.on_threshold_change, bg=COLORS['bg_principal'],
+                                fg=COLORS['texto_principal'], troughcolor=COLORS['bg_secundario'],
+                                highlightthickness=0, relief='flat', activebackground=COLORS['acento_primario'],
+                                length=150)
+        thresh_slider.set(self.threshold_value)
+        thresh_slider.pack(fill='x', padx=3)
+
+        self.threshold_label = tk.Label(threshold_frame, text=f"Valor: {self.threshold_value}",
+                                       font=("Segoe UI", 8, "bold"), bg=COLORS['bg_secundario'],
+                                       fg=COLORS['exito'])
+        self.threshold_label.pack(anchor='w', padx=3, pady=(3, 0))
+
+        # COLUMNA DERECHA: Arduino
+        col_derecha = tk.Frame(controles_frame_main, bg=COLORS['bg_principal'])
+        col_derecha.pack(side='right', fill='both', expand=True, padx=(8, 0))
+
+        # --- Sección 3: Puerto Arduino ---
+        arduino_frame = tk.LabelFrame(col_derecha, text="Arduino",
+                                     font=("Segoe UI", 9, "bold"),
+                                     bg=COLORS['bg_secundario'], fg=COLORS['texto_principal'],
+                                     padx=8, pady=6, relief='flat', bd=1)
+        arduino_frame.pack(fill='x', pady=3)
+
+        port_label = tk.Label(arduino_frame, text="Puerto Serial:",
+                             font=("Segoe UI", 8), bg=COLORS['bg_secundario'],
+                             fg=COLORS['texto_secundario'])
+        port_label.pack(anchor='w', pady=(0, 3))
+
+        ports = [port.device for port in serial.tools.list_ports.comports()]
+        self.port_combo = ttk.Combobox(arduino_frame, values=ports, state="readonly",
+                                      font=("Segoe UI", 8), width=12)
+        self.port_combo.set(self.arduino_port if self.arduino_port in ports else (ports[0] if ports else ""))
+        self.port_combo.bind("<<ComboboxSelected>>", self.on_port_select)
+        self.port_combo.pack(fill='x', pady=(0, 3), padx=3)
+
+        # Información de puertos
+        if ports:
+            port_info = tk.Label(arduino_frame, text=f"Disponibles: {', '.join(ports)}",
+                                font=("Segoe UI", 7, "italic"), bg=COLORS['bg_secundario'],
+                                fg=COLORS['texto_secundario'], justify='left', wraplength=120)
+        else:
+            port_info = tk.Label(arduino_frame, text="⚠️ No detectados",
+                                font=("Segoe UI", 7, "italic"), bg=COLORS['bg_secundario'],
+                                fg=COLORS['error'])
+        port_info.pack(anchor='w', padx=3, pady=(2, 0), fill='x')
+
+        # --- Sección 4: Botones Arduino (Grid 2x2) ---
+        botones_arduino_frame = tk.Frame(col_derecha, bg=COLORS['bg_secundario'])
+        botones_arduino_frame.pack(fill='x', pady=3, padx=3)
+
+        btn_guardar_config = crear_boton_mejorado(botones_arduino_frame, "💾 GUARDAR",
+                                                 self.save_config,
+                                                 COLORS['exito'], COLORS['bg_principal'],
+                                                 '#00ff7a', '#00e060',
+                                                 font_size=9)
+        btn_guardar_config.pack(side='left', padx=3, fill='both', expand=True)
+
+        # En el lanzador, quit() vuelve al menú
+        btn_cancelar = crear_boton_mejorado(botones_arduino_frame, "❌ CANCELAR",
+                                           root.quit,
+                                           COLORS['error'], COLORS['texto_principal'],
+                                           '#ff6b6b', '#e53935',
+                                           font_size=9)
+        btn_cancelar.pack(side='left', padx=3, fill='both', expand=True)
+
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = SetupCamara(root)
+    root.mainloop()
@@ -1,13 +1,15 @@
 import numpy as np
 import pyvista as pv
 
+from nucleo.almacenamiento import cargar_puntos
+
 # --- Configuración ---
-FILE_PATH = "Escaneo.csv"  # ruta del archivo .csv
+FILE_PATH = "Escaneo.csv"  # ruta del archivo .csv o .nube
 Z_MIN = 0   # altura mínima
 Z_MAX = 120  # altura máxima
 
-# Cargar archivo CSV
-points = np.loadtxt(FILE_PATH, delimiter=',', skiprows=1)
+# Cargar escaneo (CSV o binario)
+points = cargar_puntos(FILE_PATH)
 
 # Filtrar por altura
 mask = (points[:, 2] >= Z_MIN) & (points[:, 2] <= Z_MAX)
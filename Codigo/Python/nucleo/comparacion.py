@@ -0,0 +1,641 @@
+"""
+Comparación de nubes: alineación por giro en Z y similitud por Chamfer.
+
+Las nubes se centran en X e Y (el eje de la mesa no coincide con el de la
+pieza), se reducen a un máximo de puntos y se busca el giro que minimiza
+la distancia Chamfer contra el patrón: primero se eligen unos pocos giros
+candidatos y después se refina por bisección alrededor del mejor. La
+similitud es lineal en la distancia, relativa a la diagonal del patrón.
+
+Los candidatos salen de la firma cilíndrica de cada nube (radio medio por
+ángulo y altura): la correlación circular por FFT compara las firmas en
+todos los giros a la vez y los mínimos de la diferencia son los
+candidatos. Cada candidato se refina dentro de ±360/muestras_escaneo
+grados, el paso entre muestras del giro: la firma puede quedar en el
+mínimo vecino de la distancia, que oscila con ese paso. Con
+metodo_giro='grilla', o si las firmas no tienen alturas en común, se usa
+la búsqueda anterior, en pasos de angulo_paso grados.
+
+La búsqueda recorre una pirámide de resoluciones (niveles_piramide): los
+candidatos se evalúan y refinan primero con unos cientos de puntos, los
+mejores siguen con unos miles y solo el giro elegido hace el último paso
+del refinamiento con las nubes reducidas a num_muestras, que dan la
+similitud. En los niveles bajos solo se submuestrean los puntos que se
+consultan: los árboles son siempre los de las nubes reducidas, así que la
+distancia es una estimación de la Chamfer final y no la de dos nubes
+ralas.
+
+Opcionalmente (icp) el giro encontrado se ajusta con ICP punto a punto:
+una transformación rígida completa, o restringida al giro y el
+desplazamiento, o al giro y la altura (inclinación o altura de la pieza
+sobre la cinta). Se usa solo si mejora la distancia Chamfer.
+
+Durante la búsqueda los KD-trees se construyen una sola vez (AlineadorGiro):
+para cada ángulo solo se giran los puntos que se consultan. El patrón se
+prepara aparte (PatronPreparado: centrado, reducido, diagonal y árboles) y
+se puede reutilizar en todas las comparaciones (ver nucleo.patrones).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# Hilos de las consultas a los KD-trees (-1: todos los núcleos)
+HILOS_CONSULTA = -1
+
+# Búsqueda del giro: 'firma' (candidatos por FFT de la firma cilíndrica) o 'grilla' (pasos de angulo_paso)
+METODOS_GIRO = ('firma', 'grilla')
+
+# Grados de libertad del ICP: transformación rígida completa, giro en Z y
+# desplazamiento en X, Y, Z, o giro en Z y altura
+GRADOS_ICP = ('rigido', 'giro_desplazamiento', 'giro_altura')
+
+# Fracción de pares (los más cercanos) que usa cada iteración del ICP: los
+# puntos sin correspondencia en la otra nube no arrastran la transformación
+FRACCION_PARES_ICP = 0.9
+
+# Resultado de comparar una nube contra un patrón: nubes centradas (la
+# comparada ya girada), distancia de cada punto comparado al patrón, giro y
+# transformación del ICP (matriz 4x4 aplicada a la comparada centrada; None
+# sin ICP)
+ResultadoComparacion = namedtuple('ResultadoComparacion',
+                                  ['similitud', 'patron', 'comparada', 'dists', 'angulo', 'transformacion'],
+                                  defaults=(None,))
+
+
+class ParametrosComparacion:
+    """Parámetros de la alineación y de la similitud ('parametros_comparacion')."""
+
+    def __init__(self, angulo_paso=45, iteraciones=5, num_muestras=30000, umbral_chamfer_frac=0.25,
+                 umbral_identificacion=85.0, semilla=None, procesos=None, metodo_giro='firma',
+                 bins_angulo=360, bins_altura=32, candidatos_giro=3, niveles_piramide=(500, 3000),
+                 candidatos_por_nivel=2, icp=False, grados_icp='rigido', iteraciones_icp=30,
+                 tolerancia_icp=1e-4, muestras_icp=5000, muestras_escaneo=50):
+        self.angulo_paso = angulo_paso                      # Ángulo grueso (grados, metodo_giro='grilla')
+        self.iteraciones = iteraciones                      # Iteraciones del refinamiento
+        self.num_muestras = num_muestras                    # Puntos máximos por nube al alinear
+        self.umbral_chamfer_frac = umbral_chamfer_frac      # Chamfer (fracción de la diagonal) con 0 %
+        self.umbral_identificacion = umbral_identificacion  # Similitud mínima para aprobar (%)
+        self.semilla = semilla                              # Semilla del submuestreo (None: aleatoria)
+        self.procesos = procesos                            # Procesos para varios patrones (None: uno por núcleo)
+        self.metodo_giro = metodo_giro                      # Búsqueda del giro (METODOS_GIRO)
+        self.bins_angulo = bins_angulo                      # Celdas de la firma cilíndrica en ángulo
+        self.bins_altura = bins_altura                      # Celdas de la firma cilíndrica en altura
+        self.candidatos_giro = candidatos_giro              # Giros de la firma evaluados con Chamfer
+        self.niveles_piramide = tuple(niveles_piramide)     # Puntos de los niveles previos a num_muestras
+        self.candidatos_por_nivel = candidatos_por_nivel    # Giros que pasan de un nivel al siguiente
+        self.icp = icp                                      # Ajustar el giro con ICP
+        self.grados_icp = grados_icp                        # Grados de libertad del ICP (GRADOS_ICP)
+        self.iteraciones_icp = iteraciones_icp              # Iteraciones máximas del ICP
+        self.tolerancia_icp = tolerancia_icp                # Mejora relativa mínima por iteración
+        self.muestras_icp = muestras_icp                    # Puntos de la comparada que usa el ICP
+        self.muestras_escaneo = muestras_escaneo            # Muestras por vuelta del escaneo más ralo
+
+    def ventana_firma(self):
+        """Grados a cada lado de un candidato de la firma que cubre su refinamiento (un paso del giro)."""
+        return 360.0 / max(1, int(self.muestras_escaneo))
+
+    @classmethod
+    def desde_config(cls, config):
+        """Crea los parámetros a partir de la sección 'parametros_comparacion'."""
+        comparacion = config.get('parametros_comparacion', {})
+        predeterminados = cls()
+        return cls(**{nombre: comparacion.get(nombre, valor)
+                      for nombre, valor in vars(predeterminados).items()})
+
+    def generador(self):
+        """Generador del submuestreo (None: el global de numpy, aleatorio)."""
+        return np.random.default_rng(self.semilla) if self.semilla is not None else None
+
+
+# =============================================================================
+# GEOMETRÍA
+# =============================================================================
+
+def center_cloud(points):
+    """Centra la nube en X e Y (Z permanece igual). Devuelve (nube, centroide)."""
+    if points.size == 0:
+        return points, np.array([0, 0, 0])
+    centroid = np.array([np.mean(points[:, 0]), np.mean(points[:, 1]), 0])
+    return points - centroid, centroid
+
+
+def rotate_z(points, angle_deg):
+    angle_rad = np.radians(angle_deg)
+    cos_a = np.cos(angle_rad)
+    sin_a = np.sin(angle_rad)
+    rotation_matrix = np.array([
+        [cos_a, -sin_a, 0],
+        [sin_a,  cos_a, 0],
+        [0,      0,     1]
+    ])
+    return points @ rotation_matrix.T
+
+
+def downsample_cloud(points, max_points, rng=None):
+    """Reduce el número de puntos de una nube si es demasiado grande."""
+    if len(points) > max_points:
+        rng = np.random if rng is None else rng
+        indices = rng.choice(len(points), max_points, replace=False)
+        return points[indices]
+    return points
+
+
+# =============================================================================
+# SIMILITUD Y ALINEACIÓN
+# =============================================================================
+
+def _kdtree(puntos):
+    # scipy se carga al comparar, no al importar (retrasa la apertura de las ventanas)
+    from scipy.spatial import KDTree
+    return KDTree(puntos)
+
+
+def get_chamfer_and_dists(patron, comparada, arbol_patron=None):
+    """Calcula la distancia Chamfer."""
+    arbol_patron = arbol_patron if arbol_patron is not None else _kdtree(patron)
+    arbol_comparada = _kdtree(comparada)
+
+    dists_comparada_a_patron, _ = arbol_patron.query(comparada, k=1, workers=HILOS_CONSULTA)
+    dists_patron_a_comparada, _ = arbol_comparada.query(patron, k=1, workers=HILOS_CONSULTA)
+
+    distancia_chamfer = np.mean(dists_comparada_a_patron) + np.mean(dists_patron_a_comparada)
+    return distancia_chamfer, dists_comparada_a_patron
+
+
+class AlineadorGiro:
+    """
+    Distancia Chamfer entre el patrón y la nube comparada girada en Z.
+
+    Los árboles del patrón y de la comparada sin girar se construyen una
+    vez (o vienen ya construidos). Para cada ángulo se gira la comparada
+    para consultar el árbol del patrón, y el patrón en sentido inverso para
+    consultar el de la comparada: las distancias son las mismas que girando
+    la comparada. Los árboles pueden ser de nubes más densas que los puntos
+    que se consultan (una submuestra de cada nube).
+    """
+
+    def __init__(self, patron, comparada, arbol_patron=None, arbol_comparada=None):
+        self.patron = patron
+        self.comparada = comparada
+        self.arbol_patron = arbol_patron if arbol_patron is not None else _kdtree(patron)
+        self.arbol_comparada = arbol_comparada if arbol_comparada is not None else _kdtree(comparada)
+
+    def chamfer(self, angulo_deg):
+        """(distancia Chamfer, distancia de cada punto comparado al patrón) con la comparada girada."""
+        dists_comparada_a_patron, _ = self.arbol_patron.query(
+            rotate_z(self.comparada, angulo_deg), k=1, workers=HILOS_CONSULTA)
+        dists_patron_a_comparada, _ = self.arbol_comparada.query(
+            rotate_z(self.patron, -angulo_deg), k=1, workers=HILOS_CONSULTA)
+
+        distancia_chamfer = np.mean(dists_comparada_a_patron) + np.mean(dists_patron_a_comparada)
+        return distancia_chamfer, dists_comparada_a_patron
+
+
+def diagonal_caja(puntos):
+    """Diagonal de la caja que contiene la nube."""
+    return float(np.linalg.norm(np.max(puntos, axis=0) - np.min(puntos, axis=0)))
+
+
+def get_similarity_percent(patron, distancia_chamfer, umbral_chamfer_frac=0.25, diagonal=None):
+    """Convierte la distancia Chamfer en porcentaje de similitud (función lineal)."""
+    norm_factor = diagonal_caja(patron) if diagonal is None else diagonal
+
+    if norm_factor == 0:
+        return 100.0 if distancia_chamfer == 0 else 0.0
+
+    # Umbral para el CÁLCULO
+    threshold_value = max(1e-9, umbral_chamfer_frac * norm_factor)
+    # Normalización lineal: 100% cuando distancia=0, 0% cuando distancia=threshold
+    similarity_percent = max(0.0, min(100.0, (1.0 - distancia_chamfer / threshold_value) * 100.0))
+
+    return similarity_percent
+
+
+def find_best_alignment(patron, comparada, angulo_paso=45, iteraciones=5, arbol_patron=None,
+                        angulos_iniciales=None, intervalo=None, arbol_comparada=None):
+    """
+    Rota la pieza para encontrar la mejor alineación. Devuelve (angulo, chamfer, dists, rotada).
+
+    Con angulos_iniciales (por ejemplo, los candidatos de la firma) se
+    evalúan esos giros en lugar de la grilla de angulo_paso, y el
+    refinamiento arranca con `intervalo` en lugar de angulo_paso / 2.
+    intervalo puede ser una secuencia con uno por giro inicial.
+    """
+    paso = int(angulo_paso) if angulo_paso >= 1 else 5
+    lista_angulos = np.arange(0, 360, paso) if angulos_iniciales is None else angulos_iniciales
+    intervalo = float(angulo_paso / 2) if intervalo is None else intervalo
+    intervalos = np.broadcast_to(np.asarray(intervalo, dtype=np.float64), (len(lista_angulos),))
+
+    alineador = AlineadorGiro(patron, comparada, arbol_patron, arbol_comparada)
+    mejor_angulo = 0.0
+    mejor_distancia = np.inf
+    mejores_distancias_por_punto = None
+    intervalo = float(intervalos[0]) if len(intervalos) else float(angulo_paso / 2)
+
+    # Búsqueda gruesa
+    for ang, intervalo_ang in zip(lista_angulos, intervalos):
+        dist_chamfer, dists_puntos = alineador.chamfer(ang)
+        if dist_chamfer < mejor_distancia:
+            mejor_distancia = dist_chamfer
+            mejor_angulo = ang
+            mejores_distancias_por_punto = dists_puntos
+            intervalo = float(intervalo_ang)
+
+    # Refinamiento fino
+    mejor_angulo, mejor_distancia, mejores_distancias_por_punto = _refinar(
+        alineador, mejor_angulo, mejor_distancia, mejores_distancias_por_punto, intervalo, iteraciones)
+
+    return (float(mejor_angulo % 360), mejor_distancia, mejores_distancias_por_punto,
+            rotate_z(comparada, mejor_angulo))
+
+
+def _refinar(alineador, angulo, distancia, dists, intervalo, iteraciones):
+    """Bisección alrededor de `angulo`: prueba ±intervalo/2, ±intervalo/4, ... y se queda con el mejor."""
+    for i in range(int(iteraciones)):
+        mitad = intervalo / 2.0
+        for ang in np.mod([angulo - mitad, angulo + mitad], 360):
+            dist_chamfer, dists_puntos = alineador.chamfer(ang)
+            if dist_chamfer < distancia:
+                distancia = dist_chamfer
+                angulo = float(ang)
+                dists = dists_puntos
+        intervalo = mitad
+    return angulo, distancia, dists
+
+
+def buscar_giro_piramide(niveles, angulos_iniciales, intervalo, iteraciones=5, conservar=2,
+                         arbol_patron=None, arbol_comparada=None):
+    """
+    Busca el giro recorriendo niveles de resolución creciente.
+
+    niveles es una lista [(patron, comparada), ...] de menor a mayor
+    cantidad de puntos; los niveles bajos son submuestras del último, cuyos
+    árboles (arbol_patron, arbol_comparada) se consultan en todos los
+    niveles. En cada nivel previo al último se evalúan los giros que
+    llegan, se conservan los `conservar` mejores y se refinan por
+    bisección. El mejor giro se refina en el último nivel con el intervalo
+    que queda: una iteración es de ese nivel y las demás se reparten entre
+    los previos. intervalo puede ser una secuencia
+    con uno por giro inicial. Con un solo nivel es la búsqueda de
+    find_best_alignment(). Devuelve (ángulo, chamfer en el último nivel).
+    """
+    patron, comparada = niveles[-1]
+    if len(niveles) == 1:
+        angulo, distancia, _, _ = find_best_alignment(patron, comparada, iteraciones=iteraciones,
+                                                      arbol_patron=arbol_patron,
+                                                      angulos_iniciales=angulos_iniciales, intervalo=intervalo,
+                                                      arbol_comparada=arbol_comparada)
+        return angulo, distancia
+
+    arbol_patron = arbol_patron if arbol_patron is not None else _kdtree(patron)
+    arbol_comparada = arbol_comparada if arbol_comparada is not None else _kdtree(comparada)
+    previos = len(niveles) - 1
+    pasos_finales = min(1, int(iteraciones))
+    restantes = int(iteraciones) - pasos_finales
+    pasos = [restantes // previos + (1 if i < restantes % previos else 0) for i in range(previos)]
+    intervalos = np.broadcast_to(np.asarray(intervalo, dtype=np.float64), (len(angulos_iniciales),))
+    giros = [(float(a), float(i)) for a, i in zip(angulos_iniciales, intervalos)]
+    for (patron_nivel, comparada_nivel), pasos_nivel in zip(niveles[:-1], pasos):
+        alineador = AlineadorGiro(patron_nivel, comparada_nivel, arbol_patron, arbol_comparada)
+        evaluados = sorted(((alineador.chamfer(a)[0], a, i) for a, i in giros), key=lambda e: e[0])[:int(conservar)]
+        refinados = [(_refinar(alineador, a, d, None, i, pasos_nivel), i / 2 ** pasos_nivel)
+                     for d, a, i in evaluados]
+        refinados.sort(key=lambda r: r[0][1])
+        giros = [(angulo, i) for (angulo, _, _), i in refinados]
+
+    # Al último nivel (el de la similitud) pasa solo el mejor giro: la
+    # distancia de los niveles bajos es una estimación, el último paso de la
+    # bisección se decide con las nubes completas
+    angulo, intervalo_final = giros[0]
+    alineador = AlineadorGiro(patron, comparada, arbol_patron, arbol_comparada)
+    distancia, _ = alineador.chamfer(angulo)
+    angulo, distancia, _ = _refinar(alineador, angulo, distancia, None, intervalo_final, pasos_finales)
+    return float(angulo % 360), distancia
+
+
+# =============================================================================
+# AJUSTE FINO (ICP)
+# =============================================================================
+
+def matriz_giro_z(angulo_deg):
+    """Transformación 4x4 del giro en Z (la de rotate_z)."""
+    matriz = np.eye(4)
+    angulo_rad = np.radians(angulo_deg)
+    matriz[:2, :2] = [[np.cos(angulo_rad), -np.sin(angulo_rad)], [np.sin(angulo_rad), np.cos(angulo_rad)]]
+    return matriz
+
+
+def transformar(puntos, matriz):
+    """Aplica una transformación 4x4 a una nube (N, 3)."""
+    return puntos @ matriz[:3, :3].T + matriz[:3, 3]
+
+
+def transformacion_optima(origen, destino, grados='rigido'):
+    """
+    Transformación 4x4 que minimiza la suma de |T·origen - destino|² para
+    pares de puntos, con los grados de libertad de GRADOS_ICP.
+    """
+    matriz = np.eye(4)
+    if grados == 'rigido':
+        # Kabsch: rotación por SVD de la covarianza cruzada (sin reflexiones)
+        centro_origen, centro_destino = origen.mean(axis=0), destino.mean(axis=0)
+        covarianza = (origen - centro_origen).T @ (destino - centro_destino)
+        u, _, vt = np.linalg.svd(covarianza)
+        signo = np.sign(np.linalg.det(vt.T @ u.T)) or 1.0
+        rotacion = vt.T @ np.diag([1.0, 1.0, signo]) @ u.T
+        matriz[:3, :3] = rotacion
+        matriz[:3, 3] = centro_destino - rotacion @ centro_origen
+        return matriz
+    if grados not in GRADOS_ICP:
+        raise ValueError(f"grados_icp desconocido: {grados!r} (opciones: {', '.join(GRADOS_ICP)})")
+
+    # Giro en Z: alrededor del eje de la mesa si no hay desplazamiento en X, Y
+    if grados == 'giro_desplazamiento':
+        centro_origen, centro_destino = origen[:, :2].mean(axis=0), destino[:, :2].mean(axis=0)
+    else:
+        centro_origen = centro_destino = np.zeros(2)
+    a, b = origen[:, :2] - centro_origen, destino[:, :2] - centro_destino
+    angulo = np.arctan2(np.sum(a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]), np.sum(a[:, 0] * b[:, 0] + a[:, 1] * b[:, 1]))
+    matriz = matriz_giro_z(np.degrees(angulo))
+    matriz[:2, 3] = centro_destino - matriz[:2, :2] @ centro_origen
+    matriz[2, 3] = np.mean(destino[:, 2] - origen[:, 2])
+    return matriz
+
+
+def ajustar_icp(arbol_patron, comparada, inicial, grados='rigido', iteraciones=30, tolerancia=1e-4):
+    """
+    ICP punto a punto de la comparada contra el árbol del patrón (ya
+    construido; sus puntos son los destinos), a partir de la transformación
+    `inicial`. Termina cuando la distancia media mejora menos que
+    `tolerancia` (relativa); un paso que la empeora se descarta. Devuelve
+    (transformación 4x4, distancia media).
+    """
+    matriz = np.array(inicial, dtype=np.float64)
+    movida = transformar(comparada, matriz)
+    dists, indices = arbol_patron.query(movida, k=1, workers=HILOS_CONSULTA)
+    media = float(np.mean(dists))
+    for _ in range(int(iteraciones)):
+        pares = dists <= np.quantile(dists, FRACCION_PARES_ICP)
+        paso = transformacion_optima(movida[pares], arbol_patron.data[indices[pares]], grados)
+        nueva = paso @ matriz
+        movida_nueva = transformar(comparada, nueva)
+        dists_nuevas, indices_nuevos = arbol_patron.query(movida_nueva, k=1, workers=HILOS_CONSULTA)
+        media_nueva = float(np.mean(dists_nuevas))
+        if media_nueva >= media:
+            # El paso empeoró el ajuste: queda la transformación anterior
+            break
+        mejora = media - media_nueva
+        matriz, movida, dists, indices, media = nueva, movida_nueva, dists_nuevas, indices_nuevos, media_nueva
+        if mejora <= tolerancia * (media + mejora):
+            break
+    return matriz, media
+
+
+def chamfer_transformada(patron, comparada, matriz, arbol_patron, arbol_comparada):
+    """Distancia Chamfer con la comparada movida por `matriz` (sin reconstruir los árboles)."""
+    dists_comparada_a_patron, _ = arbol_patron.query(transformar(comparada, matriz), k=1, workers=HILOS_CONSULTA)
+    dists_patron_a_comparada, _ = arbol_comparada.query(transformar(patron, np.linalg.inv(matriz)), k=1,
+                                                        workers=HILOS_CONSULTA)
+    return np.mean(dists_comparada_a_patron) + np.mean(dists_patron_a_comparada)
+
+
+# =============================================================================
+# FIRMA CILÍNDRICA
+# =============================================================================
+
+class FirmaCilindrica:
+    """
+    Radio medio de una nube centrada por celda de ángulo y altura.
+
+    Las celdas de ángulo vacías de cada fila (entre dos muestras del giro)
+    se interpolan con las vecinas; las filas con menos de dos celdas con
+    puntos no se usan. Las alturas se dividen con bordes_z, que para la
+    nube comparada son los del patrón.
+    """
+
+    def __init__(self, radios, filas, bordes_z):
+        self.radios = radios                    # (bins_altura, bins_angulo) float64
+        self.filas = filas                      # (bins_altura,) bool, filas con datos
+        self.bordes_z = bordes_z                # (bins_altura + 1,)
+
+    @property
+    def bins_angulo(self):
+        return self.radios.shape[1]
+
+    @classmethod
+    def desde_puntos(cls, puntos_centrados, bins_angulo=360, bins_altura=32, bordes_z=None):
+        puntos = np.asarray(puntos_centrados, dtype=np.float64)
+        if bordes_z is None:
+            bordes_z = np.linspace(np.min(puntos[:, 2]), np.max(puntos[:, 2]), bins_altura + 1)
+        bins_altura = len(bordes_z) - 1
+
+        angulos = np.mod(np.arctan2(puntos[:, 1], puntos[:, 0]), 2 * np.pi)
+        columna = np.minimum((angulos * bins_angulo / (2 * np.pi)).astype(np.int64), bins_angulo - 1)
+        fila = np.searchsorted(bordes_z, puntos[:, 2], side='right') - 1
+        # El punto más alto cae justo en el último borde
+        fila[puntos[:, 2] == bordes_z[-1]] = bins_altura - 1
+        dentro = (fila >= 0) & (fila < bins_altura)
+        celda = fila[dentro] * bins_angulo + columna[dentro]
+
+        tamano = bins_altura * bins_angulo
+        suma = np.bincount(celda, weights=np.hypot(puntos[dentro, 0], puntos[dentro, 1]), minlength=tamano)
+        cuenta = np.bincount(celda, minlength=tamano)
+        suma = suma.reshape(bins_altura, bins_angulo)
+        cuenta = cuenta.reshape(bins_altura, bins_angulo)
+
+        radios = np.zeros((bins_altura, bins_angulo))
+        filas = np.zeros(bins_altura, dtype=bool)
+        columnas = np.arange(bins_angulo)
+        for i in range(bins_altura):
+            llenas = cuenta[i] > 0
+            if np.count_nonzero(llenas) >= 2:
+                radios[i] = np.interp(columnas, columnas[llenas], suma[i, llenas] / cuenta[i, llenas],
+                                      period=bins_angulo)
+                filas[i] = True
+        return cls(radios, filas, np.asarray(bordes_z, dtype=np.float64))
+
+    def de_comparada(self, puntos_centrados):
+        """Firma de otra nube con las mismas celdas que esta."""
+        return FirmaCilindrica.desde_puntos(puntos_centrados, self.bins_angulo, bordes_z=self.bordes_z)
+
+    def giros_candidatos(self, otra, cantidad=3):
+        """
+        Giros (grados) que llevan la nube de `otra` sobre esta, del más al
+        menos parecido: mínimos locales de la diferencia cuadrática entre
+        firmas, calculada para todos los giros con una correlación por FFT.
+        Lista vacía si las firmas no tienen filas en común.
+        """
+        comunes = self.filas & otra.filas
+        if not np.any(comunes):
+            return []
+        propia, ajena = self.radios[comunes], otra.radios[comunes]
+        # Girar la otra nube `s` celdas: sum((propia(θ) - ajena(θ - s))²) = const - 2·correlación(s)
+        espectro = np.sum(np.fft.rfft(propia, axis=1) * np.conj(np.fft.rfft(ajena, axis=1)), axis=0)
+        correlacion = np.fft.irfft(espectro, n=self.bins_angulo)
+        diferencia = np.sum(propia ** 2) + np.sum(ajena ** 2) - 2 * correlacion
+
+        minimos = np.flatnonzero((diferencia <= np.roll(diferencia, 1)) & (diferencia <= np.roll(diferencia, -1)))
+        mejores = minimos[np.argsort(diferencia[minimos], kind='stable')][:int(cantidad)]
+        return list(mejores * 360.0 / self.bins_angulo)
+
+
+# =============================================================================
+# PATRÓN PREPARADO
+# =============================================================================
+
+class PatronPreparado:
+    """
+    Todo lo que la comparación necesita de un patrón y no depende de la nube
+    comparada: nube centrada, nube reducida a num_muestras, diagonal de la
+    reducida (escala de la similitud), descriptores, firma cilíndrica y
+    KD-trees (se construyen la primera vez que se usan y quedan en memoria).
+    """
+
+    def __init__(self, centrado, reducido, diagonal, descriptores=None, firma=None, niveles=()):
+        self.centrado = centrado
+        self.reducido = reducido
+        self.diagonal = float(diagonal)
+        self.descriptores = descriptores if descriptores is not None else describir_nube(centrado)
+        self.firma = firma
+        self.niveles = list(niveles)            # Submuestras de la reducida, de menor a mayor
+        self._arbol_reducido = None
+        self._arbol_completo = None
+
+    @classmethod
+    def desde_puntos(cls, puntos, parametros=None, rng=None):
+        """Prepara un patrón a partir de sus puntos. None si tiene valores no finitos."""
+        parametros = parametros or ParametrosComparacion()
+        centrado, _ = center_cloud(np.asarray(puntos))
+        if not np.all(np.isfinite(centrado)):
+            return None
+        reducido = downsample_cloud(centrado, parametros.num_muestras, rng)
+        firma = FirmaCilindrica.desde_puntos(centrado, parametros.bins_angulo, parametros.bins_altura)
+        niveles = [downsample_cloud(reducido, int(n), rng) for n in sorted(parametros.niveles_piramide)
+                   if int(n) < len(reducido)]
+        return cls(centrado, reducido, diagonal_caja(reducido), firma=firma, niveles=niveles)
+
+    @property
+    def arbol_reducido(self):
+        if self._arbol_reducido is None:
+            self._arbol_reducido = _kdtree(self.reducido)
+        return self._arbol_reducido
+
+    @property
+    def arbol_completo(self):
+        if self._arbol_completo is None:
+            self._arbol_completo = _kdtree(self.centrado)
+        return self._arbol_completo
+
+
+def describir_nube(puntos_centrados):
+    """Descriptores baratos de una nube centrada (tamaño, caja, radio y altura)."""
+    radios = np.linalg.norm(puntos_centrados[:, :2], axis=1)
+    return {
+        'num_puntos': len(puntos_centrados),
+        'caja_min': np.min(puntos_centrados, axis=0).astype(np.float64),
+        'caja_max': np.max(puntos_centrados, axis=0).astype(np.float64),
+        'radio_max': float(np.max(radios)),
+        'radio_medio': float(np.mean(radios)),
+    }
+
+
+def alinear_con_patron(patron, puntos_comparada_centrada, parametros=None, rng=None):
+    """
+    Giro de la nube comparada (ya centrada) que mejor se ajusta a un patrón
+    preparado, calculado sobre las nubes reducidas. Devuelve (similitud,
+    ángulo, transformación 4x4 del ICP o None).
+    """
+    parametros = parametros or ParametrosComparacion()
+    rng = parametros.generador() if rng is None else rng
+    puntos_comparada_down = downsample_cloud(puntos_comparada_centrada, parametros.num_muestras, rng)
+
+    candidatos = []
+    if parametros.metodo_giro == 'firma' and patron.firma is not None:
+        candidatos = patron.firma.giros_candidatos(patron.firma.de_comparada(puntos_comparada_down),
+                                                   parametros.candidatos_giro)
+        # El primer paso de la bisección prueba ±un paso del giro: alcanza el
+        # mínimo vecino si la firma cayó a su lado
+        intervalo = 2 * parametros.ventana_firma()
+    if not candidatos:
+        # Grilla de angulo_paso (sin firma o sin alturas en común)
+        paso = int(parametros.angulo_paso) if parametros.angulo_paso >= 1 else 5
+        candidatos = list(np.arange(0, 360, paso))
+        intervalo = parametros.angulo_paso / 2
+
+    # Cada nivel del patrón con una submuestra de la comparada del mismo tamaño
+    niveles = [(nivel, downsample_cloud(puntos_comparada_down, len(nivel), rng)) for nivel in patron.niveles]
+    niveles.append((patron.reducido, puntos_comparada_down))
+    arbol_comparada = _kdtree(puntos_comparada_down)
+    mejor_angulo, mejor_distancia = buscar_giro_piramide(niveles, candidatos, intervalo, parametros.iteraciones,
+                                                         parametros.candidatos_por_nivel, patron.arbol_reducido,
+                                                         arbol_comparada)
+
+    transformacion = None
+    if parametros.icp:
+        muestra = downsample_cloud(puntos_comparada_down, parametros.muestras_icp, rng)
+        matriz, _ = ajustar_icp(patron.arbol_reducido, muestra, matriz_giro_z(mejor_angulo), parametros.grados_icp,
+                                parametros.iteraciones_icp, parametros.tolerancia_icp)
+        distancia_icp = chamfer_transformada(patron.reducido, puntos_comparada_down, matriz, patron.arbol_reducido,
+                                             arbol_comparada)
+        if distancia_icp < mejor_distancia:
+            transformacion, mejor_distancia = matriz, distancia_icp
+            mejor_angulo = float(np.degrees(np.arctan2(matriz[1, 0], matriz[0, 0])) % 360)
+
+    similitud = get_similarity_percent(patron.reducido, mejor_distancia, parametros.umbral_chamfer_frac,
+                                       patron.diagonal)
+    return similitud, mejor_angulo, transformacion
+
+
+def resultado_completo(patron, puntos_comparada_centrada, similitud, angulo, transformacion=None):
+    """
+    ResultadoComparacion con las nubes completas (para graficar) girando la
+    comparada `angulo`, o moviéndola con `transformacion` si hubo ICP.
+    """
+    if transformacion is None:
+        final_rotated_centrada = rotate_z(puntos_comparada_centrada, angulo)
+    else:
+        final_rotated_centrada = transformar(puntos_comparada_centrada, transformacion)
+    # Para graficar solo hace falta la distancia de cada punto comparado al patrón
+    final_dists, _ = patron.arbol_completo.query(final_rotated_centrada, k=1, workers=HILOS_CONSULTA)
+    return ResultadoComparacion(similitud, patron.centrado, final_rotated_centrada, final_dists, angulo,
+                                transformacion)
+
+
+def comparar_con_patron(patron, puntos_comparada_centrada, parametros=None):
+    """
+    Alinea la nube comparada (ya centrada) con un patrón (PatronPreparado o
+    sus puntos) y calcula la similitud.
+
+    La alineación y la similitud se calculan sobre las nubes reducidas; las
+    nubes y distancias devueltas son las completas, para graficar. Devuelve
+    None si alguna nube tiene valores no finitos.
+    """
+    parametros = parametros or ParametrosComparacion()
+    rng = parametros.generador()
+
+    if not isinstance(patron, PatronPreparado):
+        patron = PatronPreparado.desde_puntos(patron, parametros, rng)
+    if patron is None or not np.all(np.isfinite(puntos_comparada_centrada)):
+        return None
+
+    return resultado_completo(patron, puntos_comparada_centrada,
+                              *alinear_con_patron(patron, puntos_comparada_centrada, parametros, rng))
+
+
+def identificar_pieza(puntos_comparada, patrones, parametros=None):
+    """
+    Compara una nube contra varios patrones ({nombre: PatronPreparado o puntos}).
+
+    Devuelve (nombre del patrón más parecido, {nombre: ResultadoComparacion
+    o None}); el nombre es None si no hubo ninguna comparación válida.
+    """
+    puntos_comparada_centrada, _ = center_cloud(np.asarray(puntos_comparada))
+    resultados = {nombre: comparar_con_patron(puntos_patron, puntos_comparada_centrada, parametros)
+                  for nombre, puntos_patron in patrones.items()}
+    return mejor_resultado(resultados), resultados
+
+
+def mejor_resultado(resultados):
+    """Nombre del resultado válido ({nombre: ResultadoComparacion o None}) con mayor similitud."""
+    validos = {nombre: r for nombre, r in resultados.items() if r is not None}
+    return max(validos, key=lambda nombre: validos[nombre].similitud) if validos else None
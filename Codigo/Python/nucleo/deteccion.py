@@ -0,0 +1,144 @@
+"""
+Detección de la línea láser en los frames de la cámara.
+
+Todas las funciones trabajan sobre el frame completo en una sola pasada de
+NumPy (sin recorrer las filas en Python).
+"""
+import cv2
+import numpy as np
+
+# Suavizado gaussiano horizontal aplicado al canal rojo
+KERNEL_SUAVIZADO = (15, 1)
+
+# Modos de detección: columna entera (np.argmax) o refinamiento sub-píxel
+MODOS_DETECCION = ('entero', 'centroide', 'parabola', 'gauss')
+
+
+def canal_rojo(frame, suavizar=True):
+    """Extrae el canal rojo de un frame BGR y aplica el suavizado horizontal."""
+    rojo = frame[:, :, 2]
+    if suavizar:
+        rojo = cv2.GaussianBlur(rojo, KERNEL_SUAVIZADO, 0)
+    return rojo
+
+
+def detectar_picos(rojo, threshold_val):
+    """
+    Busca el máximo de cada fila del canal rojo.
+
+    Devuelve (filas, columnas, valores) solo para las filas cuyo máximo
+    supera el umbral. La columna es la primera ocurrencia del máximo, igual
+    que np.argmax aplicado fila por fila.
+    """
+    columnas = np.argmax(rojo, axis=1)
+    valores = np.take_along_axis(rojo, columnas[:, None], axis=1)[:, 0]
+    filas = np.flatnonzero(valores > threshold_val)
+    return filas, columnas[filas], valores[filas]
+
+
+def refinar_subpixel(rojo, filas, columnas, modo='centroide', ventana=7):
+    """
+    Refina la columna del pico de cada fila con precisión sub-píxel.
+
+    Todas las filas se evalúan a la vez:
+    - 'centroide': centro de masa en una ventana de `ventana` píxeles
+      alrededor del pico, restando el mínimo de la ventana como fondo.
+    - 'parabola': vértice de la parábola por el pico y sus dos vecinos.
+    - 'gauss': igual que 'parabola' sobre el logaritmo (ajuste gaussiano).
+    Devuelve las columnas refinadas como float32.
+    """
+    columnas_f = columnas.astype(np.float32)
+    if modo == 'entero' or len(filas) == 0:
+        return columnas_f
+
+    ancho = rojo.shape[1]
+
+    if modo == 'centroide':
+        mitad = max(1, int(ventana) // 2)
+        desplazamientos = np.arange(-mitad, mitad + 1)
+        indices = columnas[:, None] + desplazamientos[None, :]
+        validos = (indices >= 0) & (indices < ancho)
+        indices = np.clip(indices, 0, ancho - 1)
+
+        valores = rojo[filas[:, None], indices].astype(np.float32)
+        fondo = np.where(validos, valores, np.inf).min(axis=1, keepdims=True)
+        pesos = np.where(validos, valores - fondo, 0.0)
+        suma = pesos.sum(axis=1)
+
+        centro = (pesos * indices).sum(axis=1) / np.where(suma > 0, suma, 1.0)
+        return np.where(suma > 0, centro, columnas_f).astype(np.float32)
+
+    if modo in ('parabola', 'gauss'):
+        izquierda = np.clip(columnas - 1, 0, ancho - 1)
+        derecha = np.clip(columnas + 1, 0, ancho - 1)
+        v_izq = rojo[filas, izquierda].astype(np.float32)
+        v_cen = rojo[filas, columnas].astype(np.float32)
+        v_der = rojo[filas, derecha].astype(np.float32)
+        if modo == 'gauss':
+            v_izq, v_cen, v_der = np.log1p(v_izq), np.log1p(v_cen), np.log1p(v_der)
+
+        denominador = v_izq - 2.0 * v_cen + v_der
+        # Solo hay vértice si la curva es cóncava y el pico no está en el borde
+        validos = (denominador < 0) & (columnas > 0) & (columnas < ancho - 1)
+        delta = 0.5 * (v_izq - v_der) / np.where(validos, denominador, -1.0)
+        delta = np.where(validos, np.clip(delta, -0.5, 0.5), 0.0)
+        return (columnas_f + delta).astype(np.float32)
+
+    raise ValueError(f"Modo de detección desconocido: '{modo}'")
+
+
+def detectar_laser(frame, threshold_val, suavizar=True, modo='entero', ventana=7):
+    """
+    Detecta el láser en un frame y devuelve laser_pixels (N, 2) float32 con [x, y].
+
+    Con modo='entero' la columna es el np.argmax de cada fila; los demás
+    modos la refinan con refinar_subpixel().
+    """
+    if frame is None:
+        return np.empty((0, 2), dtype=np.float32)
+
+    rojo = canal_rojo(frame, suavizar)
+    filas, columnas, _ = detectar_picos(rojo, threshold_val)
+    columnas = refinar_subpixel(rojo, filas, columnas, modo, ventana)
+    return np.column_stack((columnas, filas)).astype(np.float32)
+
+
+class ParametrosDeteccion:
+    """Umbral y modo de detección del láser, tal como se guardan en Configuracion.json."""
+
+    def __init__(self, threshold=100, modo='entero', ventana=7, suavizar=True):
+        if modo not in MODOS_DETECCION:
+            raise ValueError(f"Modo de detección desconocido: '{modo}'")
+        self.threshold = threshold
+        self.modo = modo
+        self.ventana = int(ventana)
+        self.suavizar = suavizar
+
+    @classmethod
+    def desde_config(cls, config):
+        """Crea los parámetros a partir de las secciones 'setup_camara' y 'deteccion_laser'."""
+        deteccion = config.get('deteccion_laser', {})
+        modo = deteccion.get("modo", "entero")
+        if modo not in MODOS_DETECCION:
+            print(f"Modo de detección desconocido '{modo}', usando 'entero'")
+            modo = 'entero'
+        return cls(config.get('setup_camara', {}).get("threshold", 100), modo, deteccion.get("ventana", 7))
+
+    def como_dict(self):
+        """Sección 'deteccion_laser' (sin el umbral, que vive en 'setup_camara')."""
+        return {"modo": self.modo, "ventana": self.ventana}
+
+    def detectar(self, frame):
+        """detectar_laser() con estos parámetros."""
+        return detectar_laser(frame, self.threshold, self.suavizar, self.modo, self.ventana)
+
+
+def pixeles_a_rayos(laser_pixels, k_matrix, coef_dist):
+    """Corrige la distorsión de los píxeles y devuelve los rayos normalizados (N, 3)."""
+    if len(laser_pixels) == 0:
+        return np.array([])
+
+    undistorted = cv2.undistortPoints(laser_pixels.reshape(-1, 1, 2), k_matrix, coef_dist).reshape(-1, 2)
+    rays = np.hstack([undistorted, np.ones((undistorted.shape[0], 1))])
+    rays /= np.linalg.norm(rays, axis=1, keepdims=True)
+    return rays
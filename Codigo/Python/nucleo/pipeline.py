@@ -0,0 +1,310 @@
+"""
+Pipeline de escaneo por etapas.
+
+    ángulos -> [cola de muestras] -> captura -> [cola de frames] -> trabajadores
+
+La etapa de ángulos toma los eventos 'angulo' de nucleo.protocolo.LectorSerial
+(con su instante de llegada), el hilo de captura toma de CapturadorCamara el
+primer frame posterior a ese instante, y un grupo de trabajadores detecta,
+triangula y transforma cada perfil. Las colas son acotadas: si el procesamiento se atrasa, las etapas
+anteriores esperan en lugar de acumular memoria sin límite.
+
+PipelineContinuo usa las mismas etapas con la mesa girando sin detenerse:
+se procesan todos los frames y el ángulo de cada uno se interpola al final
+a partir de los eventos de pasos que informa Arduino.
+"""
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# Una muestra del escaneo: orden de llegada, ángulo informado por Arduino e
+# instante (time.monotonic()) en que se recibió
+Muestra = namedtuple('Muestra', ['indice', 'angulo', 'instante'])
+
+_FIN = None     # Marca de fin de cola
+
+
+class PipelineEscaneo:
+    """
+    Ejecuta la fase de muestreo del escaneo en tres etapas concurrentes.
+
+    procesar_muestra(frame, muestra) corre en los trabajadores y devuelve lo
+    que se guarda como resultado de la muestra (None si no hay puntos).
+    al_recibir(muestra) y al_procesar(procesadas, total) son callbacks
+    opcionales para informar el avance; se llaman desde los hilos del
+    pipeline. Si se indica confirmacion, la etapa de captura la envía por
+    el puerto serie apenas obtiene el frame de cada muestra, para que
+    Arduino avance sin esperar al procesamiento.
+    """
+
+    def __init__(self, lector, capturador, procesar_muestra, num_muestras,
+                 num_trabajadores=2, tamano_cola=8, timeout_frame=1.0,
+                 confirmacion=None, al_recibir=None, al_procesar=None):
+        self.lector = lector
+        self.capturador = capturador
+        self.procesar_muestra = procesar_muestra
+        self.num_muestras = int(num_muestras)
+        self.num_trabajadores = max(1, int(num_trabajadores))
+        self.timeout_frame = timeout_frame
+        self.confirmacion = confirmacion
+        self.al_recibir = al_recibir
+        self.al_procesar = al_procesar
+
+        self._cola_muestras = queue.Queue(maxsize=tamano_cola)
+        self._cola_frames = queue.Queue(maxsize=tamano_cola)
+        self._resultados = {}
+        self._lock = threading.Lock()
+        self._activo = threading.Event()
+        self._terminado = threading.Event()
+        self._hilos = []
+        self._trabajadores_activos = 0
+
+        self.recibidas = 0
+        self.procesadas = 0
+        self.frames_perdidos = 0
+        # Segundos desde la llegada de cada muestra hasta el fin de su procesamiento
+        self.latencias = []
+
+    # ------------------------------------------------------------------
+    # Control
+    # ------------------------------------------------------------------
+
+    def iniciar(self):
+        """Lanza los hilos de todas las etapas."""
+        self._activo.set()
+        self._trabajadores_activos = self.num_trabajadores
+        self._hilos = [threading.Thread(target=self._etapa_angulos, daemon=True),
+                       threading.Thread(target=self._etapa_captura, daemon=True)]
+        self._hilos += [threading.Thread(target=self._trabajador, daemon=True)
+                        for _ in range(self.num_trabajadores)]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def esperar(self, timeout=None):
+        """Espera a que se procesen todas las muestras. Devuelve True si terminó."""
+        return self._terminado.wait(timeout)
+
+    def detener(self):
+        """Corta todas las etapas (las muestras pendientes se descartan)."""
+        self._activo.clear()
+        for hilo in self._hilos:
+            hilo.join(timeout=2)
+
+    def resultados(self):
+        """Resultados no vacíos ordenados por índice de muestra."""
+        with self._lock:
+            return [self._resultados[i] for i in sorted(self._resultados)
+                    if self._resultados[i] is not None]
+
+    # ------------------------------------------------------------------
+    # Etapas
+    # ------------------------------------------------------------------
+
+    def _poner(self, cola, item):
+        """put() que no queda bloqueado si se detiene el pipeline."""
+        while self._activo.is_set():
+            try:
+                cola.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _sacar(self, cola):
+        """get() que devuelve _FIN si se detiene el pipeline."""
+        while self._activo.is_set():
+            try:
+                return cola.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _FIN
+
+    def _etapa_angulos(self):
+        try:
+            while self._activo.is_set() and self.recibidas < self.num_muestras:
+                evento = self.lector.esperar_evento('angulo', timeout=0.1)
+                if evento is None:
+                    if not self.lector.esta_activo():
+                        return
+                    continue
+
+                # Instante de llegada: la mesa ya está quieta cuando Arduino envía el ángulo
+                muestra = Muestra(self.recibidas, evento.valor, evento.instante)
+                self.recibidas += 1
+                if self.al_recibir:
+                    self.al_recibir(muestra)
+                if not self._poner(self._cola_muestras, muestra):
+                    return
+        except Exception as e:
+            print(f"Error leyendo ángulos: {e}")
+        finally:
+            self._poner(self._cola_muestras, _FIN)
+
+    def _etapa_captura(self):
+        try:
+            while True:
+                muestra = self._sacar(self._cola_muestras)
+                if muestra is _FIN:
+                    break
+
+                _, frame = self.capturador.frame_despues_de(muestra.instante, timeout=self.timeout_frame)
+                if frame is None:
+                    print(f"⚠ Sin frame para la muestra {muestra.indice + 1}")
+                    self.frames_perdidos += 1
+
+                # Frame tomado: Arduino ya puede mover la mesa
+                if self.confirmacion:
+                    try:
+                        self.lector.escribir(self.confirmacion)
+                    except Exception as e:
+                        print(f"Error enviando confirmación: {e}")
+                if not self._poner(self._cola_frames, (muestra, frame)):
+                    break
+        finally:
+            for _ in range(self.num_trabajadores):
+                self._poner(self._cola_frames, _FIN)
+
+    def _trabajador(self):
+        while True:
+            item = self._sacar(self._cola_frames)
+            if item is _FIN:
+                break
+
+            muestra, frame = item
+            resultado = None
+            if frame is not None:
+                try:
+                    resultado = self.procesar_muestra(frame, muestra)
+                except Exception as e:
+                    print(f"Error procesando muestra {muestra.indice + 1}: {e}")
+
+            with self._lock:
+                self._resultados[muestra.indice] = resultado
+                self.latencias.append(time.monotonic() - muestra.instante)
+                self.procesadas += 1
+                procesadas = self.procesadas
+            if self.al_procesar:
+                self.al_procesar(procesadas, self.num_muestras)
+            if self.num_muestras and procesadas >= self.num_muestras:
+                self._terminado.set()
+
+        # El último trabajador en recibir la marca de fin da por terminado el pipeline
+        with self._lock:
+            self._trabajadores_activos -= 1
+            ultimo = self._trabajadores_activos == 0
+        if ultimo and self._activo.is_set():
+            self._terminado.set()
+
+
+class PipelineContinuo(PipelineEscaneo):
+    """
+    Fase de muestreo con giro continuo.
+
+    Arduino informa "INICIO <ms> <pasos_vuelta>", "PASOS <ms> <pasos>" cada
+    pocos milisegundos y "FIN <ms> <pasos>". Entre INICIO y FIN se procesan
+    todos los frames de la cámara; procesar_muestra(frame, muestra) recibe
+    una Muestra sin ángulo (angulo=None, instante=marca del frame) y el
+    ángulo de cada resultado se obtiene después con muestras_con_angulo().
+    al_avance(pasos, pasos_vuelta) informa el giro de la mesa.
+    """
+
+    def __init__(self, lector, capturador, procesar_muestra, num_trabajadores=2,
+                 tamano_cola=16, timeout_frame=1.0, al_avance=None, al_procesar=None):
+        super().__init__(lector, capturador, procesar_muestra, 0,
+                         num_trabajadores=num_trabajadores, tamano_cola=tamano_cola,
+                         timeout_frame=timeout_frame, al_procesar=al_procesar)
+        self.al_avance = al_avance
+        self.num_muestras = None        # Se conoce recién al terminar el giro
+        self.eventos = []               # (instante_pc, ms_arduino, pasos)
+        self.pasos_vuelta = None
+        self._marcas = {}               # indice -> marca de tiempo del frame
+        self._inicio = threading.Event()
+        self._fin = threading.Event()
+
+    def _etapa_angulos(self):
+        try:
+            while self._activo.is_set() and not self._fin.is_set():
+                evento = self.lector.esperar_evento(('inicio_giro', 'pasos', 'fin_giro'), timeout=0.1)
+                if evento is None:
+                    if not self.lector.esta_activo():
+                        return
+                    continue
+
+                ms, valor = evento.valor
+                if evento.tipo == 'inicio_giro':
+                    self.pasos_vuelta = valor
+                    self.eventos = [(evento.instante, ms, 0)]
+                    self._inicio.set()
+                elif self._inicio.is_set():
+                    self.eventos.append((evento.instante, ms, valor))
+                    if evento.tipo == 'fin_giro':
+                        self._fin.set()
+
+                if self.al_avance and self.pasos_vuelta:
+                    self.al_avance(self.eventos[-1][2], self.pasos_vuelta)
+        except Exception as e:
+            print(f"Error leyendo eventos de giro: {e}")
+        finally:
+            # Si el giro nunca terminó, la captura debe cortar igual
+            self._fin.set()
+
+    def _etapa_captura(self):
+        try:
+            while self._activo.is_set() and not self._inicio.wait(0.1):
+                if self._fin.is_set():
+                    return
+            if not self._activo.is_set():
+                return
+
+            marca = self.eventos[0][0]
+            while self._activo.is_set():
+                marca_frame, frame = self.capturador.frame_despues_de(marca, timeout=self.timeout_frame)
+                if frame is None:
+                    if self._fin.is_set():
+                        break
+                    continue
+                if self._fin.is_set() and marca_frame > self.eventos[-1][0]:
+                    break
+
+                marca = marca_frame
+                muestra = Muestra(self.recibidas, None, marca_frame)
+                self._marcas[muestra.indice] = marca_frame
+                self.recibidas += 1
+                if not self._poner(self._cola_frames, (muestra, frame)):
+                    break
+        finally:
+            self.num_muestras = self.recibidas
+            for _ in range(self.num_trabajadores):
+                self._poner(self._cola_frames, _FIN)
+
+    def tiempos_eventos(self):
+        """
+        Instantes (reloj de la PC) y ángulos de los eventos de giro.
+
+        Los instantes se reconstruyen con el reloj de Arduino más un desfase
+        común: el del mensaje que llegó con menos demora, así el retardo
+        variable del puerto serie no se traslada a los ángulos.
+        """
+        if len(self.eventos) < 2 or not self.pasos_vuelta:
+            return np.empty(0), np.empty(0)
+        eventos = np.array(self.eventos, dtype=np.float64)
+        ms_arduino = eventos[:, 1] / 1000.0
+        desfase = np.min(eventos[:, 0] - ms_arduino)
+        return ms_arduino + desfase, eventos[:, 2] * 360.0 / self.pasos_vuelta
+
+    def muestras_con_angulo(self):
+        """Lista de (angulo_grados, resultado) de los frames tomados durante el giro."""
+        tiempos, angulos = self.tiempos_eventos()
+        if tiempos.size == 0:
+            return []
+
+        with self._lock:
+            indices = sorted(i for i, r in self._resultados.items() if r is not None)
+            resultados = [self._resultados[i] for i in indices]
+            marcas = np.array([self._marcas[i] for i in indices], dtype=np.float64)
+
+        angulos_frames = np.interp(marcas, tiempos, angulos, left=np.nan, right=np.nan)
+        return [(float(a), r) for a, r in zip(angulos_frames, resultados) if np.isfinite(a)]
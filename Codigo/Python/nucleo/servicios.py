@@ -0,0 +1,97 @@
+"""
+Recursos compartidos por las herramientas: configuración, calibración,
+tablas de triangulación, patrones preparados, cámara y puerto serie.
+
+Cada herramienta ejecutada por separado crea sus propios Servicios; el
+lanzador (Main.py) crea uno solo y se lo pasa a todas las pantallas. Lo
+cargado queda en memoria (los archivos se vuelven a leer solo si cambiaron
+en disco) y la cámara y el puerto serie (ver nucleo.dispositivos) siguen
+abiertos entre escaneos y al pasar de una pantalla a otra, hasta cerrar().
+"""
+import copy
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from nucleo.almacenamiento import firma_archivo
+from nucleo.dispositivos import SesionDispositivos
+from nucleo.patrones import CARPETA_CACHE_PATRONES, BibliotecaPatrones, ComparadorPatrones
+
+# La triangulación (cv2) se importa al usarla: Comparacion UI solo necesita
+# la configuración y los patrones
+
+CONFIG_FILE = "Configuracion.json"
+CALIBRACION = "CalibracionZoom.npz"
+
+
+class Servicios:
+    """Configuración, calibración y dispositivos cargados una sola vez por proceso."""
+
+    def __init__(self, ruta_config=CONFIG_FILE, ruta_calibracion=CALIBRACION):
+        self.ruta_config = Path(ruta_config)
+        self.ruta_calibracion = Path(ruta_calibracion)
+        self.dispositivos = SesionDispositivos()
+        self.patrones = BibliotecaPatrones(self.ruta_config.parent / CARPETA_CACHE_PATRONES)
+        self.comparador = ComparadorPatrones(self.patrones)
+
+        self._lock = threading.RLock()
+        self._config = None                 # (firma, dict)
+        self._calibracion = None            # (firma, K, dist)
+        self._tablas = {}                   # clave_tabla -> TablaTriangulacion
+
+    # ------------------------------------------------------------------
+    # Archivos
+    # ------------------------------------------------------------------
+
+    def configuracion(self):
+        """Configuracion.json completo (copia: modificarla no altera la caché)."""
+        with self._lock:
+            firma = firma_archivo(self.ruta_config)
+            if self._config is None or self._config[0] != firma:
+                with open(self.ruta_config, 'r') as f:
+                    self._config = (firma, json.load(f))
+            return copy.deepcopy(self._config[1])
+
+    def guardar_seccion(self, seccion, valores):
+        """Reemplaza una sección de Configuracion.json y conserva las demás."""
+        with self._lock:
+            try:
+                config = self.configuracion()
+            except FileNotFoundError:
+                config = {}
+            config[seccion] = valores
+            with open(self.ruta_config, 'w') as f:
+                json.dump(config, f, indent=4)
+            self._config = (firma_archivo(self.ruta_config), config)
+
+    def calibracion(self):
+        """Matriz de la cámara y coeficientes de distorsión (K, dist)."""
+        with self._lock:
+            firma = firma_archivo(self.ruta_calibracion)
+            if self._calibracion is None or self._calibracion[0] != firma:
+                with np.load(self.ruta_calibracion) as calib:
+                    self._calibracion = (firma, calib["K"], calib["dist"])
+            return self._calibracion[1], self._calibracion[2]
+
+    def tabla_triangulacion(self, params, ancho=640, alto=480, subdivisiones=8):
+        """Tabla de triangulación para la calibración actual (en memoria después de la primera vez)."""
+        from nucleo.triangulacion import TablaTriangulacion, clave_tabla
+
+        k_matrix, coef_dist = self.calibracion()
+        clave = clave_tabla(k_matrix, coef_dist, params, ancho, alto, subdivisiones)
+        with self._lock:
+            if clave not in self._tablas:
+                self._tablas[clave] = TablaTriangulacion.cargar_o_construir(
+                    self.ruta_calibracion, k_matrix, coef_dist, params, ancho, alto, subdivisiones)
+            return self._tablas[clave]
+
+    def patron_preparado(self, ruta, parametros=None):
+        """Patrón listo para comparar (ver nucleo.patrones), en memoria mientras el archivo no cambie."""
+        return self.patrones.obtener(ruta, parametros)
+
+    def cerrar(self):
+        """Cierra la cámara, el puerto serie y los procesos de comparación (al salir del programa)."""
+        self.dispositivos.cerrar()
+        self.comparador.cerrar()
@@ -0,0 +1,246 @@
+"""
+Grabación de sesiones de escaneo y reprocesamiento fuera de línea.
+
+GrabadorSesion guarda, para cada muestra, el frame de la cámara (o solo
+lo que usa la detección) comprimido junto con su ángulo e instante. Con
+reprocesar_sesion() la nube se vuelve a generar desde la grabación con
+otro umbral, otra calibración u otros parámetros, sin volver a escanear
+la pieza. El reprocesamiento reparte los frames en un grupo de procesos.
+
+Estructura de una sesión:
+    sesion.json            parámetros del escaneo y lista de muestras
+    calibracion.npz        copia de la calibración de la cámara (K, dist)
+    calibracion.*.lut.npz  tablas de triangulación (se generan al reprocesar)
+    muestra_00000.npz      imagen, columna0, forma, indice, angulo, instante
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from nucleo.almacenamiento import FiltroNube, guardar_escaneo
+from nucleo.deteccion import ParametrosDeteccion, canal_rojo, detectar_picos
+from nucleo.triangulacion import ProcesadorPerfiles, TablaTriangulacion
+
+# Qué se guarda de cada frame: 'completo' (BGR), 'rojo' (solo el canal que
+# usa la detección) o 'banda' (canal rojo recortado a las columnas del láser)
+MODOS_GRABACION = ('completo', 'rojo', 'banda')
+
+ARCHIVO_SESION = "sesion.json"
+ARCHIVO_CALIBRACION = "calibracion.npz"
+
+# La banda incluye toda columna cuyo máximo suavizado supere UMBRAL_BANDA
+# (muy por debajo de los umbrales de detección habituales) más un margen
+# que cubre el suavizado horizontal y la ventana sub-píxel
+UMBRAL_BANDA = 50
+MARGEN_BANDA = 24
+
+
+def recortar_banda(frame, umbral=UMBRAL_BANDA, margen=MARGEN_BANDA):
+    """Canal rojo recortado a las columnas donde puede estar el láser. Devuelve (banda, columna0)."""
+    rojo = frame[:, :, 2]
+    _, columnas, _ = detectar_picos(canal_rojo(frame), umbral)
+    if len(columnas) == 0:
+        return rojo[:, :0].copy(), 0
+    c0 = max(int(columnas.min()) - margen, 0)
+    c1 = min(int(columnas.max()) + margen + 1, rojo.shape[1])
+    return np.ascontiguousarray(rojo[:, c0:c1]), c0
+
+
+def reconstruir_frame(imagen, columna0, forma):
+    """Frame BGR con la forma original a partir de lo grabado (fuera de la banda queda en negro)."""
+    if imagen.ndim == 3:
+        return imagen
+    frame = np.zeros(tuple(forma[:2]) + (3,), dtype=np.uint8)
+    frame[:, columna0:columna0 + imagen.shape[1], 2] = imagen
+    return frame
+
+
+class GrabadorSesion:
+    """
+    Guarda los frames de un escaneo en una carpeta de sesión.
+
+    agregar() se llama desde los trabajadores del pipeline (la compresión
+    corre en paralelo con la captura). Al terminar, cerrar() escribe la
+    lista de muestras con sus ángulos en sesion.json.
+    """
+
+    def __init__(self, carpeta, modo='banda', metadatos=None, calibracion=None):
+        if modo not in MODOS_GRABACION:
+            raise ValueError(f"Modo de grabación desconocido: {modo}")
+        self.carpeta = Path(carpeta)
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        self.modo = modo
+        self.metadatos = dict(metadatos or {})
+        self.muestras = {}          # indice -> {archivo, angulo, instante}
+        self._lock = threading.Lock()
+
+        if calibracion is not None:
+            shutil.copyfile(calibracion, self.carpeta / ARCHIVO_CALIBRACION)
+        # sesion.json existe desde el principio: una sesión cortada también se puede reprocesar
+        self._escribir_sesion()
+
+    def agregar(self, frame, indice, angulo=None, instante=None):
+        """Comprime y guarda el frame de una muestra (angulo None si todavía no se conoce)."""
+        if self.modo == 'completo':
+            imagen, columna0 = frame, 0
+        elif self.modo == 'rojo':
+            imagen, columna0 = np.ascontiguousarray(frame[:, :, 2]), 0
+        else:
+            imagen, columna0 = recortar_banda(frame)
+
+        angulo = np.nan if angulo is None else float(angulo)
+        instante = time.monotonic() if instante is None else float(instante)
+        archivo = f"muestra_{int(indice):05d}.npz"
+        np.savez_compressed(self.carpeta / archivo, imagen=imagen, columna0=columna0,
+                            forma=np.array(frame.shape), indice=int(indice),
+                            angulo=angulo, instante=instante)
+        with self._lock:
+            self.muestras[int(indice)] = {"archivo": archivo, "angulo": angulo, "instante": instante}
+
+    def asignar_angulos(self, tiempos, angulos):
+        """Ángulos de las muestras interpolados por instante (giro continuo)."""
+        with self._lock:
+            for muestra in self.muestras.values():
+                muestra["angulo"] = float(np.interp(muestra["instante"], tiempos, angulos,
+                                                    left=np.nan, right=np.nan))
+
+    def cerrar(self):
+        """Escribe sesion.json con todas las muestras grabadas."""
+        self._escribir_sesion()
+
+    def _escribir_sesion(self):
+        with self._lock:
+            muestras = [dict(indice=i, **m) for i, m in sorted(self.muestras.items())]
+        # NaN no es JSON válido: los ángulos desconocidos se guardan como null
+        for muestra in muestras:
+            if not np.isfinite(muestra["angulo"]):
+                muestra["angulo"] = None
+        datos = dict(self.metadatos, modo_grabacion=self.modo, muestras=muestras)
+        temporal = self.carpeta / (ARCHIVO_SESION + ".tmp")
+        with open(temporal, 'w') as f:
+            json.dump(datos, f, indent=4)
+        os.replace(temporal, self.carpeta / ARCHIVO_SESION)
+
+
+# =============================================================================
+# REPROCESAMIENTO
+# =============================================================================
+
+def cargar_sesion(carpeta):
+    """Metadatos de una sesión con sus muestras (incluye las que no llegaron a sesion.json)."""
+    carpeta = Path(carpeta)
+    with open(carpeta / ARCHIVO_SESION, 'r') as f:
+        datos = json.load(f)
+
+    # Si el escaneo se cortó, hay archivos de muestras que no figuran en la lista
+    conocidas = {m["archivo"] for m in datos.get("muestras", [])}
+    for archivo in sorted(carpeta.glob("muestra_*.npz")):
+        if archivo.name not in conocidas:
+            with np.load(archivo) as muestra:
+                angulo = float(muestra["angulo"])
+                datos.setdefault("muestras", []).append({
+                    "indice": int(muestra["indice"]), "archivo": archivo.name,
+                    "angulo": angulo if np.isfinite(angulo) else None,
+                    "instante": float(muestra["instante"])})
+    datos["muestras"] = sorted(datos.get("muestras", []), key=lambda m: m["indice"])
+    return datos
+
+
+# Estado de cada proceso del grupo (se inicializa una vez por proceso)
+_CONTEXTO = {}
+
+
+def _iniciar_proceso(contexto):
+    _CONTEXTO.update(contexto)
+
+
+def _procesar_muestra(ruta, angulo):
+    """Puntos (float32), filas del sensor e índice de una muestra grabada."""
+    c = _CONTEXTO
+    with np.load(ruta) as muestra:
+        frame = reconstruir_frame(muestra["imagen"], int(muestra["columna0"]), muestra["forma"])
+        indice = int(muestra["indice"])
+
+    procesador = c["procesador"]
+    if not procesador.tabla.admite(frame.shape):
+        raise ValueError(f"La tabla de triangulación no corresponde a frames de {frame.shape[1]}x{frame.shape[0]}")
+    puntos, filas = procesador.puntos(frame, angulo)
+    if c["filtro"] is not None:
+        puntos, filas = c["filtro"].aplicar(puntos, filas)
+    return puntos.astype(np.float32), filas.astype(np.int16), indice
+
+
+def geometria_sesion(sesion, parametros=None):
+    """(parametros_calibracion, ancho, alto) con que se reprocesa una sesión (dict de sesion.json)."""
+    params = dict(sesion.get("parametros_calibracion", {}))
+    params.update(parametros or {})
+    alto, ancho = sesion.get("forma_frame", [480, 640])[:2]
+    return params, ancho, alto
+
+
+def reprocesar_sesion(carpeta, parametros=None, threshold=None, deteccion=None, calibracion=None,
+                      subdivisiones=8, filtrar=True, procesos=None, ruta_salida=None):
+    """
+    Vuelve a generar la nube de una sesión grabada.
+
+    parametros (parametros_calibracion), threshold, deteccion ({'modo',
+    'ventana'}) y calibracion (ruta a un .npz con K y dist) reemplazan a
+    los guardados en la sesión; lo que no se indique se toma de la sesión.
+    Con filtrar se aplican Z_MIN, Z_MAX y MODULO_MAX como en el escaneo.
+    procesos=1 procesa en el proceso actual. Si se indica ruta_salida se
+    guarda la nube en formato .nube. Devuelve (puntos, indices, filas).
+    """
+    carpeta = Path(carpeta)
+    sesion = cargar_sesion(carpeta)
+    params, ancho, alto = geometria_sesion(sesion, parametros)
+    config_deteccion = dict(sesion.get("deteccion_laser", {}))
+    config_deteccion.update(deteccion or {})
+
+    ruta_calibracion = Path(calibracion or carpeta / ARCHIVO_CALIBRACION)
+    with np.load(ruta_calibracion) as calib:
+        k_matrix, coef_dist = calib["K"], calib["dist"]
+
+    muestras = [m for m in sesion["muestras"] if m.get("angulo") is not None]
+    if not muestras:
+        vacio = np.empty((0, 3), dtype=np.float32)
+        return vacio, np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int16)
+
+    # La tabla queda guardada junto a la calibración: reprocesar otra vez no la recalcula
+    tabla = TablaTriangulacion.cargar_o_construir(ruta_calibracion, k_matrix, coef_dist, params,
+                                                  ancho, alto, subdivisiones)
+    parametros_deteccion = ParametrosDeteccion(sesion.get("threshold", 100) if threshold is None else threshold,
+                                               config_deteccion.get("modo", "entero"),
+                                               config_deteccion.get("ventana", 7))
+    contexto = {
+        "procesador": ProcesadorPerfiles.desde_parametros(params, parametros_deteccion, k_matrix, coef_dist, tabla),
+        "filtro": FiltroNube.desde_parametros(params) if filtrar else None,
+    }
+
+    rutas = [str(carpeta / m["archivo"]) for m in muestras]
+    angulos = [m["angulo"] for m in muestras]
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1:
+        _iniciar_proceso(contexto)
+        resultados = list(map(_procesar_muestra, rutas, angulos))
+    else:
+        # La tabla se envía una sola vez a cada proceso, no con cada muestra
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso,
+                                 initargs=(contexto,)) as grupo:
+            resultados = list(grupo.map(_procesar_muestra, rutas, angulos,
+                                        chunksize=max(1, len(rutas) // (4 * procesos))))
+
+    puntos = np.concatenate([r[0] for r in resultados])
+    filas = np.concatenate([r[1] for r in resultados])
+    indices = np.concatenate([np.full(len(r[0]), r[2], dtype=np.int32) for r in resultados])
+
+    if ruta_salida is not None:
+        guardar_escaneo(ruta_salida, puntos, indices, filas,
+                        {"sesion": carpeta.name, "muestras": len(muestras), "reprocesado": True,
+                         "fecha": time.strftime("%Y-%m-%d %H:%M:%S")})
+    return puntos, indices, filas
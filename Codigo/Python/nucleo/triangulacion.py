@@ -0,0 +1,327 @@
+"""
+Triangulación láser: de píxeles de la cámara al perfil (radio, z).
+
+Incluye la tabla precalculada (LUT) que asigna a cada fila y columna
+sub-píxel del sensor su punto del perfil, de modo que la triangulación de
+cada frame se reduce a una lectura indexada.
+"""
+import hashlib
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from nucleo.deteccion import pixeles_a_rayos
+
+# Parámetros de 'parametros_calibracion' que definen la geometría cámara-láser
+PARAMETROS_GEOMETRIA = ('THETA_DEG', 'CAM_RADIUS', 'CAM_HEIGHT', 'CAM_PITCH')
+
+# Parámetros de 'parametros_calibracion' que llevan el perfil a coordenadas del escaneo
+PARAMETROS_TRANSFORMACION = ('OFFSET_RADIAL', 'OFFSET_ANGLE_DEG', 'OFFSET_Z',
+                             'SCALE_FACTOR', 'XY_ASPECT_FACTOR', 'Z_ASPECT_FACTOR')
+
+# Versión del formato de la tabla (cambiarla invalida las tablas guardadas)
+VERSION_TABLA = 1
+
+# Tablas guardadas por archivo de calibración (una por resolución y
+# geometría); al superarse se borran las usadas hace más tiempo
+TABLAS_POR_CALIBRACION = 8
+
+
+class PlanoLaser:
+    """Plano del láser: vertical, contiene el eje de giro y forma THETA_DEG con la cámara."""
+
+    def __init__(self, theta_deg):
+        theta_rad = np.radians(theta_deg)
+        self.normal_plano_mundo = np.array([np.sin(theta_rad), -np.cos(theta_rad), 0])
+
+    @classmethod
+    def desde_parametros(cls, params):
+        """Crea el plano a partir de 'parametros_calibracion'."""
+        return cls(params['THETA_DEG'])
+
+
+class ModeloCamara:
+    """
+    Pose de la cámara en el mundo, calculada una sola vez.
+
+    Intersecta lotes completos de rayos con el plano láser en una única
+    operación matricial.
+    """
+
+    def __init__(self, cam_radius, cam_height, cam_pitch):
+        pitch_rad = np.radians(cam_pitch)
+        self.T_cam_mundo = np.array([cam_radius, 0, cam_height])
+        R_z_neg90 = np.array([[0,1,0],[-1,0,0],[0,0,1]])
+        R_y_neg90 = np.array([[0,0,-1],[0,1,0],[1,0,0]])
+        R_cam_base = R_y_neg90 @ R_z_neg90
+        R_pitch = np.array([[1,0,0],[0,np.cos(pitch_rad),-np.sin(pitch_rad)],[0,np.sin(pitch_rad),np.cos(pitch_rad)]])
+        self.R_cam_a_mundo = R_cam_base @ R_pitch
+
+    @classmethod
+    def desde_parametros(cls, params):
+        """Crea el modelo a partir de 'parametros_calibracion'."""
+        return cls(params['CAM_RADIUS'], params['CAM_HEIGHT'], params['CAM_PITCH'])
+
+    def intersectar(self, rays, plano):
+        """
+        Intersecta un lote de rayos (N, 3) en coordenadas de cámara con el plano.
+
+        Devuelve (puntos, validos): puntos es (M, 3) en coordenadas del mundo
+        para los rayos que cortan el plano delante de la cámara y validos es
+        la máscara (N,) de esos rayos.
+        """
+        rays = np.asarray(rays, dtype=np.float64).reshape(-1, 3)
+        normal = plano.normal_plano_mundo
+
+        rays_mundo = rays @ self.R_cam_a_mundo.T
+        denom = rays_mundo @ normal
+        validos = np.abs(denom) >= 1e-9
+        t = np.dot(normal, self.T_cam_mundo) / -np.where(validos, denom, 1.0)
+        validos &= t > 0
+
+        puntos = self.T_cam_mundo + t[validos, None] * rays_mundo[validos]
+        return puntos, validos
+
+    def perfil(self, rays, plano):
+        """
+        Igual que intersectar(), pero devuelve el perfil (M, 2) [radio, z].
+
+        El radio lleva el signo de la componente x del rayo en la cámara.
+        """
+        rays = np.asarray(rays, dtype=np.float64).reshape(-1, 3)
+        puntos, validos = self.intersectar(rays, plano)
+        radius = np.sqrt(puntos[:, 0]**2 + puntos[:, 1]**2) * np.sign(rays[validos, 0])
+        return np.column_stack((radius, puntos[:, 2])), validos
+
+
+class TransformacionEscaneo:
+    """Transformación de perfiles (radio, z) tomados a un ángulo de la mesa a puntos 3D del escaneo."""
+
+    def __init__(self, offset_radial, offset_angle_deg, offset_z, scale_factor,
+                 xy_aspect_factor, z_aspect_factor):
+        self.offset_radial = offset_radial
+        self.offset_angle_deg = offset_angle_deg
+        self.offset_z = offset_z
+        self.escala_xy = scale_factor * xy_aspect_factor
+        self.escala_z = scale_factor * z_aspect_factor
+
+    @classmethod
+    def desde_parametros(cls, params):
+        """Crea la transformación a partir de 'parametros_calibracion'."""
+        return cls(*(params[nombre] for nombre in PARAMETROS_TRANSFORMACION))
+
+    def a_puntos(self, perfil_2d, angulo_mesa):
+        """Perfil (N, 2) [radio, z] tomado con la mesa en angulo_mesa (grados) -> puntos (N, 3)."""
+        radii = np.abs(perfil_2d[:, 0] + self.offset_radial)
+        heights = -perfil_2d[:, 1]
+
+        angle_rad = np.radians(angulo_mesa + self.offset_angle_deg)
+        return np.column_stack((
+            radii * np.cos(angle_rad) * self.escala_xy,
+            radii * np.sin(angle_rad) * self.escala_xy,
+            (heights + self.offset_z) * self.escala_z
+        ))
+
+    def a_perfil(self, puntos):
+        """
+        Inversa de a_puntos(): devuelve (angulo_mesa, radio, z_perfil) de cada punto.
+
+        radio es la distancia al eje (radio del perfil + OFFSET_RADIAL), que
+        a_puntos() toma en valor absoluto.
+        """
+        x = puntos[:, 0] / self.escala_xy
+        y = puntos[:, 1] / self.escala_xy
+        angulo_mesa = np.mod(np.degrees(np.arctan2(y, x)) - self.offset_angle_deg, 360.0)
+        z_perfil = self.offset_z - puntos[:, 2] / self.escala_z
+        return angulo_mesa, np.hypot(x, y), z_perfil
+
+
+def clave_tabla(k_matrix, coef_dist, params, ancho, alto, subdivisiones):
+    """Huella de todo lo que determina el contenido de la tabla."""
+    h = hashlib.sha1()
+    h.update(f"v{VERSION_TABLA}|{ancho}x{alto}|{subdivisiones}".encode())
+    h.update(np.ascontiguousarray(k_matrix, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(coef_dist, dtype=np.float64).tobytes())
+    for nombre in PARAMETROS_GEOMETRIA:
+        h.update(f"|{nombre}={float(params[nombre])!r}".encode())
+    return h.hexdigest()
+
+
+class TablaTriangulacion:
+    """Tabla píxel -> (radio, z) precalculada para una calibración fija."""
+
+    def __init__(self, tabla, subdivisiones, clave):
+        self.tabla = tabla                      # (alto, ancho * subdivisiones, 2) float32, NaN si no corta el plano
+        self.subdivisiones = int(subdivisiones)
+        self.clave = clave
+        self.alto = tabla.shape[0]
+        self.ancho = tabla.shape[1] // self.subdivisiones
+
+    @classmethod
+    def construir(cls, k_matrix, coef_dist, params, ancho=640, alto=480, subdivisiones=8):
+        """Calcula la tabla para todas las filas y columnas sub-píxel del sensor."""
+        camara = ModeloCamara.desde_parametros(params)
+        plano = PlanoLaser.desde_parametros(params)
+        columnas = np.arange(ancho * subdivisiones, dtype=np.float32) / subdivisiones
+        tabla = np.full((alto, columnas.size, 2), np.nan, dtype=np.float32)
+
+        # Procesar por bloques de filas para acotar la memoria intermedia
+        filas_por_bloque = 32
+        for fila_inicio in range(0, alto, filas_por_bloque):
+            filas = np.arange(fila_inicio, min(alto, fila_inicio + filas_por_bloque), dtype=np.float32)
+            grilla = np.stack(np.meshgrid(columnas, filas), axis=-1).reshape(-1, 1, 2)
+            undistorted = cv2.undistortPoints(grilla, k_matrix, coef_dist).reshape(-1, 2)
+            rays = np.hstack([undistorted, np.ones((undistorted.shape[0], 1))])
+            rays /= np.linalg.norm(rays, axis=1, keepdims=True)
+
+            perfil, validos = camara.perfil(rays, plano)
+            bloque = np.full((rays.shape[0], 2), np.nan, dtype=np.float32)
+            bloque[validos] = perfil
+            tabla[int(filas[0]):int(filas[-1]) + 1] = bloque.reshape(filas.size, columnas.size, 2)
+
+        clave = clave_tabla(k_matrix, coef_dist, params, ancho, alto, subdivisiones)
+        return cls(tabla, subdivisiones, clave)
+
+    @classmethod
+    def cargar_o_construir(cls, ruta_calibracion, k_matrix, coef_dist, params,
+                           ancho=640, alto=480, subdivisiones=8):
+        """
+        Devuelve la tabla guardada junto al archivo de calibración si sigue
+        vigente; si no existe o cambió la calibración o los parámetros, la
+        reconstruye y la guarda.
+
+        Cada resolución y geometría tiene su archivo (la clave va en el
+        nombre): procesos que reprocesan sesiones distintas con la misma
+        calibración no se pisan la tabla.
+        """
+        clave = clave_tabla(k_matrix, coef_dist, params, ancho, alto, subdivisiones)
+        ruta_tabla = ruta_tabla_para(ruta_calibracion, clave)
+
+        try:
+            if ruta_tabla.exists():
+                with np.load(ruta_tabla) as datos:
+                    vigente = str(datos["clave"]) == clave
+                    tabla = cls(datos["tabla"], int(datos["subdivisiones"]), clave) if vigente else None
+                if tabla is not None:
+                    # Marcar como usada: las que se descartan son las más viejas
+                    os.utime(ruta_tabla)
+                    return tabla
+        except Exception as e:
+            print(f"Tabla de triangulación inválida, se reconstruye: {e}")
+
+        tabla = cls.construir(k_matrix, coef_dist, params, ancho, alto, subdivisiones)
+        try:
+            tabla.guardar(ruta_tabla)
+            descartar_tablas_viejas(ruta_calibracion)
+        except Exception as e:
+            print(f"No se pudo guardar la tabla de triangulación: {e}")
+        return tabla
+
+    def guardar(self, ruta_tabla):
+        """Guarda la tabla (sin comprimir, para que la carga sea inmediata)."""
+        ruta_tabla = Path(ruta_tabla)
+        # Temporal propio de cada proceso: varios reprocesos pueden guardar a la vez
+        temporal = ruta_tabla.with_name(f"{ruta_tabla.name}.{os.getpid()}.tmp")
+        with open(temporal, 'wb') as f:
+            np.savez(f, tabla=self.tabla, subdivisiones=self.subdivisiones, clave=self.clave)
+        temporal.replace(ruta_tabla)
+
+    def admite(self, forma_frame):
+        """Indica si la tabla corresponde a la resolución de un frame."""
+        return forma_frame[0] == self.alto and forma_frame[1] == self.ancho
+
+    def perfil(self, laser_pixels):
+        """
+        Convierte laser_pixels (N, 2) [x, y] en el perfil (M, 2) [radio, z].
+
+        Las columnas sub-píxel se interpolan linealmente entre las dos
+        divisiones vecinas de la tabla. Devuelve (perfil, validos) con la
+        misma convención que ModeloCamara.perfil().
+        """
+        if len(laser_pixels) == 0:
+            return np.empty((0, 2)), np.zeros(0, dtype=bool)
+
+        filas = laser_pixels[:, 1].astype(np.intp)
+        posicion = laser_pixels[:, 0].astype(np.float64) * self.subdivisiones
+        ultima = self.tabla.shape[1] - 1
+        indice = np.clip(np.floor(posicion).astype(np.intp), 0, ultima)
+        fraccion = np.clip(posicion - indice, 0.0, 1.0)[:, None]
+
+        p0 = self.tabla[filas, indice].astype(np.float64)
+        p1 = self.tabla[filas, np.minimum(indice + 1, ultima)].astype(np.float64)
+        # Si la columna cae justo en una división no se usa la vecina (puede ser NaN)
+        perfil = np.where(fraccion > 0, p0 + (p1 - p0) * fraccion, p0)
+
+        validos = np.isfinite(perfil).all(axis=1)
+        return perfil[validos], validos
+
+
+def ruta_tabla_para(ruta_calibracion, clave):
+    """Ruta de la tabla con esa clave, junto al archivo de calibración."""
+    ruta_calibracion = Path(ruta_calibracion)
+    return ruta_calibracion.with_name(f"{ruta_calibracion.stem}.{clave[:16]}.lut.npz")
+
+
+def descartar_tablas_viejas(ruta_calibracion, conservar=TABLAS_POR_CALIBRACION):
+    """Borra las tablas de la calibración que exceden `conservar` (las usadas hace más tiempo)."""
+    ruta_calibracion = Path(ruta_calibracion)
+    # Tabla única de versiones anteriores (sin clave en el nombre)
+    ruta_calibracion.with_name(ruta_calibracion.stem + ".lut.npz").unlink(missing_ok=True)
+
+    prefijo = ruta_calibracion.stem + "."
+    tablas = [p for p in ruta_calibracion.parent.iterdir()
+              if p.name.startswith(prefijo) and p.name.endswith(".lut.npz")]
+    tablas.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    for ruta in tablas[conservar:]:
+        try:
+            ruta.unlink()
+        except OSError:
+            pass                # Otro proceso la borró o la está usando
+
+
+class ProcesadorPerfiles:
+    """
+    Frame -> perfil (radio, z) -> puntos 3D con parámetros explícitos.
+
+    Reúne la detección, la triangulación (tabla precalculada si corresponde
+    a la resolución del frame, rayos contra el plano láser si no) y la
+    transformación al escaneo. No depende de variables globales: se puede
+    copiar a otros procesos.
+    """
+
+    def __init__(self, deteccion, modelo, plano, transformacion, k_matrix, coef_dist, tabla=None):
+        self.deteccion = deteccion
+        self.modelo = modelo
+        self.plano = plano
+        self.transformacion = transformacion
+        self.k_matrix = k_matrix
+        self.coef_dist = coef_dist
+        self.tabla = tabla
+
+    @classmethod
+    def desde_parametros(cls, params, deteccion, k_matrix, coef_dist, tabla=None):
+        """Crea el procesador a partir de 'parametros_calibracion' y un ParametrosDeteccion."""
+        return cls(deteccion, ModeloCamara.desde_parametros(params), PlanoLaser.desde_parametros(params),
+                   TransformacionEscaneo.desde_parametros(params), k_matrix, coef_dist, tabla)
+
+    def triangular(self, laser_pixels, forma_frame):
+        """laser_pixels (N, 2) -> (perfil, validos), con la tabla si admite la resolución."""
+        if self.tabla is not None and self.tabla.admite(forma_frame):
+            return self.tabla.perfil(laser_pixels)
+        rays = pixeles_a_rayos(laser_pixels, self.k_matrix, self.coef_dist)
+        return self.modelo.perfil(rays, self.plano)
+
+    def perfil(self, frame):
+        """Perfil 2D (radio, z) del frame junto con la fila del sensor de cada punto."""
+        laser_pixels = self.deteccion.detectar(frame)
+        if len(laser_pixels) == 0:
+            return np.empty((0, 2)), np.empty(0, dtype=np.intp)
+        perfil_2d, validos = self.triangular(laser_pixels, frame.shape)
+        return perfil_2d, laser_pixels[validos, 1].astype(np.intp)
+
+    def puntos(self, frame, angulo_mesa):
+        """(puntos 3D, filas) del frame tomado con la mesa en angulo_mesa."""
+        perfil_2d, filas = self.perfil(frame)
+        return self.transformacion.a_puntos(perfil_2d, angulo_mesa), filas
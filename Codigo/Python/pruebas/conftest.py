@@ -0,0 +1,5 @@
+"""Las pruebas importan el paquete nucleo desde Codigo/Python."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,56 @@
+"""
+La búsqueda del giro por niveles (buscar_giro_piramide) contra la búsqueda
+en un solo nivel (find_best_alignment) sobre los escaneos de Escaneos/.
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from nucleo.almacenamiento import cargar_puntos
+from nucleo.comparacion import (ParametrosComparacion, PatronPreparado, buscar_giro_piramide, center_cloud,
+                                downsample_cloud, find_best_alignment)
+
+CARPETA_ESCANEOS = Path(__file__).resolve().parents[3] / 'Escaneos'
+
+# Cada patrón contra la pieza del mismo tipo (escaneada con 50 muestras)
+PARES = [(f'Patron {tipo} {muestras}.csv', f'Pieza {tipo} 50.csv') for tipo in 'ABC' for muestras in (50, 100)]
+
+
+def preparar(nombre_patron, nombre_pieza):
+    rutas = [CARPETA_ESCANEOS / nombre_patron, CARPETA_ESCANEOS / nombre_pieza]
+    if not all(ruta.exists() for ruta in rutas):
+        pytest.skip(f"Faltan los escaneos {nombre_patron} / {nombre_pieza}")
+    parametros = ParametrosComparacion(semilla=0)
+    rng = parametros.generador()
+    patron = PatronPreparado.desde_puntos(cargar_puntos(rutas[0]), parametros, rng)
+    comparada, _ = center_cloud(cargar_puntos(rutas[1]))
+    comparada = downsample_cloud(comparada, parametros.num_muestras, rng)
+    niveles = [(nivel, downsample_cloud(comparada, len(nivel), rng)) for nivel in patron.niveles]
+    niveles.append((patron.reducido, comparada))
+    return parametros, patron, comparada, niveles
+
+
+def diferencia_angular(a, b):
+    return abs((a - b + 180) % 360 - 180)
+
+
+@pytest.mark.parametrize('metodo_giro', ['firma', 'grilla'])
+@pytest.mark.parametrize('nombre_patron, nombre_pieza', PARES)
+def test_piramide_mismo_giro_que_un_nivel(nombre_patron, nombre_pieza, metodo_giro):
+    parametros, patron, comparada, niveles = preparar(nombre_patron, nombre_pieza)
+    if metodo_giro == 'firma':
+        candidatos = patron.firma.giros_candidatos(patron.firma.de_comparada(comparada), parametros.candidatos_giro)
+        intervalo = 2 * parametros.ventana_firma()
+    else:
+        candidatos = list(np.arange(0, 360, int(parametros.angulo_paso)))
+        intervalo = parametros.angulo_paso / 2
+
+    angulo, distancia = buscar_giro_piramide(niveles, candidatos, intervalo, parametros.iteraciones,
+                                             parametros.candidatos_por_nivel, patron.arbol_reducido)
+    angulo_un_nivel, distancia_un_nivel, _, _ = find_best_alignment(
+        patron.reducido, comparada, iteraciones=parametros.iteraciones, arbol_patron=patron.arbol_reducido,
+        angulos_iniciales=candidatos, intervalo=intervalo)
+
+    assert diferencia_angular(angulo, angulo_un_nivel) <= 0.5
+    assert distancia == pytest.approx(distancia_un_nivel, rel=1e-3)
@@ -0,0 +1,52 @@
+"""
+Protocolo de muestreo contra el Arduino simulado, con el firmware actual y
+con el anterior (sin los modos con confirmación y giro continuo).
+
+    python -m pytest pruebas
+"""
+import pytest
+
+from nucleo.protocolo import LectorSerial, ProtocoloEscaneo
+from nucleo.simulador import ArduinoSimulado
+
+MUESTRAS = 5
+
+# Sin las esperas de homing, centrado y expulsión; el escaneo 100 veces más rápido
+TIEMPOS_RAPIDOS = {clave: 0.0 for clave in ("inicio", "homing", "centrado", "retorno", "expulsion", "fin_ciclo")}
+
+
+def iniciar_escaneo(modo, firmware_anterior):
+    """Lleva el ciclo del Arduino simulado hasta el inicio del escaneo. Devuelve (arduino, lector, modo)."""
+    arduino = ArduinoSimulado(tiempos=TIEMPOS_RAPIDOS, escala_tiempo=0.01, timeout=0.2,
+                              firmware_anterior=firmware_anterior)
+    lector = LectorSerial(arduino).iniciar()
+    protocolo = ProtocoloEscaneo(lector)
+    assert protocolo.solicitar_modo_automatico(timeout=5)
+    assert protocolo.esperar_pregunta_muestras(timeout=5)
+    return arduino, lector, protocolo.enviar_muestras(MUESTRAS, modo, timeout=5)
+
+
+@pytest.mark.parametrize("modo", ['demora_fija', 'confirmacion', 'continuo'])
+def test_firmware_actual_acepta_el_modo(modo):
+    arduino, lector, modo_firmware = iniciar_escaneo(modo, firmware_anterior=False)
+    try:
+        assert modo_firmware == modo
+    finally:
+        lector.detener()
+        arduino.close()
+
+
+@pytest.mark.parametrize("modo", ['confirmacion', 'continuo'])
+def test_firmware_anterior_escanea_con_demora_fija(modo):
+    arduino, lector, modo_firmware = iniciar_escaneo(modo, firmware_anterior=True)
+    try:
+        assert modo_firmware == 'demora_fija'
+        # El firmware anterior informa un ángulo por muestra, sin esperar confirmaciones
+        angulos = [lector.esperar_evento('angulo', timeout=5) for _ in range(MUESTRAS)]
+        assert all(evento is not None for evento in angulos)
+        assert [evento.valor for evento in angulos] == pytest.approx([i * 360.0 / MUESTRAS for i in range(MUESTRAS)])
+        assert lector.esperar_evento('finalizado', timeout=5) is not None
+        assert arduino.confirmaciones == 0
+    finally:
+        lector.detener()
+        arduino.close()
@@ -1,16 +1,26 @@
 import cv2
 import numpy as np
 import math
-import serial
 import time
-import json
 import sys
+import queue
 from pathlib import Path
 import tkinter as tk
 from tkinter import messagebox, ttk
 import threading
 from PIL import Image, ImageTk
-import pyvista as pv
+# pyvista se importa al abrir el gráfico 3D: tarda en cargar y no hace falta para escanear
+
+from nucleo.almacenamiento import (EXTENSION_ESCANEO, EscritorNube, FiltroNube, recuperar_parcial,
+                                   ruta_parcial_para)
+from nucleo.deteccion import ParametrosDeteccion
+from nucleo.pipeline import PipelineContinuo, PipelineEscaneo
+from nucleo.produccion import LineaProduccion
+from nucleo.protocolo import (CONFIRMACION, MODOS_PROTOCOLO, SEGUNDOS_GIRO_CONTINUO, SEGUNDOS_POR_MUESTRA,
+                              ProtocoloEscaneo)
+from nucleo.sesion import MODOS_GRABACION, GrabadorSesion
+from nucleo.servicios import Servicios
+from nucleo.triangulacion import PARAMETROS_GEOMETRIA, PARAMETROS_TRANSFORMACION, ProcesadorPerfiles
 
 # Archivos de configuración
 CONFIG_FILE = "Configuracion.json"
@@ -18,27 +28,41 @@ CALIBRACION = "CalibracionZoom.npz"
 
 # Directorio para guardar escaneos (carpeta raíz, no Datos)
 # El script se ejecuta desde Datos, así que subimos un nivel con parent
+# (se crea al comenzar el primer escaneo, no al importar el módulo)
 SCANS_DIR = Path.cwd().parent / 'Escaneos'
-SCANS_DIR.mkdir(exist_ok=True)
-OUTPUT = str(SCANS_DIR / 'Escaneo.csv')
+OUTPUT = str(SCANS_DIR / f'Escaneo{EXTENSION_ESCANEO}')
+OUTPUT_CSV = str(SCANS_DIR / 'Escaneo.csv')     # Exportación para otras herramientas
+SESIONES_DIR = SCANS_DIR / 'Sesiones'           # Frames grabados para reprocesar
+PRODUCCION_DIR = SCANS_DIR / 'Produccion'       # Un lote por carpeta: piezas y registro.csv
 
 # Parámetros por defecto
 BAUDRATE = 115200
 
 # Variables globales
-IND_CAM, THRESHOLD, ARDUINO = None, None, None
+IND_CAM, ARDUINO = None, None
 THETA_DEG, CAM_RADIUS, CAM_HEIGHT, CAM_PITCH = (None,) * 4
 OFFSET_RADIAL, OFFSET_ANGLE_DEG, OFFSET_Z, SCALE_FACTOR = (None,) * 4
 XY_ASPECT_FACTOR, Z_ASPECT_FACTOR = (None,) * 2
 Z_MIN, Z_MAX, MODULO_MAX = (None,) * 3
+DETECCION, FILTRO = ParametrosDeteccion(), FiltroNube()
+TRABAJADORES_ESCANEO = 2
+
+# Cada cuánto (ms) el hilo de Tk aplica los cambios de estado y progreso
+# pedidos por los hilos del escaneo (Tkinter no admite llamadas desde otros hilos)
+INTERVALO_INTERFAZ_MS = 50
+USAR_LUT, SUBDIVISIONES_LUT = True, 8
 
 # Configuración de escaneo
 ESCANEO_CONFIG = {
     "num_muestras": 10,
-    "tiempo_rotacion": 40.0 # segundos
+    "tiempo_rotacion": 40.0, # segundos
+    "modo_protocolo": "demora_fija", # 'demora_fija', 'confirmacion' o 'continuo'
+    "exportar_csv": True, # Guardar también Escaneo.csv además de Escaneo.nube
+    "grabar_sesion": False, # Guardar los frames para reprocesar el escaneo después
+    "modo_grabacion": "banda" # 'completo', 'rojo' o 'banda'
 }
 
-ser = None
+lector = None
 escaneo_activo = False
 thread_escaneo = None
 
@@ -47,17 +71,17 @@ thread_escaneo = None
 # FUNCIONES DE CARGA DE PARÁMETROS
 # =============================================================================
 
-def cargar_parametros():
+def cargar_parametros(servicios):
     """Carga todos los parámetros del sistema desde el archivo unificado."""
-    global IND_CAM, THRESHOLD, ARDUINO
+    global IND_CAM, ARDUINO
     global THETA_DEG, CAM_RADIUS, CAM_HEIGHT, CAM_PITCH
     global OFFSET_RADIAL, OFFSET_ANGLE_DEG, OFFSET_Z, SCALE_FACTOR
     global XY_ASPECT_FACTOR, Z_ASPECT_FACTOR, Z_MIN, Z_MAX, MODULO_MAX
+    global DETECCION, FILTRO, TRABAJADORES_ESCANEO, USAR_LUT, SUBDIVISIONES_LUT
     
     try:
-        # Cargar configuración unificada
-        with open(CONFIG_FILE, 'r') as f:
-            config = json.load(f)
+        # Cargar configuración unificada (sin releer el archivo si no cambió)
+        config = servicios.configuracion()
         
         # Obtener parámetros de calibración
         params = config.get('parametros_calibracion', {})
@@ -74,17 +98,26 @@ def cargar_parametros():
         Z_MIN = params.get('Z_MIN', 10.0)
         Z_MAX = params.get('Z_MAX', 110.0)
         MODULO_MAX = params.get('MODULO_MAX', 60.0)
+        FILTRO = FiltroNube(Z_MIN, Z_MAX, MODULO_MAX)
         
         # Obtener configuración de cámara
         setup = config.get('setup_camara', {})
         IND_CAM = setup.get("camera_index", 0)
-        THRESHOLD = setup.get("threshold", 100)
         ARDUINO = setup.get("arduino_port", "")
         
+        # Obtener umbral y modo de detección del láser (entero o sub-píxel)
+        DETECCION = ParametrosDeteccion.desde_config(config)
+        deteccion = config.get('deteccion_laser', {})
+        # Hilos que detectan y triangulan los perfiles durante el escaneo
+        TRABAJADORES_ESCANEO = max(1, int(deteccion.get("trabajadores", 2)))
+        
+        # Obtener configuración de la tabla de triangulación
+        triangulacion = config.get('triangulacion', {})
+        USAR_LUT = triangulacion.get("usar_lut", True)
+        SUBDIVISIONES_LUT = max(1, int(triangulacion.get("subdivisiones_lut", 8)))
+        
         # Cargar calibración
-        calib = np.load(CALIBRACION)
-        K = calib["K"]
-        dist = calib["dist"]
+        K, dist = servicios.calibracion()
         
         return K, dist, True
     
@@ -93,36 +126,36 @@ def cargar_parametros():
         return None, None, False
 
 
-def cargar_config_escaneo():
+def cargar_config_escaneo(servicios):
     """Carga la configuración de escaneo del archivo unificado."""
     global ESCANEO_CONFIG
     
     try:
-        with open(CONFIG_FILE, 'r') as f:
-            config = json.load(f)
-        escaneo = config.get('configuracion_escaneo', {})
+        escaneo = servicios.configuracion().get('configuracion_escaneo', {})
         ESCANEO_CONFIG = {
             "num_muestras": escaneo.get("num_muestras", 10),
-            "tiempo_rotacion": escaneo.get("tiempo_rotacion", 40.0)
+            "tiempo_rotacion": escaneo.get("tiempo_rotacion", 40.0),
+            "modo_protocolo": escaneo.get("modo_protocolo", "demora_fija"),
+            "exportar_csv": bool(escaneo.get("exportar_csv", True)),
+            "grabar_sesion": bool(escaneo.get("grabar_sesion", False)),
+            "modo_grabacion": escaneo.get("modo_grabacion", "banda")
         }
+        if ESCANEO_CONFIG["modo_protocolo"] not in MODOS_PROTOCOLO:
+            print(f"Modo de protocolo desconocido '{ESCANEO_CONFIG['modo_protocolo']}', usando 'demora_fija'")
+            ESCANEO_CONFIG["modo_protocolo"] = "demora_fija"
+        if ESCANEO_CONFIG["modo_grabacion"] not in MODOS_GRABACION:
+            print(f"Modo de grabación desconocido '{ESCANEO_CONFIG['modo_grabacion']}', usando 'banda'")
+            ESCANEO_CONFIG["modo_grabacion"] = "banda"
     except Exception as e:
         print(f"Error cargando configuración de escaneo: {e}")
         # Usar valores por defecto si hay error
 
 
-def guardar_config_escaneo():
+def guardar_config_escaneo(servicios):
     """Guarda la configuración de escaneo en el archivo unificado."""
     try:
-        # Cargar configuración completa
-        with open(CONFIG_FILE, 'r') as f:
-            config = json.load(f)
-        
         # Actualizar solo la sección configuracion_escaneo
-        config['configuracion_escaneo'] = ESCANEO_CONFIG
-        
-        # Guardar de vuelta
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=4)
+        servicios.guardar_seccion('configuracion_escaneo', ESCANEO_CONFIG)
     except Exception as e:
         print(f"Error guardando configuración de escaneo: {e}")
 
@@ -131,79 +164,19 @@ import os
 
 
 # =============================================================================
-# FUNCIONES DE CAPTURA Y PROCESAMIENTO
+# PARÁMETROS DEL PROCESAMIENTO
 # =============================================================================
+# La detección y la triangulación viven en nucleo (ProcesadorPerfiles)
 
-def capturar_laser_desde_frame(frame, threshold_val, k_matrix, coef_dist):
-    """Captura láser desde un frame ya disponible."""
-    if frame is None:
-        return np.array([]), None
-
-    # Extraer canal rojo
-    red_channel = frame[:, :, 2]
-    red_channel = cv2.GaussianBlur(red_channel, (15, 1), 0)
-
-    # Detectar píxeles del láser
-    laser_pixels = []
-    for y, row in enumerate(red_channel):
-        max_val = np.max(row)
-        if max_val > threshold_val:
-            x = np.argmax(row)
-            laser_pixels.append([x, y])
-
-    if not laser_pixels:
-        return np.array([]), frame
-
-    laser_pixels = np.array(laser_pixels, dtype=np.float32)
-    undistorted = cv2.undistortPoints(laser_pixels.reshape(-1, 1, 2), k_matrix, coef_dist).reshape(-1, 2)
-    
-    rays = np.hstack([undistorted, np.ones((undistorted.shape[0], 1))])
-    rays /= np.linalg.norm(rays, axis=1, keepdims=True)
-
-    return rays, frame
-
+def parametros_geometria():
+    """Parámetros de calibración que definen la geometría cámara-láser."""
+    return {nombre: globals()[nombre] for nombre in PARAMETROS_GEOMETRIA}
 
-def capturar_laser(threshold_val, k_matrix, coef_dist):
-    """Captura un frame y detecta el láser (fallback)."""
-    cap = cv2.VideoCapture(IND_CAM)
-    if not cap.isOpened():
-        return np.array([]), None
 
-    time.sleep(0.1)
-    ret, frame = cap.read()
-    cap.release()
-
-    if not ret:
-        return np.array([]), None
-
-    return capturar_laser_desde_frame(frame, threshold_val, k_matrix, coef_dist)
-
-
-def intersectar_rayos_y_calcular_perfil(rays):
-    """Intersecta rayos con el plano de láser."""
-    theta_rad = np.radians(THETA_DEG)
-    pitch_rad = np.radians(CAM_PITCH)
-    normal_plano_mundo = np.array([np.sin(theta_rad), -np.cos(theta_rad), 0])
-    T_cam_mundo = np.array([CAM_RADIUS, 0, CAM_HEIGHT])
-    R_z_neg90 = np.array([[0,1,0],[-1,0,0],[0,0,1]]) 
-    R_y_neg90 = np.array([[0,0,-1],[0,1,0],[1,0,0]])
-    R_cam_base = R_y_neg90 @ R_z_neg90
-    R_pitch = np.array([[1,0,0],[0,np.cos(pitch_rad),-np.sin(pitch_rad)],[0,np.sin(pitch_rad),np.cos(pitch_rad)]])
-    R_cam_a_mundo = R_cam_base @ R_pitch
-    points_2d = []
-
-    for ray_cam in rays:
-        ray_mundo = R_cam_a_mundo @ ray_cam
-        denom = np.dot(normal_plano_mundo, ray_mundo)
-        if abs(denom) < 1e-9:
-            continue
-        t = np.dot(normal_plano_mundo, T_cam_mundo) / -denom
-        if t > 0:
-            punto = T_cam_mundo + t * ray_mundo
-            radius = np.sqrt(punto[0]**2 + punto[1]**2) * np.sign(ray_cam[0])
-            points_2d.append([radius, punto[2]])
-    
-    return np.array(points_2d) if points_2d else np.array([])
+def parametros_calibracion():
+    """Parámetros de calibración en uso (geometría, transformación y filtros)."""
+    nombres = PARAMETROS_GEOMETRIA + PARAMETROS_TRANSFORMACION + ('Z_MIN', 'Z_MAX', 'MODULO_MAX')
+    return {nombre: globals()[nombre] for nombre in nombres}
 
 
 # =============================================================================
@@ -211,23 +184,38 @@ def intersectar_rayos_y_calcular_perfil(rays):
 # =============================================================================
 
 class EstacionEscaneo:
-    def __init__(self, root):
+    def __init__(self, root, servicios=None):
         self.root = root
+        # Compartidos con las demás pantallas cuando corre dentro del lanzador
+        self.servicios = servicios or Servicios(CONFIG_FILE, CALIBRACION)
         self.root.title("Estación de Escaneo 3D")
         self.root.geometry("1024x768")
         self.root.configure(bg='#1a1a2e')
+        # La cámara y el Arduino quedan abiertos entre piezas: se cierran al salir
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar)
+        
+        # Cambios de la interfaz pedidos desde los hilos del escaneo
+        self.cola_interfaz = queue.Queue()
+        self.root.after(INTERVALO_INTERFAZ_MS, self.atender_cola_interfaz)
         
         # Variables de estado
         self.escaneo_en_curso = False
+        # Modo producción: lote activo y si se sigue con la pieza siguiente
+        self.produccion = None
+        self.produccion_activa = False
+        self.label_produccion = None
+        self.ultimo_estado = ""
         self.frame_actual = None
         self.K_matrix = None
         self.dist_coef = None
+        self.tabla_triangulacion = None
+        self.procesador = None
         self.thread_escaneo = None
         self.thread_arduino = None
         
-        # Conexión persistente a cámara (para evitar problemas con OBS virtual)
-        self.cap = None
-        self.cap_lock = threading.Lock()
+        # Captura continua de la cámara (hilo propio con buffer de frames)
+        self.capturador = None
+        self.marca_video = None
         
         # Widgets para escaneo (inicializados como None)
         self.frame_progreso = None
@@ -237,50 +225,88 @@ class EstacionEscaneo:
         self.frame_video = None
         
         # Cargar parámetros
-        self.K_matrix, self.dist_coef, success = cargar_parametros()
+        self.K_matrix, self.dist_coef, success = cargar_parametros(self.servicios)
         if not success:
             self.pantalla_error("Error al cargar parámetros", "No se pudieron cargar los parámetros del sistema.\nVerifica el archivo de configuración.")
             return
         
-        cargar_config_escaneo()
+        cargar_config_escaneo(self.servicios)
         
         # Mostrar pantalla inicial (la conexión se hace cuando se comienza el escaneo)
         self.pantalla_inicio()
     
-    def limpiar_conexion_serial(self):
-        """Cierra y limpia la conexión serial anterior."""
-        global ser
+    def al_mostrar(self):
+        """El lanzador volvió a esta pantalla: releer la configuración (pudo cambiar en Setup)."""
+        if self.escaneo_en_curso:
+            return
+        self.K_matrix, self.dist_coef, success = cargar_parametros(self.servicios)
+        if success:
+            cargar_config_escaneo(self.servicios)
+    
+    def cerrar(self):
+        """Cierra la ventana (ejecución independiente) liberando la cámara y el puerto serie."""
+        self.escaneo_en_curso = False
+        self.produccion_activa = False
+        if self.produccion is not None:
+            # Los veredictos pendientes se registran si terminan a tiempo
+            self.produccion.detener(timeout=30)
         try:
-            if ser is not None:
-                try:
-                    ser.close()
-                except:
-                    pass
-                ser = None
-                time.sleep(0.5)
-        except:
-            pass
+            self.servicios.cerrar()
+        except Exception as e:
+            print(f"Error liberando dispositivos: {e}")
+        self.root.destroy()
+    
+    def en_interfaz(self, funcion, *args):
+        """Ejecuta funcion(*args) en el hilo de Tk (ya mismo si es el hilo actual)."""
+        if threading.current_thread() is threading.main_thread():
+            funcion(*args)
+        else:
+            self.cola_interfaz.put((funcion, args))
+    
+    def atender_cola_interfaz(self):
+        """Aplica los cambios encolados por los otros hilos (se reprograma mientras exista la ventana)."""
+        while True:
+            try:
+                funcion, args = self.cola_interfaz.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                funcion(*args)
+            except Exception as e:
+                print(f"Error actualizando la interfaz: {e}")
+        try:
+            self.root.after(INTERVALO_INTERFAZ_MS, self.atender_cola_interfaz)
+        except tk.TclError:
+            pass                # Ventana cerrada
     
     def conectar_arduino(self):
-        """Intenta conectar a Arduino."""
-        global ser
+        """Intenta conectar a Arduino (reutiliza la conexión de la pieza anterior si sigue sana)."""
+        global lector
         try:
-            # Limpiar conexión anterior
-            self.limpiar_conexion_serial()
-            
-            # Esperar un poco antes de reconectar
-            time.sleep(0.5)
-            
-            ser = serial.Serial(ARDUINO, BAUDRATE, timeout=2)
-            time.sleep(2)
-            # Limpiar buffer de entrada
-            ser.reset_input_buffer()
-            ser.reset_output_buffer()
+            lector = self.servicios.dispositivos.conexion_serial(ARDUINO, al_evento=self.al_evento_arduino,
+                                                                 baudrate=BAUDRATE)
             return True
         except Exception as e:
             print(f"Error conectando a Arduino: {e}")
             return False
     
+    def al_evento_arduino(self, evento):
+        """Muestra en el estado los mensajes del Arduino (llamado desde el hilo lector)."""
+        if evento.tipo in ('angulo', 'inicio_giro', 'pasos', 'fin_giro'):
+            # El avance del escaneo lo informa el pipeline
+            return
+        
+        print(f"[Arduino] {evento.texto}")
+        if not self.escaneo_en_curso or evento.tipo in ('pregunta_modo', 'pregunta_muestras', 'motores_desactivados'):
+            return
+        if evento.tipo == 'homing':
+            self.actualizar_estado("Realizando homing...")
+        elif evento.tipo in ('centrando', 'centrado'):
+            self.actualizar_estado("Centrando pieza...")
+        elif evento.tipo != 'expulsada':
+            # Mostrar cualquier otro mensaje de Arduino
+            self.actualizar_estado(evento.texto)
+    
     def limpiar_ventana(self):
         """Limpia la ventana."""
         for widget in self.root.winfo_children():
@@ -339,13 +365,13 @@ class EstacionEscaneo:
         """Reintenta la inicialización del sistema."""
         try:
             # Reintentar cargar parámetros
-            self.K_matrix, self.dist_coef, success = cargar_parametros()
+            self.K_matrix, self.dist_coef, success = cargar_parametros(self.servicios)
             if not success:
                 self.pantalla_error("Error al cargar parámetros", 
                                   "No se pudieron cargar los parámetros del sistema.\nVerifica el archivo de configuración.")
                 return
             
-            cargar_config_escaneo()
+            cargar_config_escaneo(self.servicios)
             self.pantalla_inicio()
         except Exception as e:
             self.pantalla_error("Error desconocido", str(e))
@@ -396,6 +422,19 @@ class EstacionEscaneo:
                               activeforeground='white')
         btn_inicio.pack(pady=20)
         
+        # Producción: escanear y comparar pieza tras pieza sin intervención
+        btn_produccion = tk.Button(frame_botones,
+                                  text="MODO PRODUCCIÓN",
+                                  font=("Segoe UI", 12, "bold"),
+                                  width=28, height=2,
+                                  bg='#00d966', fg='#1a1a2e',
+                                  command=self.comenzar_produccion,
+                                  cursor="hand2",
+                                  relief=tk.FLAT,
+                                  activebackground='#00ff7a',
+                                  activeforeground='#1a1a2e')
+        btn_produccion.pack(pady=5)
+        
         # Frame inferior con botón de configuración
         frame_inferior = tk.Frame(self.root, bg='#1a1a2e')
         frame_inferior.pack(side='bottom', fill='x', padx=20, pady=20)
@@ -452,8 +491,15 @@ class EstacionEscaneo:
                                      bg='#1a1a2e', fg='#b0b0b0')
         label_muestra_desc.pack(side='left', padx=5)
         
+        # El tiempo por muestra depende del protocolo de muestreo
+        modo_protocolo = ESCANEO_CONFIG["modo_protocolo"]
+        if modo_protocolo == "continuo":
+            texto_tiempo = f"Tiempo estimado ≈ {SEGUNDOS_GIRO_CONTINUO:g} segundos (una vuelta, giro continuo)"
+        else:
+            texto_tiempo = (f"Tiempo estimado = muestras × {SEGUNDOS_POR_MUESTRA[modo_protocolo]:g} segundos "
+                            f"(protocolo: {modo_protocolo})")
         label_info = tk.Label(frame_config,
-                             text="Tiempo estimado = muestras × 2 segundos",
+                             text=texto_tiempo,
                              font=("Segoe UI", 9, "italic"),
                              bg='#1a1a2e', fg='#707070')
         label_info.pack(anchor='w', pady=20)
@@ -495,7 +541,7 @@ class EstacionEscaneo:
                 return
             
             ESCANEO_CONFIG["num_muestras"] = num_muestras
-            guardar_config_escaneo()
+            guardar_config_escaneo(self.servicios)
             
             self.pantalla_inicio()
         except ValueError:
@@ -512,7 +558,6 @@ class EstacionEscaneo:
         
         # Conectar a Arduino justo ahora
         if not self.conectar_arduino():
-            self.liberar_camara()
             self.pantalla_error("Error de conexión", 
                               f"No hay conexión con Arduino en puerto: {ARDUINO}\n\nVerifica que Arduino esté conectado y encendido.")
             return
@@ -576,27 +621,161 @@ class EstacionEscaneo:
         # Ocultar barra de progreso inicialmente
         frame_progreso.pack_forget()
         
+        # Modo producción: resultado de las piezas ya comparadas y botón para detener el lote
+        self.label_produccion = None
+        if self.produccion is not None:
+            frame_produccion = tk.Frame(self.root, bg='#2d2d44')
+            frame_produccion.pack(side='bottom', fill='x')
+            
+            self.label_produccion = tk.Label(frame_produccion,
+                                            text=self.texto_produccion(),
+                                            font=("Segoe UI", 10, "bold"),
+                                            bg='#2d2d44', fg='#e0e0e0',
+                                            anchor='w', justify='left')
+            self.label_produccion.pack(side='left', fill='x', expand=True, padx=20, pady=8)
+            
+            btn_detener = tk.Button(frame_produccion,
+                                   text="DETENER PRODUCCIÓN",
+                                   font=("Segoe UI", 10, "bold"),
+                                   bg='#f44336', fg='white',
+                                   command=self.detener_produccion,
+                                   cursor="hand2",
+                                   relief=tk.FLAT,
+                                   activebackground='#ff5555',
+                                   activeforeground='white')
+            btn_detener.pack(side='right', padx=20, pady=8)
+        
         # Iniciar actualización de video
         self.actualizar_video_escaneo()
     
+    def comenzar_produccion(self):
+        """Inicia un lote: cada pieza se escanea, se compara en segundo plano y se pasa a la siguiente."""
+        try:
+            self.produccion = LineaProduccion.desde_config(
+                self.servicios.configuracion(), PRODUCCION_DIR, self.servicios.comparador,
+                al_veredicto=self.al_veredicto)
+        except Exception as e:
+            self.pantalla_error("Error en modo producción",
+                              f"No se pudo iniciar el lote: {e}\n\nConfigura las piezas patrón en Comparación.")
+            return
+        
+        print(f"[PRODUCCIÓN] Lote en {self.produccion.carpeta}")
+        self.produccion_activa = True
+        self.siguiente_pieza()
+    
+    def siguiente_pieza(self):
+        """Modo producción: comienza el escaneo de la pieza siguiente, o cierra el lote si se detuvo."""
+        if not self.produccion_activa:
+            self.finalizar_produccion()
+            return
+        
+        self.comenzar_escaneo()
+        if not self.escaneo_en_curso:
+            # No se pudo iniciar (cámara o Arduino): queda la pantalla de error
+            self.finalizar_produccion(mostrar_resumen=False)
+    
+    def detener_produccion(self):
+        """Termina el lote al terminar la pieza en curso."""
+        self.produccion_activa = False
+        if self.escaneo_en_curso:
+            self.actualizar_estado("Deteniendo producción al terminar esta pieza...")
+        elif self.produccion is not None:
+            self.finalizar_produccion()
+        else:
+            self.pantalla_inicio()
+    
+    def finalizar_produccion(self, motivo=None, mostrar_resumen=True):
+        """Espera los veredictos pendientes (sin bloquear la interfaz) y cierra el lote."""
+        produccion, self.produccion = self.produccion, None
+        self.produccion_activa = False
+        if produccion is None:
+            return
+        if produccion.pendientes():
+            self.actualizar_estado(f"Comparando {produccion.pendientes()} pieza(s) pendiente(s)...")
+        
+        def esperar():
+            produccion.detener()
+            piezas, aprobadas, rechazadas = produccion.resumen()
+            print(f"[PRODUCCIÓN] Lote terminado: {piezas} piezas, {aprobadas} aprobadas, "
+                  f"{rechazadas} rechazadas ({produccion.ruta_registro})")
+            if mostrar_resumen:
+                self.en_interfaz(self.pantalla_resumen_produccion, produccion, motivo)
+        
+        threading.Thread(target=esperar, daemon=True).start()
+    
+    def al_veredicto(self, veredicto):
+        """Veredicto de una pieza del lote (llamado desde el hilo de comparación)."""
+        if veredicto.similitud is not None:
+            resultado = "APROBADA" if veredicto.aprobada else "RECHAZADA"
+            print(f"[PRODUCCIÓN] Pieza {veredicto.pieza}: {resultado} - {veredicto.patron} "
+                  f"({veredicto.similitud:.2f}%, {veredicto.segundos:.1f} s)")
+        else:
+            print(f"[PRODUCCIÓN] Pieza {veredicto.pieza}: RECHAZADA - {veredicto.error}")
+        self.en_interfaz(self.actualizar_label_produccion)
+    
+    def texto_produccion(self):
+        """Resumen del lote y veredicto de la última pieza comparada."""
+        if self.produccion is None:
+            return ""
+        piezas, aprobadas, rechazadas = self.produccion.resumen()
+        texto = f"Lote: {piezas} piezas  |  Aprobadas: {aprobadas}  |  Rechazadas: {rechazadas}"
+        if self.produccion.veredictos:
+            ultimo = self.produccion.veredictos[-1]
+            detalle = (f"{ultimo.patron} {ultimo.similitud:.1f}%" if ultimo.similitud is not None
+                       else ultimo.error)
+            texto += f"\nPieza {ultimo.pieza}: {'APROBADA' if ultimo.aprobada else 'RECHAZADA'} ({detalle})"
+        return texto
+    
+    def actualizar_label_produccion(self):
+        try:
+            if self.label_produccion is not None and self.label_produccion.winfo_exists():
+                self.label_produccion.config(text=self.texto_produccion())
+        except:
+            pass
+    
+    def pantalla_resumen_produccion(self, produccion, motivo=None):
+        """Resumen del lote terminado."""
+        self.limpiar_ventana()
+        
+        frame_cartel = tk.Frame(self.root, bg='#1a1a2e')
+        frame_cartel.pack(fill='both', expand=True)
+        
+        titulo = tk.Label(frame_cartel,
+                         text="PRODUCCIÓN DETENIDA",
+                         font=("Segoe UI", 36, "bold"),
+                         bg='#1a1a2e', fg='#00d966' if motivo is None else '#f44336')
+        titulo.pack(pady=50)
+        
+        piezas, aprobadas, rechazadas = produccion.resumen()
+        info_text = (f"Piezas: {piezas}\nAprobadas: {aprobadas}\nRechazadas: {rechazadas}\n\n"
+                     f"Registro: {produccion.ruta_registro}")
+        if motivo:
+            info_text += f"\n\nMotivo: {motivo}"
+        info = tk.Label(frame_cartel,
+                       text=info_text,
+                       font=("Segoe UI", 13),
+                       bg='#1a1a2e', fg='#e0e0e0',
+                       wraplength=800, justify='center')
+        info.pack(pady=20)
+        
+        btn_volver = tk.Button(frame_cartel,
+                              text="VOLVER AL INICIO",
+                              font=("Segoe UI", 11, "bold"),
+                              width=25, height=2,
+                              bg='#3b24c8', fg='white',
+                              command=self.pantalla_inicio,
+                              cursor="hand2",
+                              relief=tk.FLAT,
+                              activebackground='#5636d3',
+                              activeforeground='white')
+        btn_volver.pack(pady=30)
+    
     def inicializar_camara(self):
-        """Inicializa la conexión persistente a la cámara."""
+        """Inicia (o reutiliza) la captura continua de la cámara en su propio hilo."""
         try:
-            with self.cap_lock:
-                if self.cap is None:
-                    self.cap = cv2.VideoCapture(IND_CAM)
-                    # Configurar para bajo buffer (importante para cámaras virtuales)
-                    self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                    # Configurar formato y resolución
-                    self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                    self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                    self.cap.set(cv2.CAP_PROP_FPS, 30)
-                    # Esperar estabilización
-                    for _ in range(5):
-                        ret, _ = self.cap.read()
-                        if not ret:
-                            time.sleep(0.1)
-                    return self.cap.isOpened()
+            # Sin reabrir ni descartar frames si la cámara de la pieza anterior sigue entregando
+            self.capturador = self.servicios.dispositivos.camara(IND_CAM, ancho=640, alto=480, fps=30)
+            return self.capturador is not None
         except Exception as e:
             print(f"Error inicializando cámara: {e}")
             return False
@@ -604,112 +783,140 @@ class EstacionEscaneo:
     def reconectar_camara(self):
         """Intenta reconectar la cámara."""
         try:
-            with self.cap_lock:
-                if self.cap is not None:
-                    try:
-                        self.cap.release()
-                    except:
-                        pass
-                    self.cap = None
-                    time.sleep(0.2)
-                
-                self.cap = cv2.VideoCapture(IND_CAM)
-                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                
-                # Descartar primeros frames
-                for _ in range(3):
-                    self.cap.read()
-                    time.sleep(0.05)
-                
-                return self.cap.isOpened()
+            self.liberar_camara()
+            time.sleep(0.2)
+            return self.inicializar_camara()
         except Exception as e:
             print(f"Error reconectando cámara: {e}")
             return False
     
     def liberar_camara(self):
-        """Libera la conexión a la cámara."""
+        """Detiene la captura y libera la cámara."""
         try:
-            with self.cap_lock:
-                if self.cap is not None:
-                    try:
-                        self.cap.release()
-                    except:
-                        pass
-                    self.cap = None
+            self.servicios.dispositivos.liberar_camara()
         except:
             pass
+        self.capturador = None
+    
+    def preparar_procesador(self):
+        """Procesador de perfiles con los parámetros cargados y la tabla de triangulación."""
+        self.preparar_tabla_triangulacion()
+        self.procesador = ProcesadorPerfiles.desde_parametros(
+            parametros_calibracion(), DETECCION, self.K_matrix, self.dist_coef, self.tabla_triangulacion)
+    
+    def preparar_tabla_triangulacion(self):
+        """Carga (o construye si cambió la calibración) la tabla píxel -> perfil."""
+        if not USAR_LUT:
+            self.tabla_triangulacion = None
+            return
+        
+        ancho, alto = 640, 480
+        if self.capturador is not None:
+            # Resolución real entregada por la cámara (puede diferir de la pedida)
+            _, frame = self.capturador.frame_despues_de(0.0, timeout=2.0)
+            if frame is not None:
+                alto, ancho = frame.shape[:2]
+        
+        try:
+            # En memoria de los servicios: solo se lee o construye si cambió la calibración
+            self.tabla_triangulacion = self.servicios.tabla_triangulacion(
+                parametros_geometria(), ancho=ancho, alto=alto, subdivisiones=SUBDIVISIONES_LUT)
+        except Exception as e:
+            print(f"Error preparando tabla de triangulación: {e}")
+            self.tabla_triangulacion = None
+    
+    def calcular_perfil(self, frame):
+        """
+        Detecta el láser en un frame y devuelve el perfil 2D (radio, z) junto
+        con la fila del sensor de cada punto.
+        """
+        # Con la tabla precalculada la triangulación es una lectura indexada
+        return self.procesador.perfil(frame)
+    
+    def procesar_muestra(self, frame, indice, num_muestras):
+        """(puntos 3D, filas del sensor) del frame, o None si no hay láser."""
+        perfil_2d, filas = self.calcular_perfil(frame)
+        if perfil_2d.shape[0] == 0:
+            return None
+        
+        # Ángulo: se calcula basado en el orden de la muestra
+        return self.transformar_perfil(perfil_2d, indice * 360.0 / num_muestras), filas
     
-    def capturar_laser_escaneo(self):
-        """Captura láser usando la cámara persistente durante escaneo."""
+    def procesar_frame_continuo(self, frame):
+        """(perfil 2D, filas) de un frame del giro continuo (el ángulo se asigna al terminar)."""
+        perfil_2d, filas = self.calcular_perfil(frame)
+        return (perfil_2d, filas) if perfil_2d.shape[0] > 0 else None
+    
+    def transformar_perfil(self, perfil_2d, angulo_mesa):
+        """Lleva un perfil (radio, z) tomado con la mesa en angulo_mesa a puntos 3D."""
+        return self.procesador.transformacion.a_puntos(perfil_2d, angulo_mesa)
+    
+    def crear_grabador_sesion(self, num_muestras, modo_protocolo):
+        """Grabador de los frames del escaneo, con los parámetros necesarios para reprocesarlo."""
+        forma = self.capturador.forma_frame() if self.capturador is not None else None
+        metadatos = {
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "num_muestras": num_muestras,
+            "modo_protocolo": modo_protocolo,
+            "forma_frame": list(forma or (480, 640, 3)),
+            "threshold": DETECCION.threshold,
+            "deteccion_laser": DETECCION.como_dict(),
+            "parametros_calibracion": parametros_calibracion(),
+        }
         try:
-            with self.cap_lock:
-                if self.cap is None or not self.cap.isOpened():
-                    return np.array([]), None
-                
-                # Leer frame
-                ret, frame = self.cap.read()
-                if not ret or frame is None:
-                    return np.array([]), None
-                
-                # Procesar láser
-                return capturar_laser_desde_frame(frame, THRESHOLD, self.K_matrix, self.dist_coef)
+            return GrabadorSesion(SESIONES_DIR / time.strftime("%Y%m%d-%H%M%S"),
+                                  ESCANEO_CONFIG["modo_grabacion"], metadatos, CALIBRACION)
         except Exception as e:
-            print(f"Error capturando láser: {e}")
-            return np.array([]), None
+            print(f"No se pudo iniciar la grabación de la sesión: {e}")
+            return None
+    
+    def recuperar_escaneo_interrumpido(self, ruta_parcial, ruta_salida):
+        """Guarda como archivo aparte los puntos de un escaneo anterior que no llegó a terminar."""
+        if not ruta_parcial.exists():
+            return
+        salida = Path(ruta_salida)
+        ruta_recuperada = salida.with_name(f"{salida.stem} (recuperado){salida.suffix}")
+        try:
+            puntos = recuperar_parcial(ruta_parcial, ruta_recuperada)
+            print(f"✓ Escaneo interrumpido recuperado: {len(puntos)} puntos en {ruta_recuperada}")
+        except Exception as e:
+            print(f"No se pudo recuperar el escaneo interrumpido: {e}")
     
     def actualizar_video_escaneo(self):
         """Actualiza el video en tiempo real durante escaneo."""
         if not self.escaneo_en_curso:
             return
         
-        frame_exito = False
         try:
-            with self.cap_lock:
-                if self.cap is None or not self.cap.isOpened():
-                    # Intentar reconectar
-                    if not self.reconectar_camara():
-                        self.root.after(33, self.actualizar_video_escaneo)
-                        return
-                
-                # Intentar leer frame
-                ret, frame = self.cap.read()
-                
-                if ret and frame is not None and frame.size > 0:
-                    try:
-                        # NO redimensionar, mantener 640x480 nativo
-                        # Convertir a RGB
-                        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                        
-                        # Convertir a PhotoImage (con manejo de excepción)
-                        img = Image.fromarray(frame_rgb)
-                        imgtk = ImageTk.PhotoImage(image=img)
-                        
-                        # Actualizar UI (en el thread principal)
-                        if self.frame_video.winfo_exists():
-                            self.frame_video.imgtk = imgtk
-                            self.frame_video.config(image=imgtk)
-                        frame_exito = True
-                    except Exception as e:
-                        print(f"Error procesando frame: {e}")
-                else:
-                    # Frame inválido, intentar reconectar en el próximo ciclo
-                    print("Frame inválido recibido")
+            if self.capturador is None or not self.capturador.esta_activo():
+                # Intentar reconectar
+                if not self.reconectar_camara():
+                    self.root.after(33, self.actualizar_video_escaneo)
+                    return
+            
+            # Último frame del buffer (no bloquea a la captura del escaneo)
+            marca, frame = self.capturador.ultimo_frame()
+            
+            if frame is not None and marca != self.marca_video:
+                self.marca_video = marca
+                try:
+                    # NO redimensionar, mantener 640x480 nativo
+                    # Convertir a RGB
+                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    
+                    # Convertir a PhotoImage (con manejo de excepción)
+                    img = Image.fromarray(frame_rgb)
+                    imgtk = ImageTk.PhotoImage(image=img)
+                    
+                    # Actualizar UI (en el thread principal)
+                    if self.frame_video.winfo_exists():
+                        self.frame_video.imgtk = imgtk
+                        self.frame_video.config(image=imgtk)
+                except Exception as e:
+                    print(f"Error procesando frame: {e}")
         
         except Exception as e:
             print(f"Error en actualizar_video_escaneo: {e}")
-            # Intentar liberar y reconectar
-            try:
-                with self.cap_lock:
-                    if self.cap is not None:
-                        try:
-                            self.cap.release()
-                        except:
-                            pass
-                        self.cap = None
-            except:
-                pass
         
         # Actualizar cada 33ms (30 FPS) para video más fluido
         if self.escaneo_en_curso:
@@ -717,96 +924,71 @@ class EstacionEscaneo:
     
     def _ejecutar_escaneo(self):
         """Ejecuta el escaneo (en hilo separado)."""
+        global lector
+        escritor = None
+        grabador = None
+        # En producción: si la pieza no termina (error o cancelación) se cierra el lote
+        pieza_terminada = False
         try:
             num_muestras = ESCANEO_CONFIG["num_muestras"]
             tiempo_rotacion = ESCANEO_CONFIG["tiempo_rotacion"]
+            # Con confirmación Arduino avanza apenas se captura cada muestra;
+            # en giro continuo se usan todos los frames de una vuelta
+            modo_protocolo = ESCANEO_CONFIG["modo_protocolo"]
+            con_confirmacion = modo_protocolo == "confirmacion"
+            giro_continuo = modo_protocolo == "continuo"
+            
+            # Tabla de triangulación (se reconstruye solo si cambió la calibración)
+            self.actualizar_estado("Preparando tabla de triangulación...")
+            self.preparar_procesador()
             
             # ===== FASE 0: ESPERAR PREGUNTA DE MODO AUTOMÁTICO =====
             self.actualizar_estado("Esperando respuesta de Arduino...")
+            protocolo = ProtocoloEscaneo(lector)
             
-            tiempo_espera_modo = time.time()
-            modo_recibido = False
-            
-            while not modo_recibido and (time.time() - tiempo_espera_modo) < 10:
-                if ser.in_waiting > 0:
-                    linea = ser.readline().decode('utf-8', errors='ignore').strip()
-                    if linea:
-                        if "modo" in linea.lower() and "automático" in linea.lower():
-                            modo_recibido = True
-                            break
-                time.sleep(0.1)
-            
-            if not modo_recibido:
+            exito = protocolo.solicitar_modo_automatico(timeout=10)
+            if not exito and self.servicios.dispositivos.serial_reutilizado:
+                # La placa no volvió al inicio del ciclo (p. ej. un escaneo cancelado):
+                # reabrir el puerto la reinicia
+                self.actualizar_estado("Reiniciando Arduino...")
+                lector = self.servicios.dispositivos.reconectar_serial()
+                protocolo = ProtocoloEscaneo(lector)
+                exito = protocolo.solicitar_modo_automatico(timeout=10)
+            if not exito:
                 self.actualizar_estado("ERROR: Arduino no envió pregunta de modo")
                 self.escaneo_en_curso = False
                 return
             
-            # Enviar "y" para modo automático
+            # Se respondió "y" para modo automático
             self.actualizar_estado("Iniciando escaneo...")
-            ser.write(b"y")
-            ser.flush()
-            time.sleep(0.5)
             
             # ===== FASE 1: ESPERAR HOMING Y CENTRADO =====
-            # Mostrar estado del Arduino sin barra de progreso
-            tiempo_inicio_espera = time.time()
-            muestras_preguntadas = False
-            
-            while not muestras_preguntadas and (time.time() - tiempo_inicio_espera) < 120:
+            # El estado del Arduino se muestra desde al_evento_arduino (sin barra de progreso)
+            cancelado = lambda: not self.escaneo_en_curso
+            if not protocolo.esperar_pregunta_muestras(timeout=120, cancelado=cancelado):
                 if not self.escaneo_en_curso:
                     self.actualizar_estado("Escaneo cancelado por usuario")
                     return
-                
-                try:
-                    if ser.in_waiting > 0:
-                        linea = ser.readline().decode('utf-8', errors='ignore').strip()
-                        
-                        if linea:
-                            # Mostrar estado del Arduino
-                            if "homing" in linea.lower():
-                                self.actualizar_estado("Realizando homing...")
-                            elif "centrando" in linea.lower() or "posicion" in linea.lower() or "avanzando" in linea.lower():
-                                self.actualizar_estado("Centrando pieza...")
-                            elif "cuantas muestras" in linea.lower() or "muestras desea" in linea.lower():
-                                # Arduino pide el número de muestras
-                                muestras_preguntadas = True
-                            else:
-                                # Mostrar cualquier otro mensaje de Arduino
-                                self.actualizar_estado(linea)
-                except:
-                    pass
-                
-                time.sleep(0.2)
-            
-            if not muestras_preguntadas:
                 self.actualizar_estado("ERROR: Timeout - Arduino no preguntó por muestras")
                 self.escaneo_en_curso = False
                 return
             
             # ===== FASE 2: ENVIAR NÚMERO DE MUESTRAS =====
             self.actualizar_estado(f"Enviando: {num_muestras} muestras...")
-            print(f"\n[FASE 2] Enviando número de muestras: {num_muestras}")
-            ser.write(f"{num_muestras}\n".encode())
-            ser.flush()
-            time.sleep(0.5)
-            
-            # Esperar confirmación de que inicia escaneo
-            tiempo_espera_inicio = time.time()
-            escaneo_iniciado = False
-            
-            while not escaneo_iniciado and (time.time() - tiempo_espera_inicio) < 10:
-                if ser.in_waiting > 0:
-                    linea = ser.readline().decode('utf-8', errors='ignore').strip()
-                    if linea:
-                        print(f"[FASE 2] Recibido: {linea}")
-                        self.actualizar_estado(linea)
-                        if "iniciando" in linea.lower() or "escaneo" in linea.lower():
-                            escaneo_iniciado = True
-                            print(f"[FASE 2] ✓ Confirmación de inicio recibida")
-                time.sleep(0.2)
-            
-            if not escaneo_iniciado:
+            print(f"\n[FASE 2] Enviando número de muestras: {num_muestras} (protocolo: {modo_protocolo})")
+            # El sufijo ('A' o 'C') selecciona el modo de escaneo en el firmware
+            modo_firmware = protocolo.enviar_muestras(num_muestras, modo_protocolo, timeout=10)
+            if modo_firmware is None:
                 print(f"[FASE 2] ⚠ Timeout, pero pasando a FASE 3 de todas formas...")
+            elif modo_firmware != modo_protocolo:
+                # Firmware anterior (sin modos con confirmación ni continuo): escanea con demora fija
+                print(f"[FASE 2] ⚠ El Arduino no confirmó el modo '{modo_protocolo}' "
+                      f"(firmware anterior a este protocolo); se continúa con '{modo_firmware}'")
+                self.actualizar_estado(f"Firmware sin modo '{modo_protocolo}': escaneo con demora fija")
+                modo_protocolo = modo_firmware
+                con_confirmacion = giro_continuo = False
+            else:
+                print(f"[FASE 2] ✓ Confirmación de inicio recibida")
             
             # ===== FASE 3: MOSTRAR BARRA DE PROGRESO Y CAPTURAR DATOS =====
             # AHORA mostramos la barra de progreso
@@ -814,214 +996,219 @@ class EstacionEscaneo:
             print(f"[FASE 3] Muestras solicitadas: {num_muestras}")
             self.mostrar_barra_progreso()
             
-            points_all = []
-            tiempo_total_estimado = (num_muestras * 2) + tiempo_rotacion
+            tiempo_total_estimado = (num_muestras * SEGUNDOS_POR_MUESTRA[modo_protocolo]) + tiempo_rotacion
+            if giro_continuo:
+                tiempo_total_estimado += SEGUNDOS_GIRO_CONTINUO
             tiempo_inicio_progreso = time.time()
             
-            muestras_recibidas = 0
             tiempo_espera_escaneo = time.time()
             
+            # En producción cada pieza tiene su archivo en la carpeta del lote
+            SCANS_DIR.mkdir(exist_ok=True)
+            if self.produccion is not None:
+                numero_pieza, ruta_salida, ruta_csv = self.produccion.nueva_pieza(ESCANEO_CONFIG["exportar_csv"])
+            else:
+                numero_pieza, ruta_salida = None, OUTPUT
+                ruta_csv = OUTPUT_CSV if ESCANEO_CONFIG["exportar_csv"] else None
+            
+            # Cada perfil se filtra y se guarda en disco apenas se calcula
+            ruta_parcial = ruta_parcial_para(ruta_salida)
+            self.recuperar_escaneo_interrumpido(ruta_parcial, ruta_salida)
+            escritor = EscritorNube(ruta_parcial, FILTRO)
+            
+            # Opcional: guardar los frames para poder reprocesar con otros parámetros
+            if ESCANEO_CONFIG["grabar_sesion"]:
+                grabador = self.crear_grabador_sesion(num_muestras, modo_protocolo)
+            
+            def grabar(frame, muestra, angulo):
+                if grabador is None:
+                    return
+                try:
+                    grabador.agregar(frame, muestra.indice, angulo, muestra.instante)
+                except Exception as e:
+                    print(f"Error grabando la muestra {muestra.indice + 1}: {e}")
+            
+            def guardar_muestra(frame, muestra):
+                resultado = self.procesar_muestra(frame, muestra.indice, num_muestras)
+                grabar(frame, muestra, muestra.indice * 360.0 / num_muestras)
+                if resultado is None:
+                    return None
+                puntos, filas = resultado
+                return escritor.agregar(puntos, muestra.indice, filas)
+            
+            def procesar_continuo(frame, muestra):
+                resultado = self.procesar_frame_continuo(frame)
+                grabar(frame, muestra, None)
+                return resultado
+            
             print(f"[FASE 3] Esperando ángulos de Arduino...")
             
-            # Esperar mientras Arduino envía ángulos (una muestra por ángulo)
-            while muestras_recibidas < num_muestras and (time.time() - tiempo_espera_escaneo) < (tiempo_total_estimado + 30):
+            def al_recibir(muestra):
+                print(f"[FASE 3] ✓ Muestra {muestra.indice + 1}/{num_muestras} recibida ({muestra.angulo:.2f}°)")
+                self.actualizar_estado(f"Escaneando... Muestra: {muestra.indice + 1}/{num_muestras}")
+            
+            def al_procesar(procesadas, total):
+                self.actualizar_progreso(procesadas, total, tiempo_total_estimado, tiempo_inicio_progreso)
+            
+            def al_avance(pasos, pasos_vuelta):
+                self.actualizar_estado(f"Escaneando... {pasos * 360.0 / pasos_vuelta:.0f}°")
+                self.actualizar_progreso(pasos, pasos_vuelta, tiempo_total_estimado, tiempo_inicio_progreso)
+            
+            # Serial, captura y procesamiento corren en etapas separadas: un perfil
+            # lento no demora la lectura del ángulo siguiente
+            if giro_continuo:
+                pipeline = PipelineContinuo(
+                    lector, self.capturador,
+                    procesar_continuo, num_trabajadores=TRABAJADORES_ESCANEO, al_avance=al_avance)
+            else:
+                pipeline = PipelineEscaneo(
+                    lector, self.capturador, guardar_muestra, num_muestras, num_trabajadores=TRABAJADORES_ESCANEO,
+                    confirmacion=CONFIRMACION if con_confirmacion else None,
+                    al_recibir=al_recibir, al_procesar=al_procesar)
+            pipeline.iniciar()
+            
+            while not pipeline.esperar(0.2):
                 if not self.escaneo_en_curso:
                     break
-                
-                # Leer mensajes de Arduino
-                if ser.in_waiting > 0:
-                    linea = ser.readline().decode('utf-8', errors='ignore').strip()
-                    if linea:
-                        print(f"[FASE 3] RAW: '{linea}'")
-                        
-                        # Intentar parsear como número (ángulo)
-                        es_muestra = False
-                        try:
-                            angulo_valor = float(linea)
-                            if 0 <= angulo_valor <= 360:
-                                es_muestra = True
-                                print(f"[FASE 3] ✓ Ángulo {angulo_valor:.2f}° detectado")
-                        except ValueError:
-                            pass
-                        
-                        if es_muestra:
-                            muestras_recibidas += 1
-                            print(f"[FASE 3] ✓ Muestra {muestras_recibidas}/{num_muestras} recibida")
-                            
-                            self.actualizar_estado(f"Escaneando... Muestra: {muestras_recibidas}/{num_muestras}")
-                            
-                            # Capturar láser (usando cámara persistente)
-                            rays, frame = self.capturar_laser_escaneo()
-                            
-                            if rays.shape[0] > 0:
-                                perfil_2d = intersectar_rayos_y_calcular_perfil(rays)
-                                if perfil_2d.shape[0] > 0:
-                                    # Transformar puntos
-                                    radii = np.abs(perfil_2d[:, 0] + OFFSET_RADIAL)
-                                    heights = -perfil_2d[:, 1]
-                                    
-                                    # Ángulo: se calcula basado en muestras recibidas
-                                    angle_deg = ((muestras_recibidas - 1) * 360.0 / num_muestras) + OFFSET_ANGLE_DEG
-                                    angle_rad = np.radians(angle_deg)
-                                    
-                                    puntos_transformados = np.column_stack((
-                                        radii * np.cos(angle_rad),
-                                        radii * np.sin(angle_rad),
-                                        heights
-                                    ))
-                                    
-                                    puntos_transformados[:, 2] += OFFSET_Z
-                                    puntos_transformados *= SCALE_FACTOR
-                                    puntos_transformados[:, :2] *= XY_ASPECT_FACTOR
-                                    puntos_transformados[:, 2] *= Z_ASPECT_FACTOR
-                                    
-                                    points_all.append(puntos_transformados)
-                            
-                            # Actualizar barra de progreso
-                            self.actualizar_progreso(muestras_recibidas, num_muestras, tiempo_total_estimado, tiempo_inicio_progreso)
-                
-                time.sleep(0.1)
+                if (time.time() - tiempo_espera_escaneo) > (tiempo_total_estimado + 30):
+                    print(f"[FASE 3] ⚠ Timeout: {pipeline.recibidas}/{num_muestras} ángulos recibidos")
+                    break
+            pipeline.detener()
+            
+            if giro_continuo:
+                # Ángulo de cada frame interpolado entre los eventos de pasos:
+                # recién ahora se pueden transformar y guardar los perfiles
+                perfiles = pipeline.muestras_con_angulo()
+                for indice, (angulo, (perfil_2d, filas)) in enumerate(perfiles):
+                    escritor.agregar(self.transformar_perfil(perfil_2d, angulo), indice, filas)
+                print(f"[FASE 3] Frames procesados: {pipeline.procesadas} "
+                      f"({len(perfiles)} perfiles con láser dentro de la vuelta)")
+                if grabador is not None:
+                    grabador.asignar_angulos(*pipeline.tiempos_eventos())
+            else:
+                print(f"[FASE 3] Perfiles procesados: {pipeline.procesadas}/{num_muestras} "
+                      f"(frames perdidos: {pipeline.frames_perdidos})")
+            
+            if grabador is not None:
+                grabador.cerrar()
+                print(f"[FASE 3] ✓ Sesión grabada en {grabador.carpeta}")
             
             # ===== FASE 4: ESPERAR FINALIZACIÓN Y EXPULSIÓN =====
             print(f"\n[FASE 4] Esperando finalización y expulsión...")
             
-            tiempo_espera_fin = time.time()
-            escaneo_completado = False
-            pieza_expulsada = False
-            
             # Esperar mientras Arduino confirma escaneo finalizado y pieza expulsada
-            while (time.time() - tiempo_espera_fin) < 60:
-                if ser.in_waiting > 0:
-                    linea = ser.readline().decode('utf-8', errors='ignore').strip()
-                    if linea:
-                        print(f"[FASE 4] Recibido: {linea}")
-                        
-                        # Detectar estados
-                        if "escaneo finalizado" in linea.lower():
-                            escaneo_completado = True
-                            print(f"[FASE 4] ✓ Escaneo finalizado")
-                        
-                        if "expulsando" in linea.lower():
-                            self.actualizar_estado("Expulsando pieza...")
-                            print(f"[FASE 4] → Expulsando pieza...")
-                        
-                        if "pieza expulsada" in linea.lower():
-                            pieza_expulsada = True
-                            print(f"[FASE 4] ✓ Pieza expulsada")
-                            self.actualizar_estado("Pieza expulsada")
-                            # AHORA ocultamos la barra cuando la pieza está expulsada
-                            self.ocultar_barra_progreso()
-                            break
-                        
-                        # Mostrar otros mensajes
-                        if not ("expulsando" in linea.lower() or "pieza expulsada" in linea.lower() or 
-                               "escaneo finalizado" in linea.lower() or "motores" in linea.lower()):
-                            self.actualizar_estado(linea)
-                
-                time.sleep(0.2)
-            
-            # Si pasó el timeout sin confirmación, ocultar barra igual
-            if not pieza_expulsada:
+            pieza_expulsada = protocolo.esperar_expulsion(timeout=60)
+            if pieza_expulsada:
+                print(f"[FASE 4] ✓ Pieza expulsada")
+                self.actualizar_estado("Pieza expulsada")
+                # AHORA ocultamos la barra cuando la pieza está expulsada
+                self.ocultar_barra_progreso()
+            else:
+                # Si pasó el timeout sin confirmación, ocultar barra igual
                 print(f"[FASE 4] ⚠ Timeout esperando confirmación de expulsión")
                 self.ocultar_barra_progreso()
                 self.actualizar_estado("Timeout - procesando resultados...")
             
             # ===== FASE 5: PROCESAMIENTO Y RESULTADOS =====
             print(f"\n[FASE 5] Procesando nube de puntos...")
-            if points_all:
-                nube_completa = np.vstack(points_all)
-                mask = (
-                    (nube_completa[:, 2] >= Z_MIN) &
-                    (nube_completa[:, 2] <= Z_MAX) &
-                    (np.linalg.norm(nube_completa[:, :2], axis=1) <= MODULO_MAX)
-                )
-                nube_filtrada = nube_completa[mask]
-                nube_filtrada[:, 2] -= Z_MIN
-                
-                # Guardar archivo
-                np.savetxt(OUTPUT, nube_filtrada, delimiter=',',
-                          header='X,Y,Z', comments='', fmt='%.6f')
-                print(f"[FASE 5] ✓ Nube de puntos guardada: {OUTPUT}")
+            if escritor.puntos > 0:
+                # Los perfiles ya están filtrados en disco: ordenarlos y generar el archivo
+                metadatos = {"muestras": num_muestras, "modo_protocolo": modo_protocolo,
+                             "z_min": Z_MIN, "fecha": time.strftime("%Y-%m-%d %H:%M:%S")}
+                if numero_pieza is not None:
+                    metadatos["pieza"] = numero_pieza
+                nube_filtrada = escritor.finalizar(ruta_salida, ruta_csv, metadatos)
+                print(f"[FASE 5] ✓ Nube de puntos guardada: {ruta_salida}")
+                if ruta_csv:
+                    print(f"[FASE 5] ✓ Exportada a CSV: {ruta_csv}")
                 
-                # Mostrar resultados
                 self.escaneo_en_curso = False
-                self.pantalla_escaneo_completado(nube_filtrada, OUTPUT)
+                if self.produccion is not None:
+                    # La nube pasa en memoria al comparador, que trabaja mientras llega la pieza siguiente
+                    self.produccion.comparar(numero_pieza, nube_filtrada, ruta_salida)
+                    pieza_terminada = True
+                    self.en_interfaz(self.siguiente_pieza)
+                else:
+                    # Mostrar resultados
+                    self.en_interfaz(self.pantalla_escaneo_completado, nube_filtrada, ruta_salida)
             else:
+                escritor.descartar()
                 self.actualizar_estado("ERROR: No se capturaron puntos")
                 self.escaneo_en_curso = False
+                if self.produccion is not None:
+                    # Se registra como rechazada y la línea sigue
+                    self.produccion.descartar(numero_pieza, "No se capturaron puntos")
+                    pieza_terminada = True
+                    self.en_interfaz(self.siguiente_pieza)
         
         except Exception as e:
+            if escritor is not None:
+                # Lo guardado hasta el error se recupera al iniciar el próximo escaneo
+                escritor.cerrar()
+                print(f"Puntos parciales conservados en {escritor.ruta_parcial}")
+            if grabador is not None:
+                grabador.cerrar()
             self.actualizar_estado(f"ERROR: {str(e)}")
             self.escaneo_en_curso = False
-            # Mostrar pantalla de error después de 2 segundos
-            self.root.after(2000, lambda: self.pantalla_error("Error durante escaneo", str(e)))
+            # Mostrar pantalla de error después de 2 segundos (en producción, el resumen del lote)
+            if self.produccion is None:
+                mensaje = str(e)
+                self.en_interfaz(self.root.after, 2000, lambda: self.pantalla_error("Error durante escaneo", mensaje))
+        
+        finally:
+            if self.produccion is not None and not pieza_terminada:
+                self.escaneo_en_curso = False
+                self.finalizar_produccion(motivo=self.ultimo_estado)
     
     def actualizar_estado(self, texto):
-        """Actualiza el estado sin emojis."""
-        try:
-            self.label_estado.config(text=f"{texto}")
-            self.root.update_idletasks()
-        except:
-            pass
+        """Actualiza el estado sin emojis (desde cualquier hilo)."""
+        self.ultimo_estado = texto
+        self.en_interfaz(self._mostrar_estado, texto)
+    
+    def _mostrar_estado(self, texto):
+        if self.label_estado is None or not self.label_estado.winfo_exists():
+            return
+        self.label_estado.config(text=f"{texto}")
+        self.root.update_idletasks()
     
     def mostrar_barra_progreso(self):
-        """Muestra la barra de progreso."""
-        try:
-            if self.frame_progreso is None:
-                print("⚠ frame_progreso es None, no se puede mostrar")
-                return False
-            
-            # Mostrar explícitamente
-            self.frame_progreso.pack(fill='x', padx=20, pady=10)
-            self.root.update_idletasks()
-            time.sleep(0.05)
-            self.root.update_idletasks()
-            print("✓ Barra de progreso MOSTRADA")
-            return True
-        except Exception as e:
-            print(f"✗ Error mostrando barra: {e}")
-            return False
+        """Muestra la barra de progreso (desde cualquier hilo)."""
+        self.en_interfaz(self._empaquetar_barra_progreso, True)
     
     def ocultar_barra_progreso(self):
-        """Oculta la barra de progreso."""
-        try:
-            if self.frame_progreso is None:
-                print("⚠ frame_progreso es None, no se puede ocultar")
-                return False
-            
+        """Oculta la barra de progreso (desde cualquier hilo)."""
+        self.en_interfaz(self._empaquetar_barra_progreso, False)
+    
+    def _empaquetar_barra_progreso(self, visible):
+        if self.frame_progreso is None or not self.frame_progreso.winfo_exists():
+            print(f"⚠ frame_progreso no existe, no se puede {'mostrar' if visible else 'ocultar'}")
+            return
+        if visible:
+            self.frame_progreso.pack(fill='x', padx=20, pady=10)
+        else:
             self.frame_progreso.pack_forget()
-            self.root.update_idletasks()
-            print("✓ Barra de progreso OCULTA")
-            return True
-        except Exception as e:
-            print(f"✗ Error ocultando barra: {e}")
-            return False
+        self.root.update_idletasks()
+        print(f"✓ Barra de progreso {'MOSTRADA' if visible else 'OCULTA'}")
     
     def actualizar_progreso(self, actual, total, tiempo_total, tiempo_inicio):
-        """Actualiza la barra de progreso."""
-        try:
-            if self.progress_bar is None or self.label_tiempo is None:
-                print(f"⚠ Widgets de progreso no inicializados")
-                return False
-            
-            porcentaje = int((actual / total) * 100)
-            self.progress_bar['value'] = porcentaje
-            
-            tiempo_transcurrido = time.time() - tiempo_inicio
-            tiempo_restante = max(0, tiempo_total - tiempo_transcurrido)
-            
-            minutos = int(tiempo_restante // 60)
-            segundos = int(tiempo_restante % 60)
-            
-            self.label_tiempo.config(text=f"Tiempo restante estimado: {minutos:02d}:{segundos:02d}")
-            
-            print(f"  → Progreso: {actual}/{total} ({porcentaje}%)")
-            
-            self.root.update_idletasks()
-            return True
-        except Exception as e:
-            print(f"✗ Error actualizando progreso: {e}")
-            return False
+        """Actualiza la barra de progreso (desde cualquier hilo)."""
+        porcentaje = int((actual / total) * 100)
+        
+        tiempo_transcurrido = time.time() - tiempo_inicio
+        tiempo_restante = max(0, tiempo_total - tiempo_transcurrido)
+        
+        minutos = int(tiempo_restante // 60)
+        segundos = int(tiempo_restante % 60)
+        
+        print(f"  → Progreso: {actual}/{total} ({porcentaje}%)")
+        self.en_interfaz(self._mostrar_progreso, porcentaje,
+                         f"Tiempo restante estimado: {minutos:02d}:{segundos:02d}")
+    
+    def _mostrar_progreso(self, porcentaje, texto_tiempo):
+        if self.progress_bar is None or self.label_tiempo is None or not self.progress_bar.winfo_exists():
+            return
+        self.progress_bar['value'] = porcentaje
+        self.label_tiempo.config(text=texto_tiempo)
     
     def pantalla_escaneo_completado(self, nube_puntos, archivo_guardado):
         """Muestra cartel grande de escaneo completado."""
@@ -1090,6 +1277,7 @@ class EstacionEscaneo:
     def mostrar_grafico_3d(self, nube_puntos):
         """Muestra el gráfico 3D."""
         try:
+            import pyvista as pv
             plotter = pv.Plotter(window_size=(1024, 768))
             plotter.set_background('white')
             plotter.add_mesh(pv.PolyData(nube_puntos), color='red',
@@ -1104,30 +1292,14 @@ class EstacionEscaneo:
     
     def comenzar_escaneo_desde_completado(self):
         """Inicia un nuevo escaneo desde la pantalla de completado."""
-        try:
-            # Limpiar recursos
-            self.escaneo_en_curso = False
-            self.liberar_camara()
-            self.limpiar_conexion_serial()
-            time.sleep(0.5)
-        except:
-            pass
-        finally:
-            # Ahora comenzar nuevo escaneo
-            self.comenzar_escaneo()
+        # La cámara y el Arduino siguen abiertos: comenzar_escaneo() los reutiliza
+        self.escaneo_en_curso = False
+        self.comenzar_escaneo()
     
     def volver_desde_completado(self):
         """Vuelve al inicio desde pantalla de completado."""
-        try:
-            # Limpiar recursos
-            self.escaneo_en_curso = False
-            self.liberar_camara()
-            self.limpiar_conexion_serial()
-            time.sleep(0.5)
-        except:
-            pass
-        finally:
-            self.pantalla_inicio()
+        self.escaneo_en_curso = False
+        self.pantalla_inicio()
     
     def pantalla_expulsion(self):
         """Pantalla de expulsión de pieza."""
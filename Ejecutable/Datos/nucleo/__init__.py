@@ -0,0 +1,9 @@
+"""
+Núcleo de procesamiento del escáner 3D.
+
+Funciones de cálculo compartidas por las herramientas (Setup Cámara, Escaneo,
+Comparación, Ajuste Sliders) y por los scripts de lote y benchmark. No
+importa Tkinter ni pyvista ni tiene efectos al importarse: los parámetros
+se pasan como objetos (ParametrosDeteccion, FiltroNube, ProcesadorPerfiles,
+ParametrosComparacion) en lugar de variables globales.
+"""
@@ -0,0 +1,355 @@
+"""
+Archivos de nubes de puntos.
+
+Formato de escaneo (.nube): cabecera con metadatos JSON y, por columnas,
+XYZ float32 (N, 3), índice de la muestra (ángulo) int32 y fila del sensor
+de la que salió cada punto int16 (-1 si no se conoce). cargar_escaneo()
+lo abre con memmap, sin copiar ni interpretar texto. El CSV (X,Y,Z) sigue
+disponible para exportar e importar.
+
+Los CSV que llegan de otras herramientas se leen una sola vez: la primera
+lectura deja al lado una copia en formato .nube (archivo ".cache") con el
+tamaño, la fecha y el hash del CSV, y las siguientes la abren con memmap.
+El CSV sigue siendo el original: si cambia, la copia se regenera.
+
+EscritorNube agrega cada perfil, ya filtrado, a un archivo binario parcial
+(registros de tamaño fijo) apenas se calcula. La memoria no crece con el
+número de muestras y, si el programa se corta a mitad del escaneo, lo
+escrito hasta ese momento se recupera con recuperar_parcial(). finalizar()
+ordena por muestra y genera el archivo del escaneo.
+"""
+import hashlib
+import json
+import os
+import struct
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+EXTENSION_ESCANEO = ".nube"
+EXTENSION_PARCIAL = ".parcial"
+EXTENSION_CACHE = ".cache"
+
+# Cabecera: firma, versión, largo de los metadatos y número de puntos; los
+# datos empiezan alineados a ALINEACION_DATOS bytes
+FIRMA_ESCANEO = b"NUBE3D\x00\x00"
+VERSION_ESCANEO = 1
+CABECERA = struct.Struct('<8sIIQ')
+ALINEACION_DATOS = 64
+
+# Un punto del archivo parcial: coordenadas, muestra (ángulo) y fila del sensor de origen
+REGISTRO_PUNTO = np.dtype([('xyz', '<f4', (3,)), ('indice', '<i4'), ('fila', '<i2')])
+
+# Escaneo cargado: puntos (N, 3) float32, indices (N,), filas (N,) y metadatos (dict)
+Escaneo = namedtuple('Escaneo', ['puntos', 'indices', 'filas', 'metadatos'])
+
+# Puntos por bloque al exportar a CSV (acota la memoria del texto generado)
+PUNTOS_POR_BLOQUE = 100_000
+
+
+def mascara_util(puntos, z_min, z_max, modulo_max):
+    """Puntos dentro de la zona útil del escáner (altura y distancia al eje)."""
+    return (
+        (puntos[:, 2] >= z_min) &
+        (puntos[:, 2] <= z_max) &
+        (np.linalg.norm(puntos[:, :2], axis=1) <= modulo_max)
+    )
+
+
+def filtrar_puntos(puntos, z_min, z_max, modulo_max):
+    """Recorta la nube a la zona útil y lleva Z_MIN a z = 0."""
+    filtrados = puntos[mascara_util(puntos, z_min, z_max, modulo_max)]
+    filtrados[:, 2] -= z_min
+    return filtrados
+
+
+class FiltroNube:
+    """Zona útil del escáner (Z_MIN, Z_MAX y MODULO_MAX de 'parametros_calibracion')."""
+
+    def __init__(self, z_min=10.0, z_max=110.0, modulo_max=60.0):
+        self.z_min = z_min
+        self.z_max = z_max
+        self.modulo_max = modulo_max
+
+    @classmethod
+    def desde_parametros(cls, params):
+        """Crea el filtro a partir de 'parametros_calibracion'."""
+        return cls(params.get('Z_MIN', 10.0), params.get('Z_MAX', 110.0), params.get('MODULO_MAX', 60.0))
+
+    def mascara(self, puntos):
+        return mascara_util(puntos, self.z_min, self.z_max, self.modulo_max)
+
+    def aplicar(self, puntos, filas=None):
+        """Como filtrar_puntos(); si se indican filas devuelve (puntos, filas)."""
+        mascara = self.mascara(puntos)
+        filtrados = puntos[mascara]
+        filtrados[:, 2] -= self.z_min
+        return filtrados if filas is None else (filtrados, filas[mascara])
+
+
+# =============================================================================
+# FORMATO DE ESCANEO
+# =============================================================================
+
+def guardar_escaneo(ruta, puntos, indices=None, filas=None, metadatos=None):
+    """Guarda una nube en formato .nube (los índices y filas faltantes quedan en -1)."""
+    puntos = np.ascontiguousarray(puntos, dtype='<f4').reshape(-1, 3)
+    n = len(puntos)
+    indices = np.full(n, -1, dtype='<i4') if indices is None else np.asarray(indices, dtype='<i4')
+    filas = np.full(n, -1, dtype='<i2') if filas is None else np.asarray(filas, dtype='<i2')
+
+    texto = json.dumps(metadatos or {}).encode('utf-8')
+    inicio = CABECERA.size + len(texto)
+    relleno = -inicio % ALINEACION_DATOS
+
+    # Se escribe a un temporal y se reemplaza: nunca queda un archivo a medias
+    temporal = Path(str(ruta) + ".tmp")
+    with open(temporal, 'wb') as f:
+        f.write(CABECERA.pack(FIRMA_ESCANEO, VERSION_ESCANEO, len(texto), n))
+        f.write(texto + b"\x00" * relleno)
+        f.write(puntos.tobytes())
+        f.write(indices.tobytes())
+        f.write(filas.tobytes())
+    os.replace(temporal, ruta)
+
+
+def cargar_escaneo(ruta):
+    """Abre un archivo .nube; los arrays son memmap de solo lectura sobre el archivo."""
+    with open(ruta, 'rb') as f:
+        firma, version, largo, n = CABECERA.unpack(f.read(CABECERA.size))
+        if firma != FIRMA_ESCANEO:
+            raise ValueError(f"'{ruta}' no es un archivo de escaneo")
+        if version > VERSION_ESCANEO:
+            raise ValueError(f"Versión de escaneo no soportada: {version}")
+        metadatos = json.loads(f.read(largo).decode('utf-8') or "{}")
+
+    inicio = CABECERA.size + largo
+    inicio += -inicio % ALINEACION_DATOS
+    if n == 0:
+        return Escaneo(np.empty((0, 3), dtype='<f4'), np.empty(0, dtype='<i4'),
+                       np.empty(0, dtype='<i2'), metadatos)
+
+    puntos = np.memmap(ruta, dtype='<f4', mode='r', offset=inicio, shape=(n, 3))
+    indices = np.memmap(ruta, dtype='<i4', mode='r', offset=inicio + 12 * n, shape=(n,))
+    filas = np.memmap(ruta, dtype='<i2', mode='r', offset=inicio + 16 * n, shape=(n,))
+    return Escaneo(puntos, indices, filas, metadatos)
+
+
+def cargar_csv(ruta):
+    """Carga una nube desde un CSV (X,Y,Z) con una fila de cabecera."""
+    puntos = np.loadtxt(ruta, delimiter=',', skiprows=1, dtype=np.float64, ndmin=2)
+    if puntos.shape[1] < 3:
+        raise ValueError("El archivo CSV no tiene el formato esperado (min. 3 columnas).")
+    return puntos[:, :3]
+
+
+def guardar_csv(ruta, puntos):
+    """Guarda la nube en el formato CSV de los escaneos (X,Y,Z)."""
+    with open(ruta, 'w') as f:
+        f.write('X,Y,Z\n')
+        for inicio in range(0, len(puntos), PUNTOS_POR_BLOQUE):
+            np.savetxt(f, puntos[inicio:inicio + PUNTOS_POR_BLOQUE], delimiter=',', fmt='%.6f')
+
+
+def cargar_puntos(ruta, usar_cache=True):
+    """
+    Puntos (N, 3) de un escaneo .nube o de un CSV. Con usar_cache los CSV
+    se leen a través de su copia binaria (ver cargar_csv_con_cache()).
+    """
+    if Path(ruta).suffix.lower() == EXTENSION_ESCANEO:
+        return cargar_escaneo(ruta).puntos
+    if usar_cache:
+        return cargar_csv_con_cache(ruta)
+    return cargar_csv(ruta)
+
+
+# =============================================================================
+# CACHÉ BINARIA DE LOS CSV
+# =============================================================================
+
+def ruta_cache_para(ruta_csv):
+    """Copia binaria asociada a un CSV."""
+    ruta_csv = Path(ruta_csv)
+    return ruta_csv.with_name(ruta_csv.name + EXTENSION_CACHE)
+
+
+def firma_archivo(ruta):
+    """(mtime, tamaño) de un archivo: cambia si el archivo se modificó."""
+    estado = os.stat(ruta)
+    return estado.st_mtime_ns, estado.st_size
+
+
+def hash_archivo(ruta, bloque=1 << 20):
+    """Hash del contenido de un archivo (blake2b)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, 'rb') as f:
+        for datos in iter(lambda: f.read(bloque), b""):
+            h.update(datos)
+    return h.hexdigest()
+
+
+def cargar_csv_con_cache(ruta_csv):
+    """
+    Puntos de un CSV leídos desde su copia binaria si sigue vigente.
+
+    La copia es vigente si coinciden el tamaño y la fecha de modificación
+    del CSV; si solo cambió la fecha (por ejemplo, al copiar el archivo) se
+    compara el hash del contenido. En cualquier otro caso se vuelve a leer
+    el CSV y se regenera la copia. Si no se puede escribir la copia (carpeta
+    de solo lectura) se devuelven igual los puntos del CSV.
+    """
+    ruta_csv = Path(ruta_csv)
+    ruta_cache = ruta_cache_para(ruta_csv)
+    estado = ruta_csv.stat()
+    origen = {"archivo": ruta_csv.name, "tamano": estado.st_size, "mtime_ns": estado.st_mtime_ns}
+
+    if ruta_cache.exists():
+        try:
+            escaneo = cargar_escaneo(ruta_cache)
+            guardado = escaneo.metadatos.get("origen", {})
+            if guardado.get("tamano") == origen["tamano"]:
+                if guardado.get("mtime_ns") == origen["mtime_ns"]:
+                    return escaneo.puntos
+                origen["hash"] = hash_archivo(ruta_csv)
+                if guardado.get("hash") == origen["hash"]:
+                    # Mismo contenido con otra fecha: actualizar la clave sin releer el CSV
+                    puntos = np.array(escaneo.puntos)
+                    del escaneo
+                    _guardar_cache(ruta_cache, puntos, origen)
+                    return puntos
+        except Exception as e:
+            print(f"Caché inválida para '{ruta_csv.name}', se regenera: {e}")
+
+    puntos = cargar_csv(ruta_csv)
+    origen.setdefault("hash", hash_archivo(ruta_csv))
+    if _guardar_cache(ruta_cache, puntos, origen):
+        # Devolver siempre la versión float32 de la caché: mismo resultado en todas las lecturas
+        return cargar_escaneo(ruta_cache).puntos
+    return puntos
+
+
+def _guardar_cache(ruta_cache, puntos, origen):
+    try:
+        guardar_escaneo(ruta_cache, puntos, metadatos={"origen": origen})
+        return True
+    except Exception as e:
+        print(f"No se pudo guardar la caché '{ruta_cache}': {e}")
+        return False
+
+
+def exportar_csv(ruta_escaneo, ruta_csv):
+    """Exporta un archivo .nube al CSV de los escaneos."""
+    guardar_csv(ruta_csv, cargar_escaneo(ruta_escaneo).puntos)
+
+
+def importar_csv(ruta_csv, ruta_escaneo):
+    """Convierte un CSV (X,Y,Z) en archivo .nube."""
+    guardar_escaneo(ruta_escaneo, cargar_csv(ruta_csv), metadatos={"origen": Path(ruta_csv).name})
+
+
+# =============================================================================
+# ESCRITURA INCREMENTAL DURANTE EL ESCANEO
+# =============================================================================
+
+
+def ruta_parcial_para(ruta_escaneo):
+    """Archivo parcial asociado a un archivo de escaneo."""
+    ruta_escaneo = Path(ruta_escaneo)
+    return ruta_escaneo.with_name(ruta_escaneo.name + EXTENSION_PARCIAL)
+
+
+def leer_parcial(ruta_parcial):
+    """
+    Registros de un archivo parcial como memmap (sin copiar). Un registro
+    incompleto al final (corte durante la escritura) se ignora.
+    """
+    ruta_parcial = Path(ruta_parcial)
+    registros = ruta_parcial.stat().st_size // REGISTRO_PUNTO.itemsize
+    if registros == 0:
+        return np.empty(0, dtype=REGISTRO_PUNTO)
+    return np.memmap(ruta_parcial, dtype=REGISTRO_PUNTO, mode='r', shape=(registros,))
+
+
+def ordenar_por_muestra(registros):
+    """Registros ordenados por muestra, respetando el orden de los puntos dentro de cada una."""
+    return registros[np.argsort(registros['indice'], kind='stable')]
+
+
+def recuperar_parcial(ruta_parcial, ruta_salida, ruta_csv=None, metadatos=None):
+    """
+    Convierte un archivo parcial (por ejemplo, de un escaneo interrumpido)
+    en un archivo .nube ordenado por muestra (y opcionalmente también en
+    CSV), borra el parcial y devuelve la nube (N, 3).
+    """
+    registros = ordenar_por_muestra(leer_parcial(ruta_parcial))
+    # La copia ordenada ya no depende del memmap: el parcial se puede borrar (también en Windows)
+    guardar_escaneo(ruta_salida, registros['xyz'], registros['indice'], registros['fila'], metadatos)
+    puntos = registros['xyz'].astype(np.float64)
+    if ruta_csv is not None:
+        guardar_csv(ruta_csv, puntos)
+    os.remove(ruta_parcial)
+    return puntos
+
+
+class EscritorNube:
+    """
+    Archivo de puntos que crece a medida que se procesan los perfiles.
+
+    agregar() puede llamarse desde varios hilos (los trabajadores del
+    pipeline). Cada perfil pasa por el FiltroNube indicado; sin filtro se
+    guarda el perfil completo.
+    """
+
+    def __init__(self, ruta_parcial, filtro=None):
+        self.ruta_parcial = Path(ruta_parcial)
+        self.filtro = filtro
+        self.perfiles = 0
+        self.puntos = 0
+        self._lock = threading.Lock()
+        self._archivo = open(self.ruta_parcial, 'wb')
+
+    def agregar(self, puntos, indice, filas=None):
+        """
+        Filtra y escribe los puntos de una muestra; filas es la fila del
+        sensor de cada punto. Devuelve cuántos puntos se guardaron.
+        """
+        puntos = np.asarray(puntos)
+        filas = np.full(len(puntos), -1) if filas is None else np.asarray(filas)
+        if self.filtro is not None:
+            puntos, filas = self.filtro.aplicar(puntos, filas)
+
+        registros = np.empty(len(puntos), dtype=REGISTRO_PUNTO)
+        registros['xyz'] = puntos
+        registros['indice'] = indice
+        registros['fila'] = filas
+        with self._lock:
+            if self._archivo is None:
+                return 0
+            self._archivo.write(registros.tobytes())
+            # Que llegue al sistema operativo: sobrevive a un cierre abrupto del programa
+            self._archivo.flush()
+            self.perfiles += 1
+            self.puntos += len(registros)
+        return len(registros)
+
+    def cerrar(self):
+        """Cierra el archivo parcial (queda en disco para recuperarlo)."""
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo = None
+
+    def descartar(self):
+        """Cierra y borra el archivo parcial."""
+        self.cerrar()
+        try:
+            os.remove(self.ruta_parcial)
+        except FileNotFoundError:
+            pass
+
+    def finalizar(self, ruta_salida, ruta_csv=None, metadatos=None):
+        """Cierra el parcial y lo convierte en el archivo del escaneo. Devuelve la nube (N, 3)."""
+        self.cerrar()
+        return recuperar_parcial(self.ruta_parcial, ruta_salida, ruta_csv, metadatos)
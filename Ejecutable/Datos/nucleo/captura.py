@@ -0,0 +1,148 @@
+"""
+Captura continua de la cámara en un hilo dedicado.
+
+El hilo lee frames sin pausa y los guarda con su marca de tiempo en un
+buffer circular pequeño. La vista previa pide el último frame y la medición
+pide el primer frame capturado después de un instante dado, sin competir
+entre ellas por la cámara.
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class CapturadorCamara:
+    """Lector de la cámara en segundo plano con buffer circular de frames."""
+
+    def __init__(self, indice_camara, ancho=640, alto=480, fps=30, tamano_buffer=8,
+                 frames_descarte=5, fuente=None):
+        self.indice_camara = indice_camara
+        self.ancho = ancho
+        self.alto = alto
+        self.fps = fps
+        self.frames_descarte = frames_descarte
+
+        # fuente: objeto con read()/isOpened()/release() que reemplaza a cv2.VideoCapture
+        self._fuente = fuente
+        self._buffer = deque(maxlen=max(2, int(tamano_buffer)))
+        self._condicion = threading.Condition()
+        self._hilo = None
+        self._activo = False
+        self._errores_consecutivos = 0
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def iniciar(self):
+        """Abre la cámara y lanza el hilo de captura. Devuelve True si quedó abierta."""
+        if self._activo:
+            return True
+
+        if self._fuente is None:
+            cap = cv2.VideoCapture(self.indice_camara)
+            # Configurar para bajo buffer (importante para cámaras virtuales)
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.ancho)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.alto)
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+            self._fuente = cap
+
+        if not self._fuente.isOpened():
+            self._fuente = None
+            return False
+
+        # Esperar estabilización
+        for _ in range(self.frames_descarte):
+            ret, _ = self._fuente.read()
+            if not ret:
+                time.sleep(0.1)
+
+        self._activo = True
+        self._hilo = threading.Thread(target=self._bucle_captura, daemon=True)
+        self._hilo.start()
+        return True
+
+    def detener(self):
+        """Detiene el hilo y libera la cámara."""
+        self._activo = False
+        if self._hilo is not None and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=2)
+        self._hilo = None
+
+        if self._fuente is not None:
+            try:
+                self._fuente.release()
+            except Exception:
+                pass
+            self._fuente = None
+
+        with self._condicion:
+            self._buffer.clear()
+            self._condicion.notify_all()
+
+    def esta_activo(self):
+        """Indica si el hilo de captura sigue leyendo frames."""
+        return self._activo and self._hilo is not None and self._hilo.is_alive()
+
+    def forma_frame(self):
+        """Forma (alto, ancho, canales) del último frame, o None si todavía no hay."""
+        with self._condicion:
+            return self._buffer[-1][1].shape if self._buffer else None
+
+    def _bucle_captura(self):
+        while self._activo:
+            try:
+                ret, frame = self._fuente.read()
+            except Exception as e:
+                print(f"Error leyendo cámara: {e}")
+                ret, frame = False, None
+
+            if not ret or frame is None or frame.size == 0:
+                self._errores_consecutivos += 1
+                if self._errores_consecutivos > 50:
+                    print("Cámara sin frames válidos, se detiene la captura")
+                    self._activo = False
+                    break
+                time.sleep(0.02)
+                continue
+
+            self._errores_consecutivos = 0
+            marca = time.monotonic()
+            with self._condicion:
+                self._buffer.append((marca, frame))
+                self._condicion.notify_all()
+
+        with self._condicion:
+            self._condicion.notify_all()
+
+    # ------------------------------------------------------------------
+    # Consumo de frames
+    # ------------------------------------------------------------------
+
+    def ultimo_frame(self):
+        """Devuelve (marca_tiempo, frame) del frame más reciente, o (None, None)."""
+        with self._condicion:
+            if not self._buffer:
+                return None, None
+            return self._buffer[-1]
+
+    def frame_despues_de(self, instante, timeout=1.0):
+        """
+        Devuelve (marca_tiempo, frame) del primer frame capturado después de
+        `instante` (reloj time.monotonic()). Espera hasta `timeout` segundos si
+        todavía no llegó; devuelve (None, None) si no hay frame a tiempo.
+        """
+        limite = time.monotonic() + timeout
+        with self._condicion:
+            while True:
+                for marca, frame in self._buffer:
+                    if marca > instante:
+                        return marca, frame
+
+                restante = limite - time.monotonic()
+                if restante <= 0 or not self._activo:
+                    return None, None
+                self._condicion.wait(restante)
@@ -0,0 +1,154 @@
+"""
+Sesión de dispositivos: la cámara y la conexión con el Arduino abiertas
+entre una pieza y la siguiente.
+
+Abrir el puerto serie reinicia la placa (más de 2 s hasta que responde) y
+la cámara descarta sus primeros frames al abrirse. La sesión los deja
+abiertos y antes de reutilizarlos hace un control barato: que el hilo
+siga leyendo, que el puerto siga abierto y que la cámara haya entregado un
+frame hace poco. Solo se reabren si el control falla o si se pide
+explícitamente (reconectar_serial()).
+"""
+import threading
+import time
+
+# La cámara se considera colgada si su último frame es más viejo que esto (segundos)
+EDAD_MAXIMA_FRAME = 1.0
+
+BAUDRATE = 115200
+
+
+class SesionDispositivos:
+    """Cámara (CapturadorCamara) y Arduino (LectorSerial) reutilizados entre escaneos."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._camara = None
+        self._serial = None
+        self._lector = None
+        self._puerto = None
+        self._baudrate = BAUDRATE
+        # Si la última conexion_serial() devolvió el enlace ya abierto
+        self.serial_reutilizado = False
+        self.reconexiones = 0
+
+    # ------------------------------------------------------------------
+    # Cámara
+    # ------------------------------------------------------------------
+
+    def camara_sana(self, indice=None):
+        """Control barato: la captura sigue activa y su último frame es reciente."""
+        camara = self._camara
+        if camara is None or not camara.esta_activo():
+            return False
+        if indice is not None and camara.indice_camara != indice:
+            return False
+        marca, _ = camara.ultimo_frame()
+        return marca is not None and time.monotonic() - marca <= EDAD_MAXIMA_FRAME
+
+    def camara(self, indice, ancho=640, alto=480, fps=30):
+        """Captura continua de la cámara `indice` (la abre si hace falta). None si no se pudo abrir."""
+        # cv2 se importa al usar la cámara, no al importar los servicios
+        from nucleo.captura import CapturadorCamara
+
+        with self._lock:
+            if self.camara_sana(indice):
+                return self._camara
+            if self._camara is not None and self._camara.indice_camara == indice:
+                print(f"Cámara {indice} sin frames recientes, se vuelve a abrir")
+                self.reconexiones += 1
+            self.liberar_camara()
+            camara = CapturadorCamara(indice, ancho=ancho, alto=alto, fps=fps)
+            if not camara.iniciar():
+                return None
+            self._camara = camara
+            return camara
+
+    def liberar_camara(self):
+        with self._lock:
+            if self._camara is not None:
+                try:
+                    self._camara.detener()
+                except Exception as e:
+                    print(f"Error liberando la cámara: {e}")
+                self._camara = None
+
+    # ------------------------------------------------------------------
+    # Arduino
+    # ------------------------------------------------------------------
+
+    def serial_sano(self, puerto=None):
+        """Control barato: el hilo lector sigue vivo y el puerto sigue abierto."""
+        lector = self._lector
+        if lector is None or not lector.esta_activo():
+            return False
+        if puerto is not None and self._puerto != puerto:
+            return False
+        return getattr(self._serial, 'is_open', True)
+
+    def conexion_serial(self, puerto, al_evento=None, baudrate=BAUDRATE):
+        """
+        LectorSerial del Arduino en `puerto`. Si la conexión sigue sana se
+        reutiliza (solo se cambia al_evento); si no, se abre de nuevo.
+        """
+        with self._lock:
+            if self.serial_sano(puerto):
+                self._lector.al_evento = al_evento
+                self.serial_reutilizado = True
+                return self._lector
+            if self._lector is not None and self._puerto == puerto:
+                print(f"Conexión con Arduino en {puerto} perdida, se vuelve a abrir")
+                self.reconexiones += 1
+            return self._abrir_serial(puerto, al_evento, baudrate)
+
+    def reconectar_serial(self):
+        """Cierra y vuelve a abrir el puerto actual (reinicia la placa). Devuelve el nuevo lector."""
+        with self._lock:
+            if self._puerto is None:
+                raise RuntimeError("No hay conexión con Arduino para reconectar")
+            puerto, baudrate = self._puerto, self._baudrate
+            al_evento = self._lector.al_evento if self._lector is not None else None
+            self.reconexiones += 1
+            return self._abrir_serial(puerto, al_evento, baudrate)
+
+    def _abrir_serial(self, puerto, al_evento, baudrate):
+        from nucleo.protocolo import LectorSerial
+        from nucleo.simulador import PUERTO_SIMULADO, ArduinoSimulado
+
+        self.cerrar_serial()
+        if puerto == PUERTO_SIMULADO:
+            # Firmware simulado: permite probar el protocolo sin la placa
+            ser = ArduinoSimulado(timeout=2)
+        else:
+            import serial
+            ser = serial.Serial(puerto, baudrate, timeout=2)
+            # La placa se reinicia al abrir el puerto
+            time.sleep(2)
+            ser.reset_input_buffer()
+            ser.reset_output_buffer()
+
+        # Hilo lector: cada línea del Arduino llega como evento, sin sondeo
+        self._serial, self._puerto, self._baudrate = ser, puerto, baudrate
+        self._lector = LectorSerial(ser, al_evento=al_evento).iniciar()
+        self.serial_reutilizado = False
+        return self._lector
+
+    def cerrar_serial(self):
+        with self._lock:
+            if self._lector is not None:
+                self._lector.detener()
+                self._lector = None
+            if self._serial is not None:
+                try:
+                    self._serial.close()
+                except Exception:
+                    pass
+                self._serial = None
+                # Dar tiempo al sistema operativo a liberar el puerto
+                time.sleep(0.5)
+            self._puerto = None
+
+    def cerrar(self):
+        """Cierra la cámara y el puerto serie (al salir del programa)."""
+        self.liberar_camara()
+        self.cerrar_serial()
@@ -0,0 +1,259 @@
+"""
+Biblioteca de piezas patrón preparadas para comparar.
+
+Preparar un patrón (leerlo, centrarlo, reducirlo, medir su diagonal,
+calcular su firma cilíndrica, tomar las submuestras de la pirámide y
+construir sus KD-trees) no depende de la pieza que se compara. La
+biblioteca lo hace una vez por archivo y parámetros: el resultado queda en
+memoria para las comparaciones siguientes y en la carpeta de caché, con
+el hash del archivo y los parámetros en el nombre, para los próximos
+arranques. Si el archivo del patrón cambia en disco se vuelve a preparar.
+
+Los KD-trees no se guardan en disco: se reconstruyen al cargar el patrón
+(unos milisegundos) y quedan en memoria.
+
+ComparadorPatrones compara una nube contra toda la biblioteca repartiendo
+los patrones en un grupo de procesos que se mantiene abierto entre
+comparaciones. La nube comparada llega a los procesos por memoria
+compartida; cada proceso tiene su propia biblioteca (los patrones los lee
+de la caché en disco una vez) y devuelve solo la similitud y el giro (y
+la transformación del ICP, si se usa).
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from nucleo import comparacion
+from nucleo.almacenamiento import cargar_puntos, firma_archivo, hash_archivo
+from nucleo.comparacion import (FirmaCilindrica, ParametrosComparacion, PatronPreparado, alinear_con_patron,
+                                center_cloud, mejor_resultado, resultado_completo)
+
+# multiprocessing y concurrent.futures se importan al abrir el grupo de
+# procesos, no al importar los servicios (retrasa la apertura de las ventanas)
+
+VERSION_BIBLIOTECA = 3
+
+# Carpeta de caché predeterminada (junto a Configuracion.json)
+CARPETA_CACHE_PATRONES = "CachePatrones"
+
+# Parámetros de comparación que cambian la preparación del patrón
+PARAMETROS_PREPARACION = ('num_muestras', 'semilla', 'bins_angulo', 'bins_altura', 'niveles_piramide')
+
+
+def clave_patron(hash_contenido, parametros):
+    """Huella del contenido del patrón y de los parámetros que afectan su preparación."""
+    h = hashlib.sha1()
+    h.update(f"v{VERSION_BIBLIOTECA}|{hash_contenido}".encode())
+    for nombre in PARAMETROS_PREPARACION:
+        h.update(f"|{nombre}={getattr(parametros, nombre)!r}".encode())
+    return h.hexdigest()
+
+
+class BibliotecaPatrones:
+    """Patrones preparados, en memoria y en la carpeta de caché."""
+
+    def __init__(self, carpeta_cache=CARPETA_CACHE_PATRONES):
+        self.carpeta_cache = Path(carpeta_cache)
+        self._lock = threading.Lock()
+        self._memoria = {}                  # (ruta, parámetros) -> (firma, PatronPreparado)
+
+    def obtener(self, ruta, parametros=None):
+        """PatronPreparado del archivo `ruta` (.nube o CSV). ValueError si tiene valores no finitos."""
+        parametros = parametros or ParametrosComparacion()
+        ruta = str(Path(ruta).resolve())
+        firma = firma_archivo(ruta)
+        clave_memoria = (ruta,) + tuple(getattr(parametros, nombre) for nombre in PARAMETROS_PREPARACION)
+
+        with self._lock:
+            guardado = self._memoria.get(clave_memoria)
+        if guardado is not None and guardado[0] == firma:
+            return guardado[1]
+
+        clave = clave_patron(hash_archivo(ruta), parametros)
+        patron = self._cargar(clave)
+        if patron is None:
+            patron = PatronPreparado.desde_puntos(cargar_puntos(ruta), parametros, parametros.generador())
+            if patron is None:
+                raise ValueError(f"Valores NaN/Infinitos en el patrón '{Path(ruta).name}'")
+            self._guardar(clave, patron)
+
+        with self._lock:
+            self._memoria[clave_memoria] = (firma, patron)
+        return patron
+
+    def olvidar(self):
+        """Vacía la memoria (la caché en disco se conserva)."""
+        with self._lock:
+            self._memoria.clear()
+
+    # ------------------------------------------------------------------
+    # Caché en disco
+    # ------------------------------------------------------------------
+
+    def ruta_cache(self, clave):
+        return self.carpeta_cache / f"{clave}.npz"
+
+    def _cargar(self, clave):
+        ruta = self.ruta_cache(clave)
+        if not ruta.exists():
+            return None
+        try:
+            with np.load(ruta) as datos:
+                descriptores = {nombre[len('desc_'):]: datos[nombre] for nombre in datos.files
+                                if nombre.startswith('desc_')}
+                descriptores = {nombre: valor.item() if valor.ndim == 0 else valor
+                                for nombre, valor in descriptores.items()}
+                firma = FirmaCilindrica(datos['firma_radios'], datos['firma_filas'], datos['firma_bordes_z'])
+                niveles = [datos[f"nivel_{i}"] for i in range(int(datos['num_niveles']))]
+                return PatronPreparado(datos['centrado'], datos['reducido'], datos['diagonal'], descriptores, firma,
+                                       niveles)
+        except Exception as e:
+            print(f"Caché de patrón inválida, se vuelve a preparar: {e}")
+            return None
+
+    def _guardar(self, clave, patron):
+        """Guarda el patrón (sin comprimir, para que la carga sea inmediata)."""
+        ruta = self.ruta_cache(clave)
+        try:
+            self.carpeta_cache.mkdir(parents=True, exist_ok=True)
+            # Temporal propio de cada proceso: varias herramientas pueden guardar a la vez
+            temporal = ruta.with_name(f"{ruta.name}.{os.getpid()}.tmp")
+            with open(temporal, 'wb') as f:
+                np.savez(f, centrado=patron.centrado, reducido=patron.reducido, diagonal=patron.diagonal,
+                         firma_radios=patron.firma.radios, firma_filas=patron.firma.filas,
+                         firma_bordes_z=patron.firma.bordes_z, num_niveles=len(patron.niveles),
+                         **{f"nivel_{i}": nivel for i, nivel in enumerate(patron.niveles)},
+                         **{f"desc_{nombre}": valor for nombre, valor in patron.descriptores.items()})
+            temporal.replace(ruta)
+        except Exception as e:
+            print(f"No se pudo guardar la caché del patrón: {e}")
+
+
+# =============================================================================
+# COMPARACIÓN CONTRA LA BIBLIOTECA
+# =============================================================================
+
+class ComparadorPatrones:
+    """Compara una nube contra varios patrones de la biblioteca, en paralelo si hay más de un núcleo."""
+
+    def __init__(self, biblioteca):
+        self.biblioteca = biblioteca
+        self._lock = threading.Lock()
+        self._grupo = None
+        self._procesos_grupo = 0
+
+    def preparar(self, rutas, parametros=None):
+        """{nombre: PatronPreparado} de los patrones que se pudieron cargar ({nombre: ruta})."""
+        patrones = {}
+        for nombre, ruta in rutas.items():
+            try:
+                patrones[nombre] = self.biblioteca.obtener(ruta, parametros)
+            except Exception as e:
+                print(f"No se pudo cargar el patrón '{nombre}' ({ruta}): {e}")
+        return patrones
+
+    def comparar(self, puntos_comparada_centrada, rutas, parametros=None, al_resultado=None):
+        """
+        Compara la nube (ya centrada) contra cada patrón ({nombre: ruta}).
+
+        Devuelve {nombre: ResultadoComparacion o None}, en el orden de rutas.
+        al_resultado(nombre, resultado) se llama desde el hilo que compara a
+        medida que termina cada patrón.
+        """
+        parametros = parametros or ParametrosComparacion()
+        # El proceso principal prepara los patrones: deja la caché en disco
+        # lista para los demás procesos y tiene las nubes completas para el resultado
+        patrones = self.preparar(rutas, parametros)
+        resultados = dict.fromkeys(rutas)
+        if not patrones or not np.all(np.isfinite(puntos_comparada_centrada)):
+            return resultados
+
+        def terminar(nombre, similitud, angulo, transformacion=None):
+            resultados[nombre] = resultado_completo(patrones[nombre], puntos_comparada_centrada,
+                                                    similitud, angulo, transformacion)
+            if al_resultado is not None:
+                al_resultado(nombre, resultados[nombre])
+
+        procesos = min(len(patrones), parametros.procesos or os.cpu_count() or 1)
+        if procesos > 1:
+            try:
+                self._comparar_en_grupo(puntos_comparada_centrada, rutas, patrones, parametros, procesos, terminar)
+                return resultados
+            except Exception as e:
+                print(f"Comparación en paralelo no disponible, se compara en este proceso: {e}")
+                self.cerrar()
+
+        for nombre, patron in patrones.items():
+            if resultados[nombre] is None:
+                terminar(nombre, *alinear_con_patron(patron, puntos_comparada_centrada, parametros))
+        return resultados
+
+    def identificar(self, puntos_comparada, rutas, parametros=None, al_resultado=None):
+        """Como identificar_pieza(), con patrones de la biblioteca ({nombre: ruta})."""
+        puntos_comparada_centrada, _ = center_cloud(np.asarray(puntos_comparada))
+        resultados = self.comparar(puntos_comparada_centrada, rutas, parametros, al_resultado)
+        return mejor_resultado(resultados), resultados
+
+    def cerrar(self):
+        """Termina el grupo de procesos (se vuelve a abrir en la próxima comparación)."""
+        with self._lock:
+            if self._grupo is not None:
+                self._grupo.shutdown(wait=True, cancel_futures=True)
+                self._grupo = None
+
+    def _obtener_grupo(self, procesos):
+        from concurrent.futures import ProcessPoolExecutor
+
+        with self._lock:
+            if self._grupo is None or self._procesos_grupo < procesos:
+                if self._grupo is not None:
+                    self._grupo.shutdown(wait=True)
+                self._grupo = ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso,
+                                                  initargs=(str(self.biblioteca.carpeta_cache),))
+                self._procesos_grupo = procesos
+            return self._grupo
+
+    def _comparar_en_grupo(self, puntos, rutas, patrones, parametros, procesos, terminar):
+        from concurrent.futures import as_completed
+        from multiprocessing import shared_memory
+
+        grupo = self._obtener_grupo(procesos)
+        puntos = np.ascontiguousarray(puntos)
+        memoria = shared_memory.SharedMemory(create=True, size=max(1, puntos.nbytes))
+        try:
+            np.ndarray(puntos.shape, dtype=puntos.dtype, buffer=memoria.buf)[:] = puntos
+            tareas = {grupo.submit(_alinear_en_proceso, rutas[nombre], memoria.name, puntos.shape,
+                                   puntos.dtype.str, parametros): nombre
+                      for nombre in patrones}
+            for tarea in as_completed(tareas):
+                terminar(tareas[tarea], *tarea.result())
+        finally:
+            memoria.close()
+            memoria.unlink()
+
+
+# Biblioteca de cada proceso del grupo (los patrones quedan en memoria entre comparaciones)
+_BIBLIOTECA_PROCESO = None
+
+
+def _iniciar_proceso(carpeta_cache):
+    global _BIBLIOTECA_PROCESO
+    _BIBLIOTECA_PROCESO = BibliotecaPatrones(carpeta_cache)
+    # Un patrón por proceso: las consultas a los KD-trees usan un solo núcleo
+    comparacion.HILOS_CONSULTA = 1
+
+
+def _alinear_en_proceso(ruta, nombre_memoria, forma, tipo, parametros):
+    from multiprocessing import shared_memory
+
+    memoria = shared_memory.SharedMemory(name=nombre_memoria)
+    try:
+        puntos = np.ndarray(forma, dtype=tipo, buffer=memoria.buf)
+        resultado = alinear_con_patron(_BIBLIOTECA_PROCESO.obtener(ruta, parametros), puntos, parametros)
+        del puntos
+        return resultado
+    finally:
+        memoria.close()
@@ -0,0 +1,166 @@
+"""
+Producción continua: escanear, comparar y pasar a la pieza siguiente sin
+intervención del operador.
+
+LineaProduccion recibe la nube de cada pieza en memoria apenas termina su
+escaneo y la compara contra las piezas patrón en un hilo propio, mientras
+la estación ya trae y escanea la pieza siguiente. Cada pieza se guarda en
+la carpeta del lote y su veredicto se agrega a registro.csv.
+
+Estructura de un lote:
+    registro.csv          una fila por pieza (ver COLUMNAS_REGISTRO)
+    Pieza_0001.nube       nube de cada pieza (y .csv si se exporta)
+"""
+import csv
+import queue
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from nucleo.almacenamiento import EXTENSION_ESCANEO
+from nucleo.comparacion import ParametrosComparacion
+
+ARCHIVO_REGISTRO = "registro.csv"
+
+COLUMNAS_REGISTRO = ('pieza', 'fecha', 'archivo', 'puntos', 'patron', 'similitud', 'umbral', 'aprobada',
+                     'segundos_comparacion', 'error')
+
+# Veredicto de una pieza (patron y similitud son None si no se pudo comparar)
+Veredicto = namedtuple('Veredicto', ['pieza', 'archivo', 'puntos', 'patron', 'similitud', 'umbral',
+                                     'aprobada', 'segundos', 'error'])
+
+
+class LineaProduccion:
+    """
+    Lote de producción: numera las piezas, las compara en segundo plano y
+    registra los veredictos.
+
+    comparador es un ComparadorPatrones (por ejemplo Servicios.comparador,
+    que reparte los patrones entre los núcleos). al_veredicto(v) se llama
+    desde el hilo de comparación después de registrar cada pieza.
+    """
+
+    def __init__(self, carpeta, patrones, comparador, parametros=None, al_veredicto=None):
+        if not patrones:
+            raise ValueError("No hay piezas patrón configuradas")
+        self.carpeta = Path(carpeta)
+        self.patrones = dict(patrones)          # nombre -> ruta
+        self.comparador = comparador
+        self.parametros = parametros or ParametrosComparacion()
+        self.al_veredicto = al_veredicto
+
+        self.piezas = 0
+        self.veredictos = []
+        self._lock = threading.Lock()
+        self._cola = queue.Queue()
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        self.ruta_registro = self.carpeta / ARCHIVO_REGISTRO
+
+        self._hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self._hilo.start()
+
+    @classmethod
+    def desde_config(cls, config, carpeta_base, comparador, al_veredicto=None):
+        """Lote nuevo (carpeta con fecha y hora) con las piezas y parámetros de 'parametros_comparacion'."""
+        patrones = config.get('parametros_comparacion', {}).get('piezas', {})
+        carpeta = Path(carpeta_base) / time.strftime("%Y%m%d-%H%M%S")
+        return cls(carpeta, patrones, comparador, ParametrosComparacion.desde_config(config), al_veredicto)
+
+    # ------------------------------------------------------------------
+    # Piezas
+    # ------------------------------------------------------------------
+
+    def nueva_pieza(self, exportar_csv=False):
+        """Número de la pieza siguiente y rutas (.nube, .csv o None) donde guardarla."""
+        with self._lock:
+            self.piezas += 1
+            numero = self.piezas
+        base = self.carpeta / f"Pieza_{numero:04d}"
+        ruta_csv = str(base.with_suffix('.csv')) if exportar_csv else None
+        return numero, str(base.with_suffix(EXTENSION_ESCANEO)), ruta_csv
+
+    def comparar(self, numero, puntos, archivo=None):
+        """Encola la nube de una pieza (vuelve enseguida; la comparación corre en segundo plano)."""
+        self._cola.put((numero, puntos, archivo))
+
+    def descartar(self, numero, motivo, archivo=None):
+        """Registra una pieza que no se pudo escanear (cuenta como rechazada)."""
+        self._cola.put((numero, None, archivo, motivo))
+
+    def pendientes(self):
+        """Piezas escaneadas que todavía no tienen veredicto."""
+        return self._cola.unfinished_tasks
+
+    def detener(self, timeout=None):
+        """Termina las comparaciones pendientes y detiene el hilo. Devuelve True si terminó."""
+        self._cola.put(None)
+        self._hilo.join(timeout)
+        return not self._hilo.is_alive()
+
+    def resumen(self):
+        """(piezas con veredicto, aprobadas, rechazadas)."""
+        with self._lock:
+            aprobadas = sum(1 for v in self.veredictos if v.aprobada)
+            return len(self.veredictos), aprobadas, len(self.veredictos) - aprobadas
+
+    # ------------------------------------------------------------------
+    # Hilo de comparación
+    # ------------------------------------------------------------------
+
+    def _trabajar(self):
+        # Los patrones se preparan mientras se escanea la primera pieza
+        self.comparador.preparar(self.patrones, self.parametros)
+        while True:
+            tarea = self._cola.get()
+            try:
+                if tarea is None:
+                    return
+                if len(tarea) == 4:
+                    numero, _, archivo, motivo = tarea
+                    veredicto = Veredicto(numero, archivo, 0, None, None, self.parametros.umbral_identificacion,
+                                          False, 0.0, motivo)
+                else:
+                    veredicto = self._veredicto(*tarea)
+                self._registrar(veredicto)
+            except Exception as e:
+                print(f"Error registrando la pieza: {e}")
+            finally:
+                self._cola.task_done()
+
+    def _veredicto(self, numero, puntos, archivo):
+        inicio = time.perf_counter()
+        umbral = self.parametros.umbral_identificacion
+        try:
+            mejor, resultados = self.comparador.identificar(puntos, self.patrones, self.parametros)
+            if mejor is None:
+                raise ValueError("Ninguna comparación válida (patrones sin cargar o valores NaN/Infinitos)")
+            similitud = resultados[mejor].similitud
+            return Veredicto(numero, archivo, len(puntos), mejor, similitud, umbral, similitud >= umbral,
+                             time.perf_counter() - inicio, None)
+        except Exception as e:
+            print(f"Error comparando la pieza {numero}: {e}")
+            return Veredicto(numero, archivo, len(puntos), None, None, umbral, False,
+                             time.perf_counter() - inicio, str(e))
+
+    def _registrar(self, veredicto):
+        nuevo = not self.ruta_registro.exists()
+        with open(self.ruta_registro, 'a', newline='') as f:
+            escritor = csv.writer(f)
+            if nuevo:
+                escritor.writerow(COLUMNAS_REGISTRO)
+            escritor.writerow([
+                veredicto.pieza, time.strftime("%Y-%m-%d %H:%M:%S"),
+                Path(veredicto.archivo).name if veredicto.archivo else "",
+                veredicto.puntos, veredicto.patron or "",
+                "" if veredicto.similitud is None else f"{veredicto.similitud:.2f}",
+                f"{veredicto.umbral:.2f}", int(veredicto.aprobada),
+                f"{veredicto.segundos:.2f}", veredicto.error or "",
+            ])
+        with self._lock:
+            self.veredictos.append(veredicto)
+        if self.al_veredicto is not None:
+            try:
+                self.al_veredicto(veredicto)
+            except Exception as e:
+                print(f"Error informando el veredicto de la pieza {veredicto.pieza}: {e}")
@@ -0,0 +1,248 @@
+"""
+Protocolo serie con el Arduino del escáner.
+
+LectorSerial lee el puerto en un hilo propio y convierte cada línea en un
+Evento tipado con su instante de llegada. Los pasos del escaneo esperan
+eventos con esperar_evento() en lugar de sondear in_waiting, de modo que
+reaccionan apenas llega la línea. ProtocoloEscaneo agrupa la secuencia del
+modo automático de Escaneo.ino y funciona con cualquier objeto con la
+interfaz de serial.Serial (por ejemplo nucleo.simulador.ArduinoSimulado).
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+# Protocolo de muestreo: 'demora_fija' (esperas fijas antes y después de cada
+# ángulo), 'confirmacion' (la PC confirma cada captura) o 'continuo' (la mesa
+# gira a velocidad constante y se usan todos los frames)
+MODOS_PROTOCOLO = ('demora_fija', 'confirmacion', 'continuo')
+CONFIRMACION = b"A"
+
+# Sufijo del número de muestras que selecciona cada modo en el firmware
+SUFIJOS_PROTOCOLO = {'demora_fija': '', 'confirmacion': 'A', 'continuo': 'C'}
+
+# Evento con que el firmware confirma, antes de "Iniciando escaneo...", que
+# entendió el sufijo (un firmware anterior lo ignora y escanea con demora fija)
+AVISOS_MODO = {'confirmacion': 'modo_confirmacion', 'continuo': 'modo_continuo'}
+
+# Segundos estimados por muestra en cada modo (para la barra de progreso)
+SEGUNDOS_POR_MUESTRA = {'demora_fija': 2.0, 'confirmacion': 0.6, 'continuo': 0.0}
+
+# Duración estimada de la vuelta en modo continuo (5333 pasos a 500 pasos/s)
+SEGUNDOS_GIRO_CONTINUO = 11.0
+
+# tipo: ver parsear_linea(); valor: ángulo (float), (ms, pasos) o None;
+# instante: time.monotonic() al recibir la línea
+Evento = namedtuple('Evento', ['tipo', 'texto', 'valor', 'instante'])
+
+# Eventos del giro continuo: "INICIO <ms> <pasos_vuelta>", "PASOS <ms> <pasos>", "FIN <ms> <pasos>"
+EVENTOS_GIRO = {'INICIO': 'inicio_giro', 'PASOS': 'pasos', 'FIN': 'fin_giro'}
+
+# Fragmentos de texto (en minúsculas, sin tildes) que identifican cada mensaje
+MENSAJES = (
+    ('pregunta_modo', 'modo automatico? (y/n)'),
+    ('modo_automatico', 'modo automatico activado'),
+    ('homing_completado', 'homing completado'),
+    ('homing', 'realizando homing'),
+    ('centrando', 'avanzando pieza'),
+    ('centrado', 'pieza en posicion'),
+    ('pregunta_muestras', 'muestras desea'),
+    ('modo_confirmacion', 'modo con confirmacion'),
+    ('modo_continuo', 'modo giro continuo'),
+    ('iniciando', 'iniciando escaneo'),
+    ('sin_confirmacion', 'sin confirmacion'),
+    ('finalizado', 'escaneo finalizado'),
+    ('expulsando', 'expulsando pieza'),
+    ('expulsada', 'pieza expulsada'),
+    ('motores_desactivados', 'motores desactivados'),
+    ('error', 'error'),
+)
+
+_SIN_TILDES = str.maketrans('áéíóú', 'aeiou')
+
+
+def parsear_angulo(linea):
+    """Devuelve el ángulo (0-360) si la línea es una muestra, o None."""
+    try:
+        angulo = float(linea)
+    except ValueError:
+        return None
+    return angulo if 0 <= angulo <= 360 else None
+
+
+def parsear_linea(linea, instante=None):
+    """Convierte una línea del Arduino en un Evento (tipo 'otro' si no se reconoce)."""
+    instante = time.monotonic() if instante is None else instante
+
+    angulo = parsear_angulo(linea)
+    if angulo is not None:
+        return Evento('angulo', linea, angulo, instante)
+
+    partes = linea.split()
+    if len(partes) == 3 and partes[0] in EVENTOS_GIRO:
+        try:
+            return Evento(EVENTOS_GIRO[partes[0]], linea, (int(partes[1]), int(partes[2])), instante)
+        except ValueError:
+            pass
+
+    normalizada = linea.lower().translate(_SIN_TILDES)
+    for tipo, fragmento in MENSAJES:
+        if fragmento in normalizada:
+            return Evento(tipo, linea, None, instante)
+    return Evento('otro', linea, None, instante)
+
+
+class LectorSerial:
+    """
+    Hilo que lee líneas del puerto serie y las encola como eventos.
+
+    al_evento(evento), si se indica, se llama desde el hilo lector para cada
+    evento (por ejemplo para mostrar el estado del Arduino en la interfaz).
+    """
+
+    def __init__(self, ser, al_evento=None):
+        self.ser = ser
+        self.al_evento = al_evento
+        self._eventos = deque()
+        self._condicion = threading.Condition()
+        self._lock_escritura = threading.Lock()
+        self._hilo = None
+        self._activo = False
+
+    def iniciar(self):
+        self._activo = True
+        self._hilo = threading.Thread(target=self._leer, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._activo = False
+        with self._condicion:
+            self._condicion.notify_all()
+        if self._hilo is not None and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=3)
+        self._hilo = None
+
+    def esta_activo(self):
+        return self._activo and self._hilo is not None and self._hilo.is_alive()
+
+    def escribir(self, datos):
+        """Envía bytes al Arduino (seguro entre hilos)."""
+        with self._lock_escritura:
+            self.ser.write(datos)
+            self.ser.flush()
+
+    def descartar_pendientes(self):
+        """Olvida los eventos recibidos que nadie esperó todavía."""
+        with self._condicion:
+            self._eventos.clear()
+
+    def esperar_evento(self, tipos, timeout=None, cancelado=None):
+        """
+        Devuelve el próximo evento cuyo tipo esté en `tipos` (str o tupla),
+        descartando los anteriores de otro tipo. Devuelve None si vence el
+        timeout, si cancelado() pasa a ser verdadero o si se detuvo el lector.
+        """
+        if isinstance(tipos, str):
+            tipos = (tipos,)
+        limite = None if timeout is None else time.monotonic() + timeout
+
+        with self._condicion:
+            while True:
+                while self._eventos:
+                    evento = self._eventos.popleft()
+                    if evento.tipo in tipos:
+                        return evento
+
+                if not self._activo or (cancelado is not None and cancelado()):
+                    return None
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return None
+                # Con cancelado se revisa periódicamente; los eventos despiertan al instante
+                espera = 0.1 if cancelado is not None else restante
+                if restante is not None and espera is not None:
+                    espera = min(espera, restante)
+                self._condicion.wait(espera)
+
+    def _leer(self):
+        pendiente = b""
+        while self._activo:
+            try:
+                datos = self.ser.readline()
+            except Exception as e:
+                print(f"Error leyendo puerto serie: {e}")
+                break
+            instante = time.monotonic()
+            if not datos:
+                if not getattr(self.ser, 'is_open', True):
+                    break
+                continue
+
+            # readline() puede cortar por timeout a mitad de línea
+            pendiente += datos
+            if not pendiente.endswith(b"\n"):
+                continue
+            linea = pendiente.decode('utf-8', errors='ignore').strip()
+            pendiente = b""
+            if not linea:
+                continue
+
+            evento = parsear_linea(linea, instante)
+            with self._condicion:
+                self._eventos.append(evento)
+                self._condicion.notify_all()
+            if self.al_evento:
+                try:
+                    self.al_evento(evento)
+                except Exception as e:
+                    print(f"Error procesando evento '{linea}': {e}")
+
+        self._activo = False
+        with self._condicion:
+            self._condicion.notify_all()
+
+
+class ProtocoloEscaneo:
+    """Pasos del modo automático de Escaneo.ino, sin dependencias de la interfaz."""
+
+    def __init__(self, lector):
+        self.lector = lector
+
+    def solicitar_modo_automatico(self, timeout=10):
+        """Espera la pregunta de modo y responde 'y'. Devuelve True si se pudo."""
+        if self.lector.esperar_evento('pregunta_modo', timeout) is None:
+            return False
+        self.lector.escribir(b"y")
+        return True
+
+    def esperar_pregunta_muestras(self, timeout=120, cancelado=None):
+        """Espera (durante homing y centrado) a que Arduino pida el número de muestras."""
+        return self.lector.esperar_evento('pregunta_muestras', timeout, cancelado) is not None
+
+    def enviar_muestras(self, num_muestras, modo_protocolo, timeout=10):
+        """
+        Envía el número de muestras con el sufijo del modo y espera el inicio
+        del escaneo. Devuelve el modo en que escanea el firmware, o None si no
+        empezó a tiempo.
+
+        El firmware avisa el modo ("Modo con confirmacion", "Modo giro
+        continuo") antes de "Iniciando escaneo...". Uno anterior ignora el
+        sufijo y escanea con demora fija: se devuelve 'demora_fija' para que
+        la PC no espere el giro continuo ni le envíe confirmaciones que
+        leería como respuestas del ciclo siguiente.
+        """
+        self.lector.escribir(f"{num_muestras}{SUFIJOS_PROTOCOLO[modo_protocolo]}\n".encode())
+        aviso = AVISOS_MODO.get(modo_protocolo)
+        evento = self.lector.esperar_evento(tuple(AVISOS_MODO.values()) + ('iniciando',), timeout)
+        if evento is None:
+            return None
+        if aviso is None:
+            return modo_protocolo
+        if evento.tipo != aviso:
+            return 'demora_fija'
+        return modo_protocolo if self.lector.esperar_evento('iniciando', timeout) is not None else None
+
+    def esperar_expulsion(self, timeout=60, cancelado=None):
+        """Espera a que la pieza termine de salir de la estación."""
+        return self.lector.esperar_evento('expulsada', timeout, cancelado) is not None
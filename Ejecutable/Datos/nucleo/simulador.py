@@ -0,0 +1,524 @@
+"""
+Arduino y cámara simulados.
+
+ArduinoSimulado reproduce los mensajes y esperas de Codigo/Arduino/Escaneo.ino
+(modo automático y manual, escaneo con demora fija, con confirmación 'A' o
+con giro continuo 'C') y expone la misma interfaz que serial.Serial que usan
+las interfaces, para probar el protocolo sin la placa.
+
+CamaraSimulada tiene la interfaz de cv2.VideoCapture: reproduce frames
+grabados o sintetiza la línea láser sobre una pieza (nube de puntos de un
+escaneo) según el ángulo actual de la mesa simulada.
+"""
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Nombre de puerto que hace que las interfaces usen el Arduino simulado
+PUERTO_SIMULADO = "SIMULADO"
+
+# Tiempos (segundos) del firmware y de la mecánica simulada
+TIEMPOS_ARDUINO = {
+    "inicio": 1.0,                  # delay(1000) al comienzo de loop()
+    "homing": 3.0,
+    "centrado": 4.0,
+    "paso": 0.45,                   # movimiento de la mesa entre muestras
+    "asentado": 0.1,                # delayAsentado (modo con confirmación)
+    "demora_escaneo": 1.0,          # delayEscaneo (modo demora fija)
+    "timeout_confirmacion": 5.0,
+    "retorno": 3.0,
+    "expulsion": 3.0,
+    "fin_ciclo": 2.0,
+    "lectura": 1.0,                 # timeout de Serial.readStringUntil()
+    "reporte": 0.05,                # intervaloReporte (giro continuo)
+}
+
+# Mecánica del escáner (igual que el firmware)
+PASOS_VUELTA = round(3200 * 40.0 / 24.0)
+VEL_GIRO = 500.0                    # pasos/s del giro continuo
+
+
+class ArduinoSimulado:
+    """
+    Firmware del escáner corriendo en un hilo, visto como un puerto serie.
+
+    escala_tiempo multiplica todos los tiempos (0.01 hace el ciclo 100 veces
+    más rápido). angulo_mesa indica la posición actual de la mesa en grados.
+    Con firmware_anterior simula el firmware sin los modos con confirmación
+    y giro continuo: ignora los sufijos 'A' y 'C' y escanea con demora fija.
+    """
+
+    def __init__(self, tiempos=None, escala_tiempo=1.0, timeout=2, firmware_anterior=False):
+        self.tiempos = dict(TIEMPOS_ARDUINO)
+        if tiempos:
+            self.tiempos.update(tiempos)
+        self.escala_tiempo = escala_tiempo
+        self.timeout = timeout
+        self.firmware_anterior = firmware_anterior
+
+        self._angulo = 0.0
+        self._giro = None                   # (instante de inicio, grados/s) durante el giro continuo
+        self._inicio_millis = time.monotonic()
+        self.confirmaciones = 0
+
+        self._entrada = bytearray()         # PC -> Arduino
+        self._salida = bytearray()          # Arduino -> PC
+        self._condicion = threading.Condition()
+        self.is_open = True
+        self._hilo = threading.Thread(target=self._firmware, daemon=True)
+        self._hilo.start()
+
+    # ------------------------------------------------------------------
+    # Interfaz de serial.Serial
+    # ------------------------------------------------------------------
+
+    @property
+    def in_waiting(self):
+        with self._condicion:
+            return len(self._salida)
+
+    def readline(self):
+        limite = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._condicion:
+            while b"\n" not in self._salida:
+                restante = None if limite is None else limite - time.monotonic()
+                if not self.is_open or (restante is not None and restante <= 0):
+                    break
+                self._condicion.wait(restante)
+            fin = self._salida.find(b"\n")
+            n = len(self._salida) if fin < 0 else fin + 1
+            linea = bytes(self._salida[:n])
+            del self._salida[:n]
+            return linea
+
+    def read(self, size=1):
+        with self._condicion:
+            datos = bytes(self._salida[:size])
+            del self._salida[:size]
+            return datos
+
+    def write(self, datos):
+        with self._condicion:
+            self._entrada.extend(datos)
+            self._condicion.notify_all()
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        with self._condicion:
+            self._salida.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+    def close(self):
+        with self._condicion:
+            self.is_open = False
+            self._condicion.notify_all()
+
+    @property
+    def angulo_mesa(self):
+        """Ángulo actual de la mesa en grados."""
+        giro = self._giro
+        if giro is None:
+            return self._angulo
+        return min(360.0, (time.monotonic() - giro[0]) * giro[1])
+
+    # ------------------------------------------------------------------
+    # Firmware
+    # ------------------------------------------------------------------
+
+    def _millis(self):
+        return int((time.monotonic() - self._inicio_millis) * 1000)
+
+    def _esperar(self, clave):
+        """Espera el tiempo configurado; devuelve False si se cerró el puerto."""
+        limite = time.monotonic() + self.tiempos[clave] * self.escala_tiempo
+        with self._condicion:
+            while self.is_open:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return True
+                self._condicion.wait(restante)
+        return False
+
+    def _println(self, texto):
+        with self._condicion:
+            self._salida.extend(f"{texto}\r\n".encode('utf-8'))
+            self._condicion.notify_all()
+
+    def _leer_linea(self):
+        """Serial.readStringUntil('\\n') + trim(), tras esperar a que haya datos."""
+        with self._condicion:
+            while self.is_open and not self._entrada:
+                self._condicion.wait()
+            limite = time.monotonic() + self.tiempos["lectura"] * self.escala_tiempo
+            while self.is_open and b"\n" not in self._entrada:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._condicion.wait(restante)
+            fin = self._entrada.find(b"\n")
+            n = len(self._entrada) if fin < 0 else fin + 1
+            linea = bytes(self._entrada[:n])
+            del self._entrada[:n]
+        return linea.decode('utf-8', errors='ignore').strip()
+
+    def _esperar_confirmacion(self):
+        limite = time.monotonic() + self.tiempos["timeout_confirmacion"] * self.escala_tiempo
+        with self._condicion:
+            while self.is_open:
+                if b"A" in self._entrada:
+                    del self._entrada[:self._entrada.index(b"A") + 1]
+                    self.confirmaciones += 1
+                    return True
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._condicion.wait(restante)
+        self._println("Sin confirmacion, continuando")
+        return False
+
+    def _preguntar(self, pregunta):
+        self._println(pregunta)
+        return self._leer_linea()
+
+    def _firmware(self):
+        while self.is_open:
+            if not self._esperar("inicio"):
+                return
+
+            if self._preguntar("¿Modo automático? (y/n)") in ("y", "Y"):
+                self._println("Modo automático activado.")
+                self._homing()
+                self._centrado()
+                self._escaneo(self._preguntar("¿Cuántas muestras desea tomar?"))
+                self._expulsion()
+                self._println("Motores desactivados")
+            else:
+                if self._preguntar("¿Realizar homing? (y/n)") in ("y", "Y"):
+                    self._homing()
+                if self._preguntar("¿Centrar pieza? (y/n)") in ("y", "Y"):
+                    self._centrado()
+                if self._preguntar("¿Escanear pieza? (y/n)") in ("y", "Y"):
+                    self._escaneo(self._preguntar("¿Cuántas muestras desea tomar?"))
+                if self._preguntar("¿Expulsar pieza? (y/n)") in ("y", "Y"):
+                    self._expulsion()
+
+            self._println("Motores Desactivados")
+            self._esperar("fin_ciclo")
+
+    def _homing(self):
+        self._println("Realizando homing...")
+        self._esperar("homing")
+        self._angulo = 0.0
+        self._println("Homing completado")
+
+    def _centrado(self):
+        self._println("Avanzando pieza...")
+        self._esperar("centrado")
+        self._println("Pieza en posición")
+
+    def _escaneo(self, entrada):
+        # input.toInt(): dígitos iniciales; sufijo 'A' = modo con confirmación
+        digitos = ""
+        for caracter in entrada:
+            if not caracter.isdigit():
+                break
+            digitos += caracter
+        muestras = int(digitos) if digitos else 0
+        con_confirmacion = entrada.endswith("A") and not self.firmware_anterior
+        giro_continuo = entrada.endswith("C") and not self.firmware_anterior
+
+        if con_confirmacion:
+            self._println("Modo con confirmacion")
+        if giro_continuo:
+            self._println("Modo giro continuo")
+        self._println("Iniciando escaneo...")
+        if giro_continuo:
+            self._escaneo_continuo()
+            self._println("Escaneo finalizado")
+            return
+
+        paso = 360.0 / muestras if muestras > 0 else 0.0
+        for i in range(muestras):
+            angulo = i * paso
+            if con_confirmacion:
+                self._esperar("asentado")
+                with self._condicion:
+                    self._entrada.clear()
+                self._println(f"{angulo:.2f}")
+                self._esperar_confirmacion()
+            else:
+                self._esperar("demora_escaneo")
+                self._println(f"{angulo:.2f}")
+                self._esperar("demora_escaneo")
+
+            if not self.is_open:
+                return
+            if i < muestras - 1:
+                self._esperar("paso")
+                self._angulo = (i + 1) * paso
+
+        self._esperar("retorno")
+        self._angulo = 0.0
+        self._println("Escaneo finalizado")
+
+    def _escaneo_continuo(self):
+        # La velocidad se escala junto con los tiempos
+        pasos_por_segundo = VEL_GIRO / self.escala_tiempo
+        duracion = PASOS_VUELTA / pasos_por_segundo
+        inicio = time.monotonic()
+        self._giro = (inicio, pasos_por_segundo * 360.0 / PASOS_VUELTA)
+        self._println(f"INICIO {self._millis()} {PASOS_VUELTA}")
+
+        pasos = 0
+        while pasos < PASOS_VUELTA and self.is_open:
+            self._esperar("reporte")
+            pasos = min(PASOS_VUELTA, int((time.monotonic() - inicio) * pasos_por_segundo))
+            if pasos < PASOS_VUELTA:
+                self._println(f"PASOS {self._millis()} {pasos}")
+
+        # Esperar el último paso exacto antes de informar el fin
+        time.sleep(max(0.0, inicio + duracion - time.monotonic()))
+        self._println(f"FIN {self._millis()} {PASOS_VUELTA}")
+        self._giro = None
+        self._angulo = 360.0
+
+        self._esperar("retorno")
+        self._angulo = 0.0
+
+    def _expulsion(self):
+        self._println("Expulsando pieza...")
+        self._esperar("expulsion")
+        self._println("Pieza expulsada")
+
+
+# =============================================================================
+# CÁMARA SIMULADA
+# =============================================================================
+
+EXTENSIONES_FRAMES = ('.png', '.jpg', '.jpeg', '.bmp', '.npy')
+
+
+def cargar_frames(carpeta):
+    """Carga los frames grabados de una carpeta (imágenes o arrays .npy)."""
+    frames = []
+    for archivo in sorted(Path(carpeta).iterdir()):
+        if archivo.suffix.lower() not in EXTENSIONES_FRAMES:
+            continue
+        if archivo.suffix.lower() == '.npy':
+            frame = np.load(archivo)
+        else:
+            frame = cv2.imread(str(archivo))
+        if frame is not None and frame.ndim == 3:
+            frames.append(frame)
+    return frames
+
+
+def _rellenar_huecos(mapa, max_hueco, circular):
+    """Interpola a lo largo del eje 0 los NaN de huecos de hasta max_hueco celdas."""
+    n = mapa.shape[0]
+    indices = np.arange(n)
+    for j in range(mapa.shape[1]):
+        columna = mapa[:, j]
+        validos = np.flatnonzero(np.isfinite(columna))
+        if validos.size < 2:
+            continue
+        xp, fp = validos, columna[validos]
+        if circular:
+            xp = np.concatenate([xp[-1:] - n, xp, xp[:1] + n])
+            fp = np.concatenate([fp[-1:], fp, fp[:1]])
+
+        # Largo del hueco en el que cae cada celda
+        derecha = np.clip(np.searchsorted(xp, indices), 1, xp.size - 1)
+        hueco = xp[derecha] - xp[derecha - 1]
+        relleno = np.interp(indices, xp, fp)
+        rellenar = ~np.isfinite(columna) & (hueco <= max_hueco + 1)
+        columna[rellenar] = relleno[rellenar]
+
+
+class RenderizadorLaser:
+    """
+    Sintetiza la imagen de la línea láser sobre una pieza.
+
+    La pieza se describe con la nube de puntos de un escaneo, que se pasa a
+    un mapa de radios (ángulo de la mesa x altura del perfil) con la inversa
+    de la transformación del escaneo. Para dibujar un frame se busca, en cada
+    fila del sensor, la columna donde la tabla de triangulación da un punto
+    sobre la superficie de la pieza; así el frame es exactamente el que
+    reconstruiría el escáner con esa calibración.
+    """
+
+    def __init__(self, puntos, tabla, transformacion, paso_angulo=1.0, paso_z=0.5,
+                 max_hueco_grados=15.0, ancho_linea=4.0, intensidad=1000, ruido=40, semilla=0):
+        self.tabla = tabla
+        self.offset_radial = transformacion.offset_radial
+        self.paso_angulo = paso_angulo
+        self.paso_z = paso_z
+        self.ancho_linea = ancho_linea
+        self.intensidad = intensidad
+        self.ruido = ruido
+        self._rng = np.random.default_rng(semilla)
+
+        angulo, radio, z = transformacion.a_perfil(np.asarray(puntos, dtype=np.float64))
+        n_angulos = int(round(360.0 / paso_angulo))
+        self.z0 = float(z.min())
+        n_z = int((z.max() - self.z0) / paso_z) + 1
+
+        # Radio exterior de la pieza en cada celda (ángulo, altura)
+        mapa = np.full((n_angulos, n_z), -np.inf)
+        ia = (angulo / paso_angulo).astype(np.intp) % n_angulos
+        iz = ((z - self.z0) / paso_z).astype(np.intp)
+        np.maximum.at(mapa, (ia, iz), radio)
+        mapa[np.isinf(mapa)] = np.nan
+
+        # El escaneo tiene un número finito de ángulos y filas: completar los huecos chicos
+        _rellenar_huecos(mapa, int(max_hueco_grados / paso_angulo), circular=True)
+        _rellenar_huecos(mapa.T, 3, circular=False)
+        self.mapa = mapa
+
+        # Tabla en columnas enteras del sensor: (alto, ancho) de radio y z del perfil
+        columnas = tabla.tabla[:, ::tabla.subdivisiones].astype(np.float64)
+        r_tabla = columnas[:, :, 0] + self.offset_radial
+        fz = (columnas[:, :, 1] - self.z0) / paso_z
+
+        # Solo interesan las columnas que pueden caer sobre la pieza
+        with np.errstate(invalid='ignore'):
+            posibles = ((fz >= 0) & (fz <= n_z - 1) &
+                        (r_tabla >= np.nanmin(mapa) - 1) & (r_tabla <= np.nanmax(mapa) + 1))
+        usadas = np.flatnonzero(posibles.any(axis=0))
+        self._col0 = int(usadas[0]) if usadas.size else 0
+        col1 = int(usadas[-1]) + 2 if usadas.size else 1
+        r_tabla, fz = r_tabla[:, self._col0:col1], fz[:, self._col0:col1]
+
+        # Interpolación en altura precalculada (la tabla no cambia entre frames)
+        self._dentro = np.isfinite(fz) & (fz >= 0) & (fz <= n_z - 1)
+        fz = np.where(self._dentro, fz, 0)
+        self._k0 = np.clip(np.floor(fz).astype(np.intp), 0, n_z - 1)
+        self._k1 = np.minimum(self._k0 + 1, n_z - 1)
+        self._w = fz - self._k0
+        self._r_tabla = r_tabla
+        self.alto, self.ancho = tabla.alto, tabla.ancho
+
+    def radios(self, angulo_mesa):
+        """Radio de la pieza en función de la altura del perfil, para un ángulo de la mesa."""
+        posicion = (angulo_mesa % 360.0) / self.paso_angulo
+        i0 = int(np.floor(posicion)) % self.mapa.shape[0]
+        i1 = (i0 + 1) % self.mapa.shape[0]
+        w = posicion - np.floor(posicion)
+        r0, r1 = self.mapa[i0], self.mapa[i1]
+        mezcla = (1 - w) * r0 + w * r1
+        # Donde falta un vecino se usa el otro
+        return np.where(np.isfinite(mezcla), mezcla, np.where(np.isfinite(r0), r0, r1))
+
+    def columnas_laser(self, angulo_mesa):
+        """Columna sub-píxel de la línea en cada fila (NaN donde no toca la pieza)."""
+        radios = self.radios(angulo_mesa)
+        radio_pieza = np.where(self._dentro, (1 - self._w) * radios[self._k0] + self._w * radios[self._k1], np.nan)
+
+        # Cruce por cero de (distancia al eje del píxel) - (radio de la pieza)
+        g = self._r_tabla - radio_pieza
+        g0, g1 = g[:, :-1], g[:, 1:]
+        with np.errstate(invalid='ignore'):
+            cruce = np.isfinite(g0) & np.isfinite(g1) & (g0 * g1 <= 0) & (g0 != g1)
+        filas_con_laser = cruce.any(axis=1)
+        indice = np.argmax(cruce, axis=1)
+        filas = np.arange(g.shape[0])
+        a, b = g0[filas, indice], g1[filas, indice]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columna = self._col0 + indice + a / (a - b)
+        return np.where(filas_con_laser, columna, np.nan)
+
+    def frame(self, angulo_mesa):
+        """Frame BGR (alto, ancho, 3) con ruido y la línea láser en el canal rojo."""
+        frame = self._rng.integers(0, self.ruido, size=(self.alto, self.ancho, 3), dtype=np.uint8)
+
+        columna = self.columnas_laser(angulo_mesa)
+        filas = np.flatnonzero(np.isfinite(columna))
+        if filas.size:
+            # Dibujar solo una ventana de ±4 anchos alrededor de la línea
+            mitad = int(np.ceil(4 * self.ancho_linea))
+            centro = np.round(columna[filas]).astype(np.intp)
+            cols = np.clip(centro[:, None] + np.arange(-mitad, mitad + 1), 0, self.ancho - 1)
+            perfil = self.intensidad * np.exp(-0.5 * ((cols - columna[filas, None]) / self.ancho_linea) ** 2)
+            rojo = frame[filas[:, None], cols, 2] + perfil
+            frame[filas[:, None], cols, 2] = np.clip(rojo, 0, 255).astype(np.uint8)
+        return frame
+
+
+class CamaraSimulada:
+    """
+    Reemplazo de cv2.VideoCapture que entrega frames a ritmo de fps.
+
+    generar_frame(indice) devuelve cada frame; se llama en el momento de la
+    "exposición", así los frames sintéticos siguen el ángulo de la mesa.
+    """
+
+    def __init__(self, generar_frame, fps=30, ancho=640, alto=480):
+        self.generar_frame = generar_frame
+        self.fps = fps
+        self.ancho = ancho
+        self.alto = alto
+        self.frames_entregados = 0
+        self._abierta = True
+        self._proximo = None
+
+    @classmethod
+    def desde_frames(cls, frames, fps=30):
+        """Reproduce una lista de frames en bucle."""
+        alto, ancho = frames[0].shape[:2]
+        return cls(lambda i: frames[i % len(frames)], fps=fps, ancho=ancho, alto=alto)
+
+    @classmethod
+    def desde_carpeta(cls, carpeta, fps=30):
+        """Reproduce en bucle los frames grabados de una carpeta."""
+        frames = cargar_frames(carpeta)
+        if not frames:
+            raise ValueError(f"No hay frames en {carpeta}")
+        return cls.desde_frames(frames, fps)
+
+    @classmethod
+    def desde_nube(cls, puntos, arduino, tabla, transformacion, fps=30, **opciones):
+        """Sintetiza la línea láser sobre la pieza según arduino.angulo_mesa."""
+        renderizador = RenderizadorLaser(puntos, tabla, transformacion, **opciones)
+        return cls(lambda i: renderizador.frame(arduino.angulo_mesa), fps=fps,
+                   ancho=tabla.ancho, alto=tabla.alto)
+
+    def isOpened(self):
+        return self._abierta
+
+    def read(self):
+        if not self._abierta:
+            return False, None
+
+        # Respetar el ritmo de la cámara
+        ahora = time.monotonic()
+        if self._proximo is not None and ahora < self._proximo:
+            time.sleep(self._proximo - ahora)
+            ahora = self._proximo
+        self._proximo = ahora + 1.0 / self.fps
+
+        frame = self.generar_frame(self.frames_entregados)
+        self.frames_entregados += 1
+        return True, frame
+
+    def set(self, propiedad, valor):
+        return True
+
+    def get(self, propiedad):
+        if propiedad == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.ancho)
+        if propiedad == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.alto)
+        if propiedad == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        return 0.0
+
+    def release(self):
+        self._abierta = False